@@ -10,79 +10,267 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, mean_squared_error, classification_report
 import joblib
 import os
+import math
 from datetime import datetime, timedelta
 import json
+import time
 import logging
+import threading
+
+from forest_inference import CompiledForest, INFERENCE_ENGINES, leaf_values
+from model_registry import ModelRegistry
+from revenue_forecast import forecast_scenarios
 
 logger = logging.getLogger(__name__)
 
+# Model input columns, in the order the scaler and forests are fitted on
+FEATURE_COLUMNS = [
+    'account_age_days',
+    'total_transactions',
+    'total_revenue',
+    'avg_transaction_amount',
+    'days_since_last_payment',
+    'failed_payments',
+    'support_tickets',
+    'subscription_count',
+    'is_enterprise',
+    'has_crypto_wallet',
+    'communication_frequency',
+    'payment_method_diversity'
+]
+
+# Raw customer fields copied straight into the feature matrix, with their defaults
+NUMERIC_FEATURE_DEFAULTS = {
+    'total_transactions': 0,
+    'total_revenue': 0.0,
+    'avg_transaction_amount': 0.0,
+    'days_since_last_payment': 0,
+    'failed_payments': 0,
+    'support_tickets': 0,
+    'subscription_count': 0,
+    'communication_frequency': 0,
+    'payment_method_diversity': 1
+}
+
 class AdvancedAnalyticsService:
     """Advanced AI analytics service for customer insights and predictions"""
     
-    def __init__(self, models_dir='models'):
+    def __init__(self, models_dir='models', inference_engine='leaf_tables', load_models=True,
+                 reload_interval=5.0):
+        if inference_engine not in INFERENCE_ENGINES:
+            raise ValueError(f"Unknown inference engine: {inference_engine}")
+        
         self.models_dir = models_dir
+        self.inference_engine = inference_engine
         self.churn_model = None
         self.cltv_model = None
         self.scaler = None
         self.label_encoder = None
         
+        # Each model keeps the scaler it was fitted with; self.scaler is the latest one
+        self.scalers = {}
+        
+        # Guards model/scaler swaps so predictions never mix generations
+        self._model_lock = threading.Lock()
+        
+        # Per-model prepared trees: {(model name, engine): (model, prepared)}
+        # where prepared is a list of leaf tables or a CompiledForest
+        self._forest_cache = {}
+        
+        # Memory-mapped compiled forests shipped with registry artifacts: {name: (model, compiled)}
+        self._registry_forests = {}
+        
         # Ensure models directory exists
         os.makedirs(models_dir, exist_ok=True)
         
-        # Try to load existing models
-        self._load_models()
+        # Versioned artifact store; promoted versions are hot-reloaded
+        self.registry = ModelRegistry(os.path.join(models_dir, 'registry'))
+        self.model_versions = {}
+        self.reload_interval = reload_interval
+        self._last_reload_check = time.monotonic()
+        
+        # Persisted models are loaded on first use (or by warm_up), not at construction
+        self._models_loaded = not load_models
+        self._load_lock = threading.Lock()
+    
+    def ensure_models_loaded(self):
+        """Load persisted models once, on first use"""
+        if self._models_loaded:
+            return
+        with self._load_lock:
+            if not self._models_loaded:
+                self._load_models()
+                self._last_reload_check = time.monotonic()
+                self._models_loaded = True
+    
+    def warm_up(self, background=True):
+        """Load models ahead of the first request, optionally in a daemon thread"""
+        if not background:
+            self.ensure_models_loaded()
+            return None
+        thread = threading.Thread(target=self.ensure_models_loaded, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
     
     def _load_models(self):
-        """Load trained models from disk"""
+        """Load the promoted model versions from the registry, falling back to legacy pickles per model type"""
         try:
-            churn_model_path = os.path.join(self.models_dir, 'churn_model.pkl')
-            cltv_model_path = os.path.join(self.models_dir, 'cltv_model.pkl')
-            scaler_path = os.path.join(self.models_dir, 'scaler.pkl')
-            
-            if os.path.exists(churn_model_path):
-                self.churn_model = joblib.load(churn_model_path)
-                logger.info("Churn model loaded successfully")
-            
-            if os.path.exists(cltv_model_path):
-                self.cltv_model = joblib.load(cltv_model_path)
-                logger.info("CLTV model loaded successfully")
+            legacy_types = []
+            for model_type in ['churn', 'cltv']:
+                if self.registry.current_version(model_type):
+                    self._load_registry_model(model_type)
+                else:
+                    legacy_types.append(model_type)
             
-            if os.path.exists(scaler_path):
-                self.scaler = joblib.load(scaler_path)
-                logger.info("Scaler loaded successfully")
+            if legacy_types:
+                self._load_legacy_models(legacy_types)
                 
         except Exception as e:
             logger.error(f"Error loading models: {e}")
     
-    def _save_models(self):
-        """Save trained models to disk"""
+    def _load_registry_model(self, model_type, version=None):
+        """Load one registry version and swap it in"""
+        artifact = self.registry.load(model_type, version)
+        self._install_model(model_type, artifact['model'], artifact['scaler'])
+        if artifact['compiled'] is not None:
+            self._registry_forests[model_type] = (artifact['model'], artifact['compiled'])
+        self.model_versions[model_type] = artifact['manifest']['version']
+        logger.info(f"{model_type} model version {artifact['manifest']['version']} loaded")
+    
+    def _load_legacy_models(self, model_types=('churn', 'cltv')):
+        """Load unversioned pickles written before the model registry existed
+        
+        Only for model types without a promoted registry version; each keeps
+        the legacy scaler it was fitted with.
+        """
+        scaler_path = os.path.join(self.models_dir, 'scaler.pkl')
+        scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
+        
+        for model_type in model_types:
+            model_path = os.path.join(self.models_dir, f'{model_type}_model.pkl')
+            if not os.path.exists(model_path):
+                continue
+            with self._model_lock:
+                if model_type == 'churn':
+                    self.churn_model = joblib.load(model_path)
+                else:
+                    self.cltv_model = joblib.load(model_path)
+                if scaler is not None:
+                    self.scalers[model_type] = scaler
+            logger.info(f"Legacy {model_type} model loaded successfully")
+        
+        if scaler is not None and self.scaler is None:
+            self.scaler = scaler
+            logger.info("Scaler loaded successfully")
+    
+    def reload_if_promoted(self):
+        """Swap in any model version promoted since it was loaded, e.g. by another worker"""
+        self.ensure_models_loaded()
+        self._last_reload_check = time.monotonic()
+        reloaded = []
+        for model_type in ['churn', 'cltv']:
+            try:
+                current = self.registry.current_version(model_type)
+                if current and current != self.model_versions.get(model_type):
+                    self._load_registry_model(model_type, current)
+                    reloaded.append(model_type)
+            except Exception as e:
+                logger.error(f"Error reloading {model_type} model: {e}")
+        return reloaded
+    
+    def _save_models(self, model_types=None, metrics=None):
+        """Publish trained models as new promoted registry versions"""
         try:
-            if self.churn_model:
-                joblib.dump(self.churn_model, os.path.join(self.models_dir, 'churn_model.pkl'))
-            
-            if self.cltv_model:
-                joblib.dump(self.cltv_model, os.path.join(self.models_dir, 'cltv_model.pkl'))
-            
-            if self.scaler:
-                joblib.dump(self.scaler, os.path.join(self.models_dir, 'scaler.pkl'))
+            for model_type in model_types or ['churn', 'cltv']:
+                model, scaler = self._model_snapshot(model_type, check_reload=False)
+                if not model or not scaler:
+                    continue
+                
+                manifest = self.registry.publish(
+                    model_type, model, scaler, FEATURE_COLUMNS,
+                    metrics=(metrics or {}).get(model_type)
+                )
+                self.model_versions[model_type] = manifest['version']
                 
             logger.info("Models saved successfully")
             
         except Exception as e:
             logger.error(f"Error saving models: {e}")
     
-    def _prepare_customer_features(self, customer_data):
+    def _prepare_customer_features(self, customer_data, errors=None):
         """Prepare customer features for ML models"""
-        if isinstance(customer_data, list):
+        if isinstance(customer_data, (list, pd.DataFrame)):
             # Multiple customers
-            features = []
-            for customer in customer_data:
-                features.append(self._extract_features(customer))
-            return pd.DataFrame(features)
+            return self._build_feature_frame(customer_data, errors)
         else:
             # Single customer
-            features = self._extract_features(customer_data)
-            return pd.DataFrame([features])
+            return self._build_feature_frame([customer_data], errors)
+    
+    def _build_feature_frame(self, customers, errors=None):
+        """Build the feature matrix for many customers with column-wise operations.
+        
+        Accepts a list of customer dicts or a DataFrame of raw customer columns and
+        returns the same values as ``_extract_features`` row by row, as float64
+        columns in ``FEATURE_COLUMNS`` order.
+        
+        Missing or blank values take their defaults. A value that is present but
+        not a number (or not a date, for created_at) raises ValueError, unless an
+        ``errors`` dict is given: then the row keeps the defaults and
+        ``errors[row]`` gets the message, so batches can report it per row.
+        """
+        n_rows = len(customers)
+        raw_fields = ['created_at', 'account_type', 'crypto_wallets'] + list(NUMERIC_FEATURE_DEFAULTS)
+        
+        # Transpose into one sequence per raw field; DataFrames are already columnar
+        if isinstance(customers, pd.DataFrame):
+            columns = {name: customers[name].to_numpy(dtype=object) for name in raw_fields if name in customers.columns}
+        else:
+            columns = {name: [customer.get(name) for customer in customers] for name in raw_fields}
+        
+        invalid = {}
+        
+        def object_column(name):
+            return pd.Series(columns.get(name, [None] * n_rows), dtype=object)
+        
+        def check_coerced(name, raw, coerced_missing):
+            # Coercion may only fill in values that were missing or blank
+            blank = raw.isna() | raw.map(lambda value: isinstance(value, str) and not value.strip())
+            for row in np.flatnonzero(coerced_missing & ~blank.to_numpy()):
+                invalid.setdefault(int(row), f"Invalid value for {name}: {raw.iloc[row]!r}")
+        
+        def numeric_column(name, default):
+            values = columns.get(name)
+            if values is None:
+                return np.full(n_rows, default, dtype=np.float64)
+            try:
+                array = np.asarray(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                raw = object_column(name)
+                array = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64)
+                check_coerced(name, raw, np.isnan(array))
+            return np.where(np.isnan(array), default, array)
+        
+        features = {}
+        
+        # Account age: one vectorized ISO-8601 parse instead of fromisoformat per row
+        raw_created_at = object_column('created_at')
+        created_at = pd.to_datetime(raw_created_at, errors='coerce', utc=True, format='ISO8601')
+        check_coerced('created_at', raw_created_at, created_at.isna().to_numpy())
+        account_age = (pd.Timestamp(datetime.now()) - created_at.dt.tz_localize(None)).dt.days
+        features['account_age_days'] = account_age.fillna(0).to_numpy(dtype=np.float64)
+        
+        for name, default in NUMERIC_FEATURE_DEFAULTS.items():
+            features[name] = numeric_column(name, default)
+        
+        features['is_enterprise'] = (object_column('account_type') == 'Enterprise').to_numpy(dtype=np.float64)
+        wallets = object_column('crypto_wallets')
+        features['has_crypto_wallet'] = wallets.where(wallets.notna(), '').astype(bool).to_numpy(dtype=np.float64)
+        
+        if invalid:
+            if errors is None:
+                raise ValueError(invalid[min(invalid)])
+            errors.update(invalid)
+        return pd.DataFrame(features, columns=FEATURE_COLUMNS)
     
     def _extract_features(self, customer):
         """Extract features from customer data"""
@@ -102,108 +290,165 @@ class AdvancedAnalyticsService:
         }
         return features
     
-    def train_churn_model(self, customer_data):
+    def fit_churn_model(self, customer_data, n_jobs=None, progress=None):
+        """Fit a churn model and its scaler without touching the live models.
+        
+        Returns ``(model, scaler, metrics)``. ``progress`` is an optional
+        ``callable(stage, percent)`` used by background training jobs.
+        """
+        report = progress or (lambda stage, percent: None)
+        
+        # Prepare features
+        report('preparing_features', 10)
+        features_df = self._prepare_customer_features(customer_data)
+        
+        # Generate synthetic churn labels for training (in real app, use actual churn data)
+        y = self._generate_synthetic_churn_labels(features_df)
+        
+        # Split data
+        X_train, X_test, y_train, y_test = train_test_split(
+            features_df, y, test_size=0.2, random_state=42
+        )
+        
+        # Scale features
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+        
+        # Train model
+        report('fitting', 30)
+        model = RandomForestClassifier(
+            n_estimators=100,
+            max_depth=10,
+            random_state=42,
+            n_jobs=n_jobs
+        )
+        
+        model.fit(X_train_scaled, y_train)
+        
+        # Evaluate
+        report('evaluating', 90)
+        y_pred = model.predict(X_test_scaled)
+        accuracy = accuracy_score(y_test, y_pred)
+        
+        metrics = {
+            'accuracy': accuracy,
+            'features_used': list(features_df.columns),
+            'training_samples': len(X_train),
+            'test_samples': len(X_test)
+        }
+        return model, scaler, metrics
+    
+    def fit_cltv_model(self, customer_data, n_jobs=None, progress=None):
+        """Fit a CLTV model and its scaler without touching the live models.
+        
+        Returns ``(model, scaler, metrics)``; see fit_churn_model.
+        """
+        report = progress or (lambda stage, percent: None)
+        
+        # Prepare features
+        report('preparing_features', 10)
+        features_df = self._prepare_customer_features(customer_data)
+        
+        # Generate synthetic CLTV labels for training
+        y = self._generate_synthetic_cltv_labels(features_df)
+        
+        # Split data
+        X_train, X_test, y_train, y_test = train_test_split(
+            features_df, y, test_size=0.2, random_state=42
+        )
+        
+        # Scale features
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+        
+        # Train model
+        report('fitting', 30)
+        model = RandomForestRegressor(
+            n_estimators=100,
+            max_depth=10,
+            random_state=42,
+            n_jobs=n_jobs
+        )
+        
+        model.fit(X_train_scaled, y_train)
+        
+        # Evaluate
+        report('evaluating', 90)
+        y_pred = model.predict(X_test_scaled)
+        mse = mean_squared_error(y_test, y_pred)
+        
+        metrics = {
+            'mse': mse,
+            'features_used': list(features_df.columns),
+            'training_samples': len(X_train),
+            'test_samples': len(X_test)
+        }
+        return model, scaler, metrics
+    
+    def train_churn_model(self, customer_data, n_jobs=None):
         """Train churn prediction model"""
         try:
-            # Prepare features
-            features_df = self._prepare_customer_features(customer_data)
-            
-            # Generate synthetic churn labels for training (in real app, use actual churn data)
-            y = self._generate_synthetic_churn_labels(features_df)
-            
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(
-                features_df, y, test_size=0.2, random_state=42
-            )
-            
-            # Scale features
-            if not self.scaler:
-                self.scaler = StandardScaler()
-            
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
-            
-            # Train model
-            self.churn_model = RandomForestClassifier(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42
-            )
-            
-            self.churn_model.fit(X_train_scaled, y_train)
-            
-            # Evaluate
-            y_pred = self.churn_model.predict(X_test_scaled)
-            accuracy = accuracy_score(y_test, y_pred)
+            model, scaler, metrics = self.fit_churn_model(customer_data, n_jobs=n_jobs)
+            self.install_model('churn', model, scaler)
             
             # Save models
-            self._save_models()
+            self._save_models(['churn'], {'churn': metrics})
             
-            return {
-                'status': 'success',
-                'accuracy': accuracy,
-                'features_used': list(features_df.columns),
-                'training_samples': len(X_train),
-                'test_samples': len(X_test)
-            }
+            return {'status': 'success', **metrics}
             
         except Exception as e:
             logger.error(f"Error training churn model: {e}")
             return {'status': 'error', 'message': str(e)}
     
-    def train_cltv_model(self, customer_data):
+    def train_cltv_model(self, customer_data, n_jobs=None):
         """Train Customer Lifetime Value prediction model"""
         try:
-            # Prepare features
-            features_df = self._prepare_customer_features(customer_data)
-            
-            # Generate synthetic CLTV labels for training
-            y = self._generate_synthetic_cltv_labels(features_df)
-            
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(
-                features_df, y, test_size=0.2, random_state=42
-            )
-            
-            # Scale features
-            if not self.scaler:
-                self.scaler = StandardScaler()
-            
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
-            
-            # Train model
-            self.cltv_model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42
-            )
-            
-            self.cltv_model.fit(X_train_scaled, y_train)
-            
-            # Evaluate
-            y_pred = self.cltv_model.predict(X_test_scaled)
-            mse = mean_squared_error(y_test, y_pred)
+            model, scaler, metrics = self.fit_cltv_model(customer_data, n_jobs=n_jobs)
+            self.install_model('cltv', model, scaler)
             
             # Save models
-            self._save_models()
+            self._save_models(['cltv'], {'cltv': metrics})
             
-            return {
-                'status': 'success',
-                'mse': mse,
-                'features_used': list(features_df.columns),
-                'training_samples': len(X_train),
-                'test_samples': len(X_test)
-            }
+            return {'status': 'success', **metrics}
             
         except Exception as e:
             logger.error(f"Error training CLTV model: {e}")
             return {'status': 'error', 'message': str(e)}
     
+    def install_model(self, model_type, model, scaler):
+        """Atomically swap in a trained model together with the scaler it was fitted with"""
+        # Finish any pending lazy load first so it cannot overwrite the new model
+        self.ensure_models_loaded()
+        self._install_model(model_type, model, scaler)
+    
+    def _install_model(self, model_type, model, scaler):
+        with self._model_lock:
+            if model_type == 'churn':
+                self.churn_model = model
+            elif model_type == 'cltv':
+                self.cltv_model = model
+            else:
+                raise ValueError(f"Unknown model type: {model_type}")
+            self.scalers[model_type] = scaler
+            self.scaler = scaler
+    
+    def _model_snapshot(self, model_type, check_reload=True):
+        """Consistent ``(model, scaler)`` pair for one prediction call"""
+        self.ensure_models_loaded()
+        if check_reload and time.monotonic() - self._last_reload_check >= self.reload_interval:
+            self.reload_if_promoted()
+        
+        with self._model_lock:
+            model = self.churn_model if model_type == 'churn' else self.cltv_model
+            return model, self.scalers.get(model_type, self.scaler)
+    
     def predict_churn(self, customer_data):
         """Predict churn probability for a customer"""
         try:
-            if not self.churn_model or not self.scaler:
+            churn_model, scaler = self._model_snapshot('churn')
+            if not churn_model or not scaler:
                 return {
                     'status': 'error',
                     'message': 'Churn model not trained. Please train the model first.'
@@ -211,27 +456,12 @@ class AdvancedAnalyticsService:
             
             # Prepare features
             features_df = self._prepare_customer_features(customer_data)
-            features_scaled = self.scaler.transform(features_df)
+            features_scaled = scaler.transform(features_df)
             
-            # Predict
-            churn_probability = self.churn_model.predict_proba(features_scaled)[0][1]
-            churn_prediction = self.churn_model.predict(features_scaled)[0]
-            
-            # Determine risk level
-            if churn_probability >= 0.7:
-                risk_level = 'High'
-            elif churn_probability >= 0.4:
-                risk_level = 'Medium'
-            else:
-                risk_level = 'Low'
+            # Predict: label and probability come from a single forest pass
+            probabilities, labels = self._score_churn(churn_model, features_scaled)
             
-            return {
-                'status': 'success',
-                'churn_probability': float(churn_probability),
-                'will_churn': bool(churn_prediction),
-                'risk_level': risk_level,
-                'confidence': float(max(churn_probability, 1 - churn_probability))
-            }
+            return self._churn_result(probabilities[0, 1], labels[0])
             
         except Exception as e:
             logger.error(f"Error predicting churn: {e}")
@@ -240,7 +470,8 @@ class AdvancedAnalyticsService:
     def predict_cltv(self, customer_data):
         """Predict Customer Lifetime Value"""
         try:
-            if not self.cltv_model or not self.scaler:
+            cltv_model, scaler = self._model_snapshot('cltv')
+            if not cltv_model or not scaler:
                 return {
                     'status': 'error',
                     'message': 'CLTV model not trained. Please train the model first.'
@@ -248,71 +479,293 @@ class AdvancedAnalyticsService:
             
             # Prepare features
             features_df = self._prepare_customer_features(customer_data)
-            features_scaled = self.scaler.transform(features_df)
+            features_scaled = scaler.transform(features_df)
             
             # Predict
-            predicted_cltv = self.cltv_model.predict(features_scaled)[0]
+            predicted_cltv = self._forest_predict('cltv', cltv_model, features_scaled)[0]
             
-            # Calculate confidence intervals (simplified)
-            confidence_interval = {
-                'lower': float(predicted_cltv * 0.8),
-                'upper': float(predicted_cltv * 1.2)
-            }
-            
-            return {
-                'status': 'success',
-                'predicted_cltv': float(predicted_cltv),
-                'confidence_interval': confidence_interval,
-                'value_segment': self._get_value_segment(predicted_cltv)
-            }
+            return self._cltv_result(predicted_cltv)
             
         except Exception as e:
             logger.error(f"Error predicting CLTV: {e}")
             return {'status': 'error', 'message': str(e)}
     
+    def _split_batch(self, customers):
+        """Separate scoreable customer rows from malformed ones.
+        
+        Returns the per-row result list (pre-filled with errors for bad rows),
+        the positions of the valid rows and the valid rows themselves.
+        """
+        results = [None] * len(customers)
+        positions = []
+        valid_customers = []
+        for i, customer in enumerate(customers):
+            if isinstance(customer, dict):
+                positions.append(i)
+                valid_customers.append(customer)
+            else:
+                results[i] = {'status': 'error', 'message': 'Customer data must be an object'}
+        return results, positions, valid_customers
+    
+    def _batch_response(self, results):
+        """Wrap per-row results in the batch envelope"""
+        errors = sum(1 for result in results if result['status'] != 'success')
+        return {
+            'status': 'success',
+            'results': results,
+            'count': len(results),
+            'errors': errors
+        }
+    
+    def predict_churn_batch(self, customers):
+        """Predict churn for many customers with one scaler and one model pass"""
+        try:
+            churn_model, scaler = self._model_snapshot('churn')
+            if not churn_model or not scaler:
+                return {
+                    'status': 'error',
+                    'message': 'Churn model not trained. Please train the model first.'
+                }
+            
+            results, positions, valid_customers = self._split_batch(customers)
+            if valid_customers:
+                invalid = {}
+                features_df = self._prepare_customer_features(valid_customers, invalid)
+                features_scaled = scaler.transform(features_df)
+                
+                probabilities, labels = self._score_churn(churn_model, features_scaled)
+                churn_probabilities = probabilities[:, 1]
+                
+                for row, (position, churn_probability, label) in enumerate(zip(positions, churn_probabilities, labels)):
+                    if row in invalid:
+                        results[position] = {'status': 'error', 'message': invalid[row]}
+                    else:
+                        results[position] = self._churn_result(churn_probability, label)
+            
+            return self._batch_response(results)
+            
+        except Exception as e:
+            logger.error(f"Error predicting churn batch: {e}")
+            return {'status': 'error', 'message': str(e)}
+    
+    def predict_cltv_batch(self, customers):
+        """Predict Customer Lifetime Value for many customers with one model pass"""
+        try:
+            cltv_model, scaler = self._model_snapshot('cltv')
+            if not cltv_model or not scaler:
+                return {
+                    'status': 'error',
+                    'message': 'CLTV model not trained. Please train the model first.'
+                }
+            
+            results, positions, valid_customers = self._split_batch(customers)
+            if valid_customers:
+                invalid = {}
+                features_df = self._prepare_customer_features(valid_customers, invalid)
+                features_scaled = scaler.transform(features_df)
+                predicted = self._forest_predict('cltv', cltv_model, features_scaled)
+                
+                for row, (position, predicted_cltv) in enumerate(zip(positions, predicted)):
+                    if row in invalid:
+                        results[position] = {'status': 'error', 'message': invalid[row]}
+                    else:
+                        results[position] = self._cltv_result(predicted_cltv)
+            
+            return self._batch_response(results)
+            
+        except Exception as e:
+            logger.error(f"Error predicting CLTV batch: {e}")
+            return {'status': 'error', 'message': str(e)}
+    
+    def _score_churn(self, churn_model, features_scaled):
+        """Churn class probabilities and labels from one forest evaluation.
+        
+        Labels are derived from the probabilities the same way
+        RandomForestClassifier.predict does, so the forest only runs once.
+        """
+        probabilities = self._forest_predict('churn', churn_model, features_scaled)
+        labels = churn_model.classes_.take(np.argmax(probabilities, axis=1))
+        return probabilities, labels
+    
+    def _forest_tables(self, name, model):
+        """Return cached ``(tree, leaf values)`` pairs for a fitted forest.
+        
+        Leaf values are the per-node outputs each tree would produce (class
+        probabilities for classifiers, means for regressors), prepared once per
+        model object and rebuilt when the model is retrained or reloaded.
+        """
+        cached = self._forest_cache.get((name, 'leaf_tables'))
+        if cached is not None and cached[0] is model:
+            return cached[1]
+        
+        n_classes = model.n_classes_ if hasattr(model, 'classes_') else None
+        tables = [(estimator.tree_, leaf_values(estimator, n_classes)) for estimator in model.estimators_]
+        
+        self._forest_cache[(name, 'leaf_tables')] = (model, tables)
+        return tables
+    
+    def _compiled_forest(self, name, model, features_scaled):
+        """Return the cached CompiledForest for a model, or None if it cannot be used.
+        
+        A freshly compiled forest is checked against sklearn on the batch that
+        triggered compilation; on any mismatch the model stays on sklearn.
+        """
+        cached = self._forest_cache.get((name, 'compiled'))
+        if cached is not None and cached[0] is model:
+            return cached[1]
+        
+        # Registry artifacts ship prebuilt, memory-mapped node arrays
+        registry_forest = self._registry_forests.get(name)
+        if registry_forest is not None and registry_forest[0] is model:
+            compiled = registry_forest[1]
+        else:
+            compiled = CompiledForest(model)
+        if not compiled.verify(features_scaled):
+            logger.warning(f"Compiled {name} forest does not match sklearn output, using sklearn")
+            compiled = None
+        
+        self._forest_cache[(name, 'compiled')] = (model, compiled)
+        return compiled
+    
+    def _forest_predict(self, name, model, features_scaled):
+        """Evaluate a forest with the configured inference engine.
+        
+        Returns the same values as ``predict_proba`` (classifiers) or
+        ``predict`` (regressors) for every engine.
+        """
+        is_forest = hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_')
+        
+        if is_forest and self.inference_engine == 'compiled':
+            compiled = self._compiled_forest(name, model, features_scaled)
+            if compiled is not None:
+                return compiled.predict_raw(features_scaled)
+        
+        elif is_forest and self.inference_engine == 'leaf_tables':
+            # Average the trees without sklearn's per-call dispatch, in sklearn's order
+            X = np.ascontiguousarray(features_scaled, dtype=np.float32)
+            tables = self._forest_tables(name, model)
+            
+            if hasattr(model, 'classes_'):
+                output = np.zeros((X.shape[0], model.n_classes_), dtype=np.float64)
+            else:
+                output = np.zeros(X.shape[0], dtype=np.float64)
+            for tree, values in tables:
+                output += values[tree.apply(X)]
+            output /= len(tables)
+            return output
+        
+        if hasattr(model, 'classes_'):
+            return model.predict_proba(features_scaled)
+        return model.predict(features_scaled)
+    
+    def _churn_result(self, churn_probability, churn_prediction):
+        """Build the churn prediction payload for one customer"""
+        if churn_probability >= 0.7:
+            risk_level = 'High'
+        elif churn_probability >= 0.4:
+            risk_level = 'Medium'
+        else:
+            risk_level = 'Low'
+        
+        return {
+            'status': 'success',
+            'churn_probability': float(churn_probability),
+            'will_churn': bool(churn_prediction),
+            'risk_level': risk_level,
+            'confidence': float(max(churn_probability, 1 - churn_probability))
+        }
+    
+    def _cltv_result(self, predicted_cltv):
+        """Build the CLTV prediction payload for one customer"""
+        # Calculate confidence intervals (simplified)
+        confidence_interval = {
+            'lower': float(predicted_cltv * 0.8),
+            'upper': float(predicted_cltv * 1.2)
+        }
+        
+        return {
+            'status': 'success',
+            'predicted_cltv': float(predicted_cltv),
+            'confidence_interval': confidence_interval,
+            'value_segment': self._get_value_segment(predicted_cltv)
+        }
+    
     def get_customer_insights(self, customer_id, customer_data):
         """Get comprehensive insights for a customer"""
         try:
-            insights = {
-                'customer_id': customer_id,
-                'generated_at': datetime.now().isoformat()
-            }
-            
-            # Churn analysis
             churn_result = self.predict_churn(customer_data)
-            if churn_result['status'] == 'success':
-                insights['churn_analysis'] = churn_result
-            
-            # CLTV analysis
             cltv_result = self.predict_cltv(customer_data)
-            if cltv_result['status'] == 'success':
-                insights['cltv_analysis'] = cltv_result
-            
-            # Health score
-            health_score = self.calculate_health_score(customer_data)
-            insights['health_score'] = health_score
+            return self._assemble_insights(customer_id, customer_data, churn_result, cltv_result)
             
-            # Recommendations
-            recommendations = self.generate_recommendations(customer_data, churn_result, cltv_result)
-            insights['recommendations'] = recommendations
+        except Exception as e:
+            logger.error(f"Error generating customer insights: {e}")
+            return {'status': 'error', 'message': str(e)}
+    
+    def get_batch_customer_insights(self, customers):
+        """Get insights for many customers, scoring churn and CLTV in one pass each
+        
+        ``customers`` is a list of ``(customer_id, customer_data)`` pairs; the
+        result maps each customer id to the same payload as get_customer_insights.
+        """
+        try:
+            customer_rows = [customer_data for _, customer_data in customers]
+            churn_batch = self.predict_churn_batch(customer_rows)
+            cltv_batch = self.predict_cltv_batch(customer_rows)
+            
+            insights = {}
+            for i, (customer_id, customer_data) in enumerate(customers):
+                churn_result = churn_batch['results'][i] if churn_batch['status'] == 'success' else churn_batch
+                cltv_result = cltv_batch['results'][i] if cltv_batch['status'] == 'success' else cltv_batch
+                try:
+                    insights[customer_id] = self._assemble_insights(customer_id, customer_data, churn_result, cltv_result)
+                except Exception as e:
+                    insights[customer_id] = {'status': 'error', 'message': str(e)}
             
             return insights
             
         except Exception as e:
-            logger.error(f"Error generating customer insights: {e}")
+            logger.error(f"Error generating batch customer insights: {e}")
             return {'status': 'error', 'message': str(e)}
     
+    def _assemble_insights(self, customer_id, customer_data, churn_result, cltv_result):
+        """Combine model results, health score and recommendations for one customer"""
+        insights = {
+            'customer_id': customer_id,
+            'generated_at': datetime.now().isoformat()
+        }
+        
+        # Churn analysis
+        if churn_result['status'] == 'success':
+            insights['churn_analysis'] = churn_result
+        
+        # CLTV analysis
+        if cltv_result['status'] == 'success':
+            insights['cltv_analysis'] = cltv_result
+        
+        # Health score
+        health_score = self.calculate_health_score(customer_data)
+        insights['health_score'] = health_score
+        
+        # Recommendations
+        recommendations = self.generate_recommendations(customer_data, churn_result, cltv_result)
+        insights['recommendations'] = recommendations
+        
+        return insights
+    
     def analyze_customer_segments(self, customer_data):
         """Analyze customer segments"""
         try:
             features_df = self._prepare_customer_features(customer_data)
             
+            revenues = features_df['total_revenue'].to_numpy()
+            account_ages = features_df['account_age_days'].to_numpy()
+            
             # Simple segmentation based on revenue and activity
             segments = {}
             
             for i, customer in enumerate(customer_data):
-                revenue = features_df.iloc[i]['total_revenue']
-                account_age = features_df.iloc[i]['account_age_days']
+                revenue = revenues[i]
+                account_age = account_ages[i]
                 
                 if revenue > 5000:
                     segment = 'High Value'
@@ -563,18 +1016,13 @@ def predictive_analytics_dashboard(business_data):
         churn_rate = business_data.get('current_churn_rate', 0.05)
         growth_rate = business_data.get('growth_rate', 0.05)
         
-        # Predict next 12 months
-        predictions = []
-        revenue = current_revenue
-        
-        for month in range(1, 13):
-            # Apply growth and churn
-            revenue = revenue * (1 + growth_rate - churn_rate)
-            predictions.append({
-                'month': month,
-                'predicted_revenue': round(revenue, 2),
-                'confidence': 0.85 - (month * 0.02)  # Confidence decreases over time
-            })
+        # Predict next 12 months as a single-scenario forecast
+        forecast = forecast_scenarios(current_revenue, growth_rate, churn_rate)
+        predictions = [
+            {'month': int(month), 'predicted_revenue': round(float(revenue), 2), 'confidence': float(confidence)}
+            for month, revenue, confidence in zip(forecast['months'], forecast['predicted_revenue'][0],
+                                                  forecast['confidence'])
+        ]
         
         return {
             'status': 'success',
@@ -582,7 +1030,8 @@ def predictive_analytics_dashboard(business_data):
             'summary': {
                 'projected_yearly_revenue': sum(p['predicted_revenue'] for p in predictions),
                 'growth_trajectory': 'positive' if growth_rate > churn_rate else 'negative',
-                'key_risks': ['Customer churn', 'Market competition'] if churn_rate > 0.1 else ['Market competition']
+                'key_risks': (['Customer churn', 'Market competition'] if churn_rate > 0.1 else ['Market competition'])
+                             + (['Revenue concentration'] if business_data.get('customer_concentration', 0) > 0.5 else [])
             }
         }
         
@@ -635,6 +1084,100 @@ def advanced_fraud_detection(transaction_data):
     except Exception as e:
         return {'status': 'error', 'message': str(e)}
 
+# Fraud model inputs by the column names train_fraud_detection_model fits on: (request key, default)
+FRAUD_MODEL_FEATURES = {
+    'amount': ('amount', 0.0),
+    'transaction_frequency_24h': ('transactions_24h', 0),
+    'ip_country_match': ('ip_country_match', 1),
+    'time_of_day_hour': ('hour', 12)
+}
+
+def _sigmoid(z):
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+class FraudModelServer:
+    """Online scoring with the trained fraud LogisticRegression, blended with the rule score
+    
+    The model is loaded once and reduced to its coefficient vector and
+    intercept, so a payment is scored with one dot product instead of a
+    predict_proba call. Without a model file the rule score is used alone.
+    """
+    
+    def __init__(self, model_path, model_weight=0.5):
+        self.model_path = model_path
+        self.model_weight = model_weight
+        self.coefficients = None  # float64 vector, in self.features order
+        self.intercept = 0.0
+        self.features = []  # (request key, default) per coefficient
+        self._loaded = False
+        self._lock = threading.Lock()
+    
+    @property
+    def available(self):
+        return self.coefficients is not None
+    
+    def load(self, model=None):
+        """Load the model file, or install ``model`` directly; returns whether a model is available"""
+        with self._lock:
+            try:
+                if model is None and os.path.exists(self.model_path):
+                    model = joblib.load(self.model_path)
+                if model is not None:
+                    self._install(model)
+                    logger.info(f"Fraud model loaded with features {[name for name, _ in self.features]}")
+            except Exception as e:
+                logger.error(f"Error loading fraud model: {e}")
+            self._loaded = True
+            return self.available
+    
+    def _install(self, model):
+        if list(model.classes_) != [0, 1] or model.coef_.shape[0] != 1:
+            raise ValueError('Fraud model must be a binary classifier with classes 0 and 1')
+        names = list(getattr(model, 'feature_names_in_', FRAUD_MODEL_FEATURES))
+        unknown = [name for name in names if name not in FRAUD_MODEL_FEATURES]
+        if unknown or len(names) != model.coef_.shape[1]:
+            raise ValueError(f"Fraud model features do not match: {names}")
+        self.features = [FRAUD_MODEL_FEATURES[name] for name in names]
+        self.intercept = float(model.intercept_[0])
+        self.coefficients = np.ascontiguousarray(model.coef_[0], dtype=np.float64)
+    
+    def probability(self, transaction_data):
+        """Model fraud probability of one transaction"""
+        x = np.array([float(transaction_data.get(key, default)) for key, default in self.features])
+        return _sigmoid(self.intercept + float(self.coefficients @ x))
+    
+    def probabilities(self, features):
+        """Fraud probability of each row of an (n, features) matrix in model feature order"""
+        z = np.asarray(features, dtype=np.float64) @ self.coefficients + self.intercept
+        return np.exp(-np.logaddexp(0.0, -z))
+    
+    def assess(self, transaction_data):
+        """Rule result with the model probability blended into fraud_score"""
+        if not self._loaded:
+            self.load()
+        result = advanced_fraud_detection(transaction_data)
+        if result.get('status') != 'success' or self.coefficients is None:
+            return result
+        
+        try:
+            probability = self.probability(transaction_data)
+        except (TypeError, ValueError) as e:
+            return {'status': 'error', 'message': str(e)}
+        
+        rule_score = result['fraud_score']
+        fraud_score = (1 - self.model_weight) * rule_score + self.model_weight * probability
+        return {
+            **result,
+            'fraud_score': fraud_score,
+            'is_fraud': fraud_score > 0.5,
+            'risk_level': 'high' if fraud_score > 0.7 else 'medium' if fraud_score > 0.3 else 'low',
+            'rule_score': rule_score,
+            'model_probability': probability
+        }
+
 def get_ai_insights():
     """Get general AI insights for dashboard"""
     return {
@@ -644,15 +1187,25 @@ def get_ai_insights():
         'last_training': datetime.now().strftime('%Y-%m-%d')
     }
 
-# Global analytics service instance
+# Global analytics service instance, created on first use
 _analytics_service = None
+_analytics_service_lock = threading.Lock()
 
 def get_analytics_service():
     """Get or create analytics service instance"""
     global _analytics_service
     if _analytics_service is None:
-        _analytics_service = AdvancedAnalyticsService()
+        with _analytics_service_lock:
+            if _analytics_service is None:
+                _analytics_service = AdvancedAnalyticsService(
+                    models_dir=os.getenv('MODELS_DIR', 'models'),
+                    inference_engine=os.getenv('INFERENCE_ENGINE', 'leaf_tables'),
+                    reload_interval=float(os.getenv('MODEL_RELOAD_INTERVAL', 5))
+                )
     return _analytics_service
 
-# Initialize analytics service
-analytics_service = get_analytics_service()
\ No newline at end of file
+# Global fraud model server; the model is loaded on first use (or by warm-up)
+fraud_model_server = FraudModelServer(
+    os.path.join(os.getenv('MODELS_DIR', 'models'), 'fraud_model.pkl'),
+    model_weight=float(os.getenv('FRAUD_MODEL_WEIGHT', 0.5))
+)
@@ -3,7 +3,7 @@ Flask application for AI services and machine learning endpoints
 Provides REST API for customer analytics, churn prediction, and insights
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 from datetime import datetime, timedelta
@@ -12,18 +12,37 @@ import json
 from dotenv import load_dotenv
 from apscheduler.schedulers.background import BackgroundScheduler
 import atexit
+import threading
 from io import BytesIO
 import logging
 
 # Import our services and models
-from database import db, ma, Customer, Product, Subscription, Invoice, Transaction, SupportTicket
-from database import customer_schema, customers_schema, subscription_schema, subscriptions_schema
-from database import invoice_schema, invoices_schema, transaction_schema, transactions_schema
-from ai_services import analytics_service, get_analytics_service
-from communication_services import communication_service
-from blockchain_services import blockchain_service
+from database import db, ma, Customer, Product, Invoice, Transaction, SupportTicket
+from database import customer_schema, subscription_schema, subscriptions_schema
+from database import invoice_schema, invoices_schema, transaction_schema
 from services import BillingService, CustomerService, AnalyticsService
 from database import DatabaseManager
+from training_jobs import TrainingJobManager
+from lazy_imports import LazyModule, LazyObject
+from score_refresh import ScoreRefreshJob, ai_score_columns
+from billing_run import BillingRun, ShardedBillingRun
+from dashboard_metrics import dashboard_metrics
+from metrics_publisher import MetricsPublisher
+from revenue_rollups import revenue_rollups
+from velocity import velocity_store
+from payment_ingestion import payment_ingestion
+from customer_search import customer_search, keyset_page, capped_count
+from customer_import import CustomerImport, FORMATS, read_rows, send_queued_emails
+from id_allocator import identifiers
+from serializers import customer_serializer, transaction_serializer, json_response
+
+# The ML, blockchain and communication stacks are imported on first use
+ai_services = LazyModule('ai_services')
+revenue_forecast = LazyModule('revenue_forecast')
+fraud_scoring = LazyModule('fraud_scoring')
+analytics_service = LazyObject('ai_services', 'get_analytics_service', call=True)
+communication_service = LazyObject('communication_services', 'communication_service')
+blockchain_service = LazyObject('blockchain_services', 'blockchain_service')
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -50,15 +69,48 @@ scheduler.start()
 atexit.register(lambda: scheduler.shutdown())
 
 # Initialize services
-analytics_service = get_analytics_service()
 billing_service = BillingService()
 customer_service = CustomerService()
 analytics_service_basic = AnalyticsService()
 db_manager = DatabaseManager()
+training_jobs = TrainingJobManager(lambda: analytics_service, socketio=socketio)
+atexit.register(training_jobs.shutdown)
+dashboard_metrics.reconcile_interval = float(os.getenv('DASHBOARD_METRICS_RECONCILE_SECONDS', 300))
+dashboard_metrics.install()
+revenue_rollups.install()
+velocity_store.install()
+billing_run = BillingRun(chunk_size=int(os.getenv('BILLING_RUN_CHUNK_SIZE', 1000)))
+score_refresh_job = ScoreRefreshJob(lambda: analytics_service, chunk_size=int(os.getenv('SCORE_REFRESH_CHUNK_SIZE', 500)))
+
+def warm_up_services(models=True):
+    """Load the in-memory stores, then import the ML stack and load models, in the background after startup"""
+    def warm_up():
+        try:
+            with app.app_context():
+                velocity_store.rebuild()
+                payment_ingestion.warm()
+        except Exception as e:
+            logger.error(f"Error warming up in-memory stores: {str(e)}")
+        if not models:
+            return
+        try:
+            analytics_service.warm_up(background=False)
+            ai_services.fraud_model_server.load()
+            logger.info("Analytics models warmed up")
+        except Exception as e:
+            logger.error(f"Error warming up analytics models: {str(e)}")
+    
+    thread = threading.Thread(target=warm_up, name='service-warmup', daemon=True)
+    thread.start()
+    return thread
 
 # Create tables
 with app.app_context():
     db.create_all()
+    db_manager.create_indexes()
+    customer_search.ensure_index()
+
+warmup_thread = warm_up_services(models=os.getenv('MODEL_WARMUP', 'true').lower() == 'true')
 
 # --- WebSocket Events ---
 @socketio.on('connect')
@@ -68,21 +120,44 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    metrics_publisher.unsubscribe(request.sid)
     print('Client disconnected')
 
+@socketio.on('subscribe_metrics')
+def handle_subscribe_metrics(data=None):
+    """Subscribe to pushed metric deltas, optionally for a subset of metrics"""
+    metrics = (data or {}).get('metrics')
+    emit('metrics_update', metrics_publisher.subscribe(request.sid, metrics))
+
+@socketio.on('unsubscribe_metrics')
+def handle_unsubscribe_metrics():
+    metrics_publisher.unsubscribe(request.sid)
+
 @socketio.on('get_real_time_metrics')
 def handle_real_time_metrics():
-    """Send real-time business metrics"""
-    metrics = {
-        'active_customers': Customer.query.filter_by(status='Active').count(),
-        'monthly_revenue': float(db.session.query(db.func.sum(Invoice.total_amount))
-                                .filter(Invoice.status == 'Paid')
-                                .filter(Invoice.invoice_date >= datetime.utcnow() - timedelta(days=30))
-                                .scalar() or 0),
-        'pending_invoices': Invoice.query.filter_by(status='Pending').count(),
-        'churn_risk_customers': Customer.query.filter_by(churn_risk_level='High').count()
+    """Send real-time business metrics, from the publisher's snapshot while it is fresh"""
+    emit('metrics_update', metrics_publisher.current())
+
+def _real_time_metrics():
+    """Metrics pushed to dashboards, read from the incrementally maintained cache"""
+    cached = dashboard_metrics.snapshot()
+    return {
+        'active_customers': cached['active_customers'],
+        'monthly_revenue': cached['monthly_revenue'],
+        'pending_invoices': cached['pending_invoices'],
+        'churn_risk_customers': cached['high_churn_risk'],
+        'total_customers': cached['total_customers'],
+        'total_revenue': cached['total_revenue'],
+        'crypto_transactions': cached['crypto_transactions'],
+        'crypto_volume': cached['crypto_volume']
     }
-    emit('metrics_update', metrics)
+
+metrics_publisher = MetricsPublisher(
+    socketio, app, _real_time_metrics,
+    interval=float(os.getenv('METRICS_PUSH_INTERVAL', 2)),
+    coalesce_window=float(os.getenv('METRICS_COALESCE_WINDOW', 0.25))
+)
+dashboard_metrics.add_listener(metrics_publisher.notify)
 
 # --- Enhanced API Endpoints ---
 
@@ -91,38 +166,29 @@ def handle_real_time_metrics():
 def get_dashboard_overview():
     """Get comprehensive dashboard overview"""
     try:
-        # Basic metrics
-        total_customers = Customer.query.count()
-        active_customers = Customer.query.filter_by(status='Active').count()
-        total_revenue = float(db.session.query(db.func.sum(Invoice.total_amount))
-                            .filter(Invoice.status == 'Paid').scalar() or 0)
-        
-        # AI insights
-        high_churn_risk = Customer.query.filter_by(churn_risk_level='High').count()
+        # Counters and sums are maintained incrementally by dashboard_metrics
+        metrics = dashboard_metrics.snapshot()
         
         # Recent transactions
-        recent_transactions = Transaction.query.order_by(Transaction.created_at.desc()).limit(10).all()
-        
-        # Blockchain metrics
-        crypto_transactions = Transaction.query.filter(Transaction.blockchain_tx_hash.isnot(None)).count()
-        crypto_volume = float(db.session.query(db.func.sum(Transaction.amount))
-                            .filter(Transaction.blockchain_tx_hash.isnot(None)).scalar() or 0)
+        recent_transactions = (Transaction.query.options(*transaction_serializer.eager_options())
+                               .order_by(Transaction.created_at.desc()).limit(10).all())
         
         overview = {
             'metrics': {
-                'total_customers': total_customers,
-                'active_customers': active_customers,
-                'total_revenue': total_revenue,
-                'high_churn_risk': high_churn_risk,
-                'crypto_transactions': crypto_transactions,
-                'crypto_volume': crypto_volume
+                'total_customers': metrics['total_customers'],
+                'active_customers': metrics['active_customers'],
+                'total_revenue': metrics['total_revenue'],
+                'high_churn_risk': metrics['high_churn_risk'],
+                'crypto_transactions': metrics['crypto_transactions'],
+                'crypto_volume': metrics['crypto_volume']
             },
-            'recent_transactions': transactions_schema.dump(recent_transactions),
+            'metrics_reconciled_at': metrics['reconciled_at'],
+            'recent_transactions': transaction_serializer.dump_many(recent_transactions),
             'ai_insights': ai_services.get_ai_insights() if hasattr(ai_services, 'get_ai_insights') else {},
             'generated_at': datetime.utcnow().isoformat()
         }
         
-        return jsonify(overview), 200
+        return json_response(overview)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -139,31 +205,18 @@ def health_check():
 @app.route('/api/ai/train-churn-model', methods=['POST'])
 def train_churn_model():
     """Train the churn prediction model"""
-    try:
-        # Get customer data from request or database
-        data = request.get_json()
-        
-        if 'customer_data' in data:
-            customer_data = data['customer_data']
-        else:
-            # Fetch from database
-            customer_data = customer_service.get_all_customers()
-        
-        # Train the model
-        result = analytics_service.train_churn_model(customer_data)
-        
-        return jsonify(result)
-        
-    except Exception as e:
-        logger.error(f"Error training churn model: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+    return _submit_training('churn')
 
 @app.route('/api/ai/train-cltv-model', methods=['POST'])
 def train_cltv_model():
     """Train the Customer Lifetime Value prediction model"""
+    return _submit_training('cltv')
+
+def _submit_training(model_type):
+    """Start a background training job, or train inline when ``async`` is false"""
     try:
         # Get customer data from request or database
-        data = request.get_json()
+        data = request.get_json() or {}
         
         if 'customer_data' in data:
             customer_data = data['customer_data']
@@ -171,15 +224,40 @@ def train_cltv_model():
             # Fetch from database
             customer_data = customer_service.get_all_customers()
         
-        # Train the model
-        result = analytics_service.train_cltv_model(customer_data)
+        n_jobs = data.get('n_jobs')
         
-        return jsonify(result)
+        if data.get('async', True) is False:
+            if model_type == 'churn':
+                result = analytics_service.train_churn_model(customer_data, n_jobs=n_jobs)
+            else:
+                result = analytics_service.train_cltv_model(customer_data, n_jobs=n_jobs)
+            return jsonify(result)
+        
+        job = training_jobs.submit(model_type, customer_data, n_jobs=n_jobs)
+        return jsonify({
+            'status': 'queued',
+            'job_id': job['job_id'],
+            'model_type': model_type,
+            'status_url': f"/api/ai/training-jobs/{job['job_id']}"
+        }), 202
         
     except Exception as e:
-        logger.error(f"Error training CLTV model: {str(e)}")
+        logger.error(f"Error training {model_type} model: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ai/training-jobs', methods=['GET'])
+def list_training_jobs():
+    """List background training jobs"""
+    return jsonify({'jobs': training_jobs.list_jobs()})
+
+@app.route('/api/ai/training-jobs/<job_id>', methods=['GET'])
+def get_training_job(job_id):
+    """Get the state of a background training job"""
+    job = training_jobs.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Training job not found'}), 404
+    return jsonify(job)
+
 @app.route('/api/ai/predict-churn', methods=['POST'])
 def predict_churn():
     """Predict churn probability for a customer"""
@@ -216,6 +294,50 @@ def predict_cltv():
         logger.error(f"Error predicting CLTV: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ai/predict-batch', methods=['POST'])
+def predict_batch():
+    """Predict churn and CLTV for many customers in one request"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('customer_data'), list):
+            return jsonify({'error': 'customer_data must be a list of customers'}), 400
+        
+        customer_data = data['customer_data']
+        models = data.get('models', ['churn', 'cltv'])
+        
+        batches = {}
+        if 'churn' in models:
+            batches['churn'] = analytics_service.predict_churn_batch(customer_data)
+        if 'cltv' in models:
+            batches['cltv'] = analytics_service.predict_cltv_batch(customer_data)
+        
+        # Model-level failures (e.g. untrained model) apply to the whole batch
+        for name, batch in batches.items():
+            if batch['status'] != 'success':
+                return jsonify({'status': 'error', 'model': name, 'message': batch['message']}), 400
+        
+        results = []
+        for i, customer in enumerate(customer_data):
+            row = {
+                'index': i,
+                'customer_id': customer.get('id') if isinstance(customer, dict) else None
+            }
+            for name, batch in batches.items():
+                row[name] = batch['results'][i]
+            results.append(row)
+        
+        return jsonify({
+            'status': 'success',
+            'count': len(results),
+            'results': results,
+            'generated_at': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in batch prediction: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/ai/customer-insights/<customer_id>', methods=['GET'])
 def get_customer_insights(customer_id):
     """Get comprehensive insights for a specific customer"""
@@ -262,18 +384,22 @@ def get_batch_insights():
         
         customer_ids = data['customer_ids']
         insights = {}
+        found = []
         
         for customer_id in customer_ids:
             try:
                 customer_data = customer_service.get_customer_by_id(customer_id)
                 if customer_data:
-                    customer_insights = analytics_service.get_customer_insights(customer_id, customer_data)
-                    insights[customer_id] = customer_insights
+                    found.append((customer_id, customer_data))
                 else:
                     insights[customer_id] = {'error': 'Customer not found'}
             except Exception as e:
                 insights[customer_id] = {'error': str(e)}
         
+        # Score every found customer in one batched model pass
+        if found:
+            insights.update(analytics_service.get_batch_customer_insights(found))
+        
         return jsonify(insights)
         
     except Exception as e:
@@ -360,51 +486,60 @@ def get_customers():
     """Get customers with advanced filtering and AI insights"""
     try:
         # Query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
+        cursor = request.args.get('cursor')
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 500)
         search = request.args.get('search', '')
         churn_risk = request.args.get('churn_risk', '')
         segment = request.args.get('segment', '')
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
         
         # Build query
-        query = Customer.query
-        
-        if search:
-            query = query.filter(
-                db.or_(
-                    Customer.name.contains(search),
-                    Customer.email.contains(search),
-                    Customer.customer_code.contains(search)
-                )
-            )
+        query = customer_search.filter(Customer.query, search)
         
         if churn_risk:
             query = query.filter(Customer.churn_risk_level == churn_risk)
         
-        # Paginate results
-        customers_paginated = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        if segment:
+            query = query.filter(Customer.customer_segment == segment)
         
-        # Add AI insights for each customer
-        customers_data = customers_schema.dump(customers_paginated.items)
+        # Keyset pagination on (created_at, id): no OFFSET scan and no COUNT(*)
+        try:
+            page = keyset_page(query, per_page, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        customers = page['items']
+        
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more']
+        }
+        if include_total:
+            if search or churn_risk or segment:
+                pagination.update(capped_count(query, int(os.getenv('CUSTOMER_COUNT_CAP', 10000))))
+            else:
+                pagination.update(total=dashboard_metrics.snapshot()['total_customers'], total_is_estimate=False)
+        
+        # Serve the stored AI columns; live rescoring is opt-in and batched per page
+        if request.args.get('rescore', 'false').lower() == 'true':
+            _rescore_customers(customers)
+        
+        customers_data = customer_serializer.dump_many(customers)
         for customer_data in customers_data:
-            # Add AI-generated insights
             customer_data['ai_insights'] = {
-                'ltv_prediction': ai_services.predict_customer_lifetime_value(customer_data),
-                'churn_analysis': ai_services.advanced_churn_prediction(customer_data),
+                'churn_risk_score': customer_data.get('churn_risk_score'),
+                'churn_risk_level': customer_data.get('churn_risk_level'),
+                'lifetime_value': customer_data.get('lifetime_value'),
+                'customer_segment': customer_data.get('customer_segment'),
+                'scored_at': customer_data.get('ai_scored_at'),
                 'next_best_action': _get_next_best_action(customer_data)
             }
         
-        return jsonify({
+        return json_response({
             'customers': customers_data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': customers_paginated.total,
-                'pages': customers_paginated.pages
-            }
-        }), 200
+            'pagination': pagination,
+            'ai_scores': _score_freshness(customers)
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -426,11 +561,14 @@ def get_customer(customer_id):
 def get_models_status():
     """Get status of trained models"""
     try:
+        analytics_service.ensure_models_loaded()
         status = {
             'churn_model': analytics_service.churn_model is not None,
             'cltv_model': analytics_service.cltv_model is not None,
             'scaler': analytics_service.scaler is not None,
             'models_directory': analytics_service.models_dir,
+            'model_versions': analytics_service.model_versions,
+            'inference_engine': analytics_service.inference_engine,
             'timestamp': datetime.now().isoformat()
         }
         
@@ -440,6 +578,47 @@ def get_models_status():
         logger.error(f"Error getting models status: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/models/registry', methods=['GET'])
+def get_model_registry():
+    """List published model versions"""
+    try:
+        analytics_service.ensure_models_loaded()
+        registry = analytics_service.registry
+        return jsonify({
+            model_type: {
+                'current_version': registry.current_version(model_type),
+                'loaded_version': analytics_service.model_versions.get(model_type),
+                'versions': registry.list_versions(model_type)
+            }
+            for model_type in ['churn', 'cltv']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error listing model registry: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models/<model_type>/promote', methods=['POST'])
+def promote_model_version(model_type):
+    """Promote a published model version; every worker hot-reloads it"""
+    try:
+        data = request.get_json() or {}
+        if model_type not in ['churn', 'cltv'] or not data.get('version'):
+            return jsonify({'error': 'Valid model type and version are required'}), 400
+        
+        analytics_service.registry.promote(model_type, data['version'])
+        reloaded = analytics_service.reload_if_promoted()
+        
+        return jsonify({
+            'status': 'success',
+            'model_type': model_type,
+            'current_version': data['version'],
+            'reloaded': model_type in reloaded
+        })
+        
+    except Exception as e:
+        logger.error(f"Error promoting model version: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/customers', methods=['POST'])
 def create_customer():
     """Create new customer with AI-powered onboarding"""
@@ -452,9 +631,10 @@ def create_customer():
             return jsonify({'error': 'Missing required fields'}), 400
         
         # Create customer
+        tenant_id = data.get('tenant_id', 'default')
         customer = Customer(
-            tenant_id=data.get('tenant_id', 'default'),
-            customer_code=f"CUST-{datetime.utcnow().strftime('%Y%m%d')}-{Customer.query.count() + 1:04d}",
+            tenant_id=tenant_id,
+            customer_code=identifiers.allocate_one('customer_code', tenant_id),
             name=data['name'],
             email=data['email'],
             phone=data.get('phone'),
@@ -510,13 +690,41 @@ def create_customer():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/customers/import', methods=['POST'])
+def import_customers():
+    """Bulk import customers from an NDJSON or CSV request body, streaming progress as NDJSON"""
+    try:
+        fmt = request.args.get('format') or ('csv' if 'csv' in (request.content_type or '') else 'ndjson')
+        if fmt not in FORMATS:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        
+        importer = CustomerImport(
+            chunk_size=request.args.get('chunk_size', int(os.getenv('CUSTOMER_IMPORT_CHUNK_SIZE', 1000)), type=int)
+        )
+        reports = importer.stream(
+            read_rows(request.stream, fmt),
+            tenant_id=request.args.get('tenant_id', 'default'),
+            send_welcome_email=request.args.get('send_welcome_email', 'true').lower() == 'true'
+        )
+        
+        def generate():
+            for report in reports:
+                if report['type'] == 'chunk':
+                    socketio.emit('customer_import_progress', {key: report[key] for key in ['chunk', 'last_line', 'imported', 'failed']})
+                yield json.dumps(report) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Advanced AI/ML Endpoints
 @app.route('/api/ai/customer-segmentation', methods=['POST'])
 def perform_customer_segmentation():
     """Perform AI-powered customer segmentation"""
     try:
         customers = Customer.query.all()
-        customers_data = customers_schema.dump(customers)
+        customers_data = customer_serializer.dump_many(customers)
         
         segmentation_result = ai_services.customer_segmentation(customers_data)
         
@@ -569,17 +777,20 @@ def optimize_pricing():
 def get_predictive_analytics():
     """Get comprehensive predictive analytics"""
     try:
-        # Gather business data
+        tenant_id = request.args.get('tenant_id')
+        metrics = dashboard_metrics.snapshot()
+        growth_rate = revenue_rollups.growth_rate(tenant_id)
+        customer_concentration = revenue_rollups.customer_concentration(tenant_id)
+        
+        # Gather business data from the revenue rollups; fall back to the old defaults without history
         business_data = {
-            'current_monthly_revenue': float(db.session.query(db.func.sum(Invoice.total_amount))
-                                           .filter(Invoice.status == 'Paid')
-                                           .filter(Invoice.invoice_date >= datetime.utcnow() - timedelta(days=30))
-                                           .scalar() or 0),
-            'current_churn_rate': Customer.query.filter_by(churn_risk_level='High').count() / max(Customer.query.count(), 1),
-            'growth_rate': 0.05,  # This would be calculated from historical data
-            'customer_concentration': 0.25,  # Top 10% of customers' revenue share
+            'current_monthly_revenue': revenue_rollups.revenue_since((datetime.utcnow() - timedelta(days=30)).date(), tenant_id),
+            'current_churn_rate': metrics['high_churn_risk'] / max(metrics['total_customers'], 1),
+            'growth_rate': growth_rate if growth_rate is not None else 0.05,
+            'customer_concentration': customer_concentration if customer_concentration is not None else 0.25,
             'market_growth_rate': 0.08,
-            'competitive_intensity': 0.6
+            'competitive_intensity': 0.6,
+            'monthly_history': revenue_rollups.monthly(12, tenant_id)
         }
         
         analytics = ai_services.predictive_analytics_dashboard(business_data)
@@ -594,6 +805,62 @@ def get_predictive_analytics():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ai/revenue-forecast', methods=['POST'])
+def forecast_revenue_scenarios():
+    """Forecast monthly revenue for a batch of growth/churn scenarios"""
+    try:
+        data = request.get_json() or {}
+        tenant_id = data.get('tenant_id')
+        current_revenue = data.get('current_monthly_revenue')
+        if current_revenue is None:
+            current_revenue = revenue_rollups.revenue_since((datetime.utcnow() - timedelta(days=30)).date(), tenant_id)
+        
+        if 'growth_rates' not in data or 'churn_rates' not in data:
+            return jsonify({'error': 'growth_rates and churn_rates are required'}), 400
+        
+        result = revenue_forecast.forecast_request(
+            current_revenue, data['growth_rates'], data['churn_rates'],
+            grid=bool(data.get('grid', False)),
+            horizon=data.get('horizon', 12),
+            volatility=data.get('volatility'),
+            confidence_level=float(data.get('confidence_level', 0.8)),
+            max_scenarios=int(os.getenv('FORECAST_MAX_SCENARIOS', 20000)),
+            max_horizon=int(os.getenv('FORECAST_MAX_HORIZON', 120)),
+            max_points=int(os.getenv('FORECAST_MAX_POINTS', 240000))
+        )
+        if result['status'] == 'error':
+            return jsonify({'error': result['message']}), 400
+        
+        return jsonify({
+            'status': 'success',
+            'tenant_id': tenant_id,
+            'forecast': result,
+            'generated_at': datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ai/fraud-scores', methods=['POST'])
+def score_fraud_batch():
+    """Fraud-score columns of transactions, or rescore stored ones in a date range"""
+    try:
+        data = request.get_json() or {}
+        
+        result = fraud_scoring.fraud_request(
+            columns=data.get('transactions'),
+            since=data.get('since'),
+            until=data.get('until'),
+            max_rows=int(os.getenv('FRAUD_BATCH_MAX_ROWS', 1000000))
+        )
+        if result['status'] == 'error':
+            return jsonify({'error': result['message']}), 400
+        
+        return json_response({**result, 'generated_at': datetime.utcnow().isoformat()})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Enhanced Blockchain Endpoints
 @app.route('/api/blockchain/wallets', methods=['POST'])
 def create_blockchain_wallet():
@@ -626,38 +893,31 @@ def process_crypto_payment():
         required_fields = ['customer_id', 'invoice_id', 'amount_usd', 'network', 'sender_address', 'receiver_address']
         if not all(field in data for field in required_fields):
             return jsonify({'error': 'Missing required fields'}), 400
+        if request.headers.get('Idempotency-Key'):
+            data['idempotency_key'] = request.headers['Idempotency-Key']
+        
+        # Retries are answered from the first request's stored outcome
+        replayed = payment_ingestion.replay(data)
+        if replayed is not None:
+            return jsonify(replayed[0]), replayed[1]
         
         # Fraud detection
-        fraud_analysis = ai_services.advanced_fraud_detection({
+        fraud_analysis = ai_services.fraud_model_server.assess({
             'amount': data['amount_usd'],
             'customer_id': data['customer_id'],
             'payment_method': data['network'],
             'hour': datetime.utcnow().hour,
-            'transactions_24h': Transaction.query.filter(
-                Transaction.customer_id == data['customer_id'],
-                Transaction.created_at >= datetime.utcnow() - timedelta(hours=24)
-            ).count()
+            'ip_country_match': int(data.get('ip_country_match', 1)),
+            **velocity_store.features(data['customer_id'])
         })
         
-        if fraud_analysis.get('is_fraud', False):
-            return jsonify({
-                'status': 'blocked',
-                'reason': 'Transaction blocked due to fraud detection',
-                'fraud_analysis': fraud_analysis
-            }), 403
-        
-        # Process payment
-        payment_result = blockchain_service.process_crypto_payment(
-            data['customer_id'],
-            data['invoice_id'],
-            data['amount_usd'],
-            data['network'],
-            data['sender_address'],
-            data['receiver_address']
+        # Record the attempt (blocked ones too) and process it
+        payment_result, status_code = payment_ingestion.ingest(
+            data, fraud_analysis, blockchain_service.process_crypto_payment
         )
         
         # Real-time notification
-        if payment_result['status'] == 'success':
+        if status_code == 200 and not payment_result.get('idempotent_replay'):
             socketio.emit('payment_processed', {
                 'customer_id': data['customer_id'],
                 'amount': data['amount_usd'],
@@ -665,9 +925,10 @@ def process_crypto_payment():
                 'tx_hash': payment_result.get('tx_hash')
             })
         
-        return jsonify(payment_result), 200 if payment_result['status'] == 'success' else 400
+        return jsonify(payment_result), status_code
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/blockchain/defi-opportunities', methods=['GET'])
@@ -779,7 +1040,8 @@ def download_invoice_pdf(invoice_id):
 def trigger_invoice_automation():
     """Trigger automated invoice generation"""
     try:
-        result = _automate_invoice_generation()
+        data = request.get_json(silent=True) or {}
+        result = _automate_invoice_generation(shards=data.get('shards'))
         
         # Real-time notification
         socketio.emit('automation_completed', {
@@ -829,85 +1091,112 @@ def trigger_churn_prevention():
         return jsonify({'error': str(e)}), 500
 
 # Scheduled Tasks
-def _automate_invoice_generation():
+def _automate_invoice_generation(shards=None):
     """Automated invoice generation for subscriptions"""
     try:
+        shards = shards or int(os.getenv('BILLING_SHARDS', 1))
+        if shards > 1:
+            return ShardedBillingRun(
+                app.config['SQLALCHEMY_DATABASE_URI'], socketio=socketio, shard_count=shards,
+                shard_by=os.getenv('BILLING_SHARD_BY', 'customer'),
+                chunk_size=billing_run.chunk_size
+            ).run()
+        
         with app.app_context():
-            # Find subscriptions due for billing
-            due_subscriptions = Subscription.query.filter(
-                Subscription.status == 'Active',
-                Subscription.auto_renew == True,
-                Subscription.next_billing_date <= datetime.utcnow() + timedelta(days=5)
-            ).all()
-            
-            generated_count = 0
-            for subscription in due_subscriptions:
-                # Check if invoice already exists for this billing cycle
-                existing_invoice = Invoice.query.filter(
-                    Invoice.customer_id == subscription.customer_id,
-                    Invoice.status.in_(['Draft', 'Sent', 'Pending']),
-                    Invoice.invoice_date >= subscription.next_billing_date - timedelta(days=5)
-                ).first()
-                
-                if not existing_invoice:
-                    # Generate invoice
-                    invoice = Invoice(
-                        customer_id=subscription.customer_id,
-                        invoice_number=f"INV-{datetime.utcnow().strftime('%Y%m%d')}-{Invoice.query.count() + 1:04d}",
-                        subtotal=subscription.amount,
-                        total_amount=subscription.amount,
-                        due_date=subscription.next_billing_date + timedelta(days=7),
-                        ai_generated=True,
-                        auto_sent=True
-                    )
-                    
-                    db.session.add(invoice)
-                    
-                    # Update subscription next billing date
-                    if subscription.billing_cycle == 'monthly':
-                        subscription.next_billing_date = subscription.next_billing_date + timedelta(days=30)
-                    elif subscription.billing_cycle == 'yearly':
-                        subscription.next_billing_date = subscription.next_billing_date + timedelta(days=365)
-                    
-                    generated_count += 1
-            
-            db.session.commit()
-            
-            return {
-                'status': 'success',
-                'invoices_generated': generated_count,
-                'processed_at': datetime.utcnow().isoformat()
-            }
+            return billing_run.run()
             
     except Exception as e:
-        db.session.rollback()
         return {'status': 'error', 'message': str(e)}
 
 def _update_customer_ai_scores():
-    """Update AI scores for all customers"""
+    """Rescore customers changed since the last run, resuming an interrupted run"""
     try:
         with app.app_context():
-            customers = Customer.query.all()
+            result = score_refresh_job.run()
+            print(f"AI score refresh: {result}")
             
-            for customer in customers:
-                customer_data = customer_schema.dump(customer)
-                
-                # Update churn prediction
-                churn_analysis = ai_services.advanced_churn_prediction(customer_data)
-                customer.churn_risk_score = churn_analysis.get('churn_probability', 0.0)
-                customer.churn_risk_level = churn_analysis.get('risk_level', 'Low')
-                
-                # Update lifetime value
-                ltv_analysis = ai_services.predict_customer_lifetime_value(customer_data)
-                customer.lifetime_value = ltv_analysis.get('predicted_ltv', 0.0)
+    except Exception as e:
+        print(f"Error updating AI scores: {e}")
+
+def _reconcile_dashboard_metrics():
+    """Recompute the cached dashboard metrics from the database"""
+    try:
+        with app.app_context():
+            dashboard_metrics.reconcile()
             
-            db.session.commit()
-            print(f"Updated AI scores for {len(customers)} customers")
+    except Exception as e:
+        print(f"Error reconciling dashboard metrics: {e}")
+
+def _rebuild_revenue_rollups():
+    """Recompute the revenue rollups, picking up bulk writes that bypassed the ORM"""
+    try:
+        with app.app_context():
+            result = revenue_rollups.rebuild()
+            print(f"Revenue rollup rebuild: {result}")
             
     except Exception as e:
-        print(f"Error updating AI scores: {e}")
+        print(f"Error rebuilding revenue rollups: {e}")
+
+def _rebuild_velocity_store():
+    """Reload the fraud velocity windows, picking up other workers' payments"""
+    try:
+        with app.app_context():
+            velocity_store.rebuild()
+            
+    except Exception as e:
+        print(f"Error rebuilding velocity store: {e}")
+
+def _send_queued_emails():
+    """Send welcome emails queued by bulk imports"""
+    try:
+        with app.app_context():
+            result = send_queued_emails(communication_service)
+            if result.get('sent') or result.get('failed'):
+                print(f"Queued emails: {result}")
+            
+    except Exception as e:
+        print(f"Error sending queued emails: {e}")
 
 # Helper functions
+def _apply_ai_scores(customer, churn_result, cltv_result, scored_at):
+    """Store churn and CLTV predictions in a customer's AI columns"""
+    columns = ai_score_columns(churn_result, cltv_result)
+    if columns:
+        for column, value in columns.items():
+            setattr(customer, column, value)
+        customer.ai_scored_at = scored_at
+        customer.updated_at = scored_at
+
+def _rescore_customers(customers):
+    """Rescore a page of customers with one batch call per model and store the results"""
+    customers_data = customer_serializer.dump_many(customers)
+    churn_batch = analytics_service.predict_churn_batch(customers_data)
+    cltv_batch = analytics_service.predict_cltv_batch(customers_data)
+    if churn_batch['status'] != 'success' and cltv_batch['status'] != 'success':
+        return
+    
+    scored_at = datetime.utcnow()
+    for i, customer in enumerate(customers):
+        churn_result = churn_batch['results'][i] if churn_batch['status'] == 'success' else churn_batch
+        cltv_result = cltv_batch['results'][i] if cltv_batch['status'] == 'success' else cltv_batch
+        _apply_ai_scores(customer, churn_result, cltv_result, scored_at)
+    db.session.commit()
+
+def _score_freshness(customers):
+    """How old the stored AI scores on a page are"""
+    max_age = timedelta(hours=float(os.getenv('AI_SCORE_MAX_AGE_HOURS', 24)))
+    now = datetime.utcnow()
+    scored_at = [customer.ai_scored_at for customer in customers if customer.ai_scored_at]
+    oldest = min(scored_at) if scored_at else None
+    
+    return {
+        'oldest_scored_at': oldest.isoformat() if oldest else None,
+        'newest_scored_at': max(scored_at).isoformat() if scored_at else None,
+        'max_age_seconds': (now - oldest).total_seconds() if oldest else None,
+        'unscored': len(customers) - len(scored_at),
+        'stale': sum(1 for timestamp in scored_at if now - timestamp > max_age)
+    }
+
 def _get_next_best_action(customer_data):
     """Determine next best action for customer"""
     churn_risk = customer_data.get('churn_risk_level', 'Low')
@@ -939,6 +1228,35 @@ scheduler.add_job(
     id='ai_score_update'
 )
 
+scheduler.add_job(
+    func=_rebuild_revenue_rollups,
+    trigger="cron",
+    hour=3,  # Run daily at 3 AM
+    minute=0,
+    id='revenue_rollup_rebuild'
+)
+
+scheduler.add_job(
+    func=_send_queued_emails,
+    trigger="interval",
+    minutes=1,
+    id='email_outbox'
+)
+
+scheduler.add_job(
+    func=_rebuild_velocity_store,
+    trigger="interval",
+    seconds=velocity_store.reconcile_interval,
+    id='velocity_store_rebuild'
+)
+
+scheduler.add_job(
+    func=_reconcile_dashboard_metrics,
+    trigger="interval",
+    seconds=dashboard_metrics.reconcile_interval,
+    id='dashboard_metrics_reconcile'
+)
+
 # Root endpoint
 @app.route('/')
 def home():
@@ -959,6 +1277,8 @@ def home():
             'dashboard': '/api/dashboard/overview',
             'customers': '/api/customers',
             'ai_analytics': '/api/ai/predictive-analytics',
+            'revenue_forecast': '/api/ai/revenue-forecast',
+            'fraud_scores': '/api/ai/fraud-scores',
             'blockchain': '/api/blockchain/payments',
             'automation': '/api/automation/invoice-generation'
         }
@@ -0,0 +1,304 @@
+"""
+Set-based subscription billing run for BillChain AI
+
+Finds due subscriptions together with each customer's latest open invoice in
+one query, allocates invoice numbers in blocks from a database sequence, and
+writes invoices and next billing dates with bulk statements, one transaction
+per chunk.
+
+Large runs can be split into shards by customer id or tenant and billed by a
+process pool. Every invoice carries an idempotency key for its subscription
+cycle and subscriptions only advance from the date they were billed for, so
+shards commit independently and a partially failed run can simply be re-run.
+"""
+
+import os
+import time
+import zlib
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable
+import logging
+
+from database import db, Customer, Subscription, Invoice
+from id_allocator import identifiers
+
+logger = logging.getLogger(__name__)
+
+OPEN_INVOICE_STATUSES = ['Draft', 'Sent', 'Pending']
+BILLING_CYCLE_DAYS = {'monthly': 30, 'yearly': 365}
+SHARD_KEYS = ['customer', 'tenant']
+
+def invoice_idempotency_key(subscription_id: int, billing_date: datetime) -> str:
+    """Key identifying the invoice of one subscription billing cycle"""
+    return f"sub-{subscription_id}-{billing_date.strftime('%Y%m%d%H%M%S')}"
+
+def tenant_shard(tenant_id: str, shard_count: int) -> int:
+    """Stable shard of a tenant, the same in every process"""
+    return zlib.crc32((tenant_id or '').encode('utf-8')) % shard_count
+
+class BillingRun:
+    """Generates invoices for every subscription due within the lookahead window"""
+
+    def __init__(self, chunk_size: int = 1000, lookahead_days: int = 5, due_days: int = 7,
+                 shard: int = 0, shard_count: int = 1, shard_by: str = 'customer'):
+        if shard_by not in SHARD_KEYS:
+            raise ValueError(f"Unknown shard key: {shard_by}")
+        self.chunk_size = chunk_size
+        self.lookahead_days = lookahead_days
+        self.due_days = due_days
+        self.shard = shard
+        self.shard_count = shard_count
+        self.shard_by = shard_by
+
+    def run(self, now: Optional[datetime] = None, progress: Optional[Callable] = None) -> Dict[str, Any]:
+        """Bill all due subscriptions (of this shard) and report throughput
+
+        ``progress(generated, total)`` is called after every committed chunk.
+        """
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+        try:
+            due = self._due_subscriptions(now)
+            generated = 0
+            chunks = 0
+            for start in range(0, len(due), self.chunk_size):
+                generated += self._bill_chunk(due[start:start + self.chunk_size], now)
+                chunks += 1
+                if progress is not None:
+                    progress(generated, len(due))
+
+            duration = time.perf_counter() - started
+            logger.info(f"Billing run generated {generated} invoices in {duration:.2f}s")
+            return {
+                'status': 'success',
+                'shard': self.shard,
+                'invoices_generated': generated,
+                'chunks': chunks,
+                'duration_seconds': round(duration, 3),
+                'invoices_per_second': round(generated / duration, 1) if duration else None,
+                'processed_at': datetime.utcnow().isoformat()
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error in billing run: {e}")
+            return {'status': 'error', 'message': str(e)}
+
+    def _due_subscriptions(self, now: datetime) -> List[Any]:
+        """Due subscriptions that are not already covered by an open invoice"""
+        last_open_invoice = (
+            db.select(Invoice.customer_id, db.func.max(Invoice.invoice_date).label('invoice_date'))
+            .where(Invoice.status.in_(OPEN_INVOICE_STATUSES))
+            .group_by(Invoice.customer_id)
+            .subquery()
+        )
+        query = (
+            db.select(
+                Subscription.id, Subscription.customer_id, Subscription.amount,
+                Subscription.billing_cycle, Subscription.next_billing_date,
+                last_open_invoice.c.invoice_date
+            )
+            .outerjoin(last_open_invoice, last_open_invoice.c.customer_id == Subscription.customer_id)
+            .where(
+                Subscription.status == 'Active',
+                Subscription.auto_renew == True,
+                Subscription.next_billing_date <= now + timedelta(days=self.lookahead_days)
+            )
+            .order_by(Subscription.id)
+        )
+        if self.shard_count > 1 and self.shard_by == 'customer':
+            query = query.where(Subscription.customer_id % self.shard_count == self.shard)
+        if (self.shard_count > 1 and self.shard_by == 'tenant') or identifiers.tenant_scoped('invoice_number'):
+            query = query.add_columns(Customer.tenant_id).join(Customer, Customer.id == Subscription.customer_id)
+        rows = db.session.execute(query).all()
+
+        # The per-cycle date comparison stays in Python to keep the query portable;
+        # a customer gets at most one invoice per run
+        due = []
+        billed_customers = set()
+        for row in rows:
+            if self.shard_count > 1 and self.shard_by == 'tenant' and tenant_shard(row.tenant_id, self.shard_count) != self.shard:
+                continue
+            cycle_start = row.next_billing_date - timedelta(days=self.lookahead_days)
+            if row.invoice_date is not None and row.invoice_date >= cycle_start:
+                continue
+            if row.customer_id in billed_customers:
+                continue
+            billed_customers.add(row.customer_id)
+            due.append(row)
+        return due
+
+    def _bill_chunk(self, subscriptions: List[Any], now: datetime) -> int:
+        """Insert a chunk of invoices and advance its subscriptions in one transaction"""
+        invoice_numbers = self._invoice_numbers(subscriptions, now)
+
+        invoices = []
+        advanced = []
+        for invoice_number, subscription in zip(invoice_numbers, subscriptions):
+            invoices.append({
+                'customer_id': subscription.customer_id,
+                'invoice_number': invoice_number,
+                'subtotal': subscription.amount,
+                'total_amount': subscription.amount,
+                'due_date': subscription.next_billing_date + timedelta(days=self.due_days),
+                'invoice_date': now,
+                'ai_generated': True,
+                'auto_sent': True,
+                'idempotency_key': invoice_idempotency_key(subscription.id, subscription.next_billing_date),
+                'created_at': now,
+                'updated_at': now
+            })
+            cycle_days = BILLING_CYCLE_DAYS.get(subscription.billing_cycle)
+            if cycle_days:
+                advanced.append({
+                    'subscription_id': subscription.id,
+                    'billed_date': subscription.next_billing_date,
+                    'next_date': subscription.next_billing_date + timedelta(days=cycle_days)
+                })
+
+        inserted = db.session.execute(_insert_ignoring_duplicates(Invoice.__table__, 'idempotency_key'), invoices).rowcount
+        if advanced:
+            # Only advance from the date that was billed, so a replayed chunk cannot skip a cycle
+            subscriptions_table = Subscription.__table__
+            db.session.execute(
+                subscriptions_table.update()
+                .where(subscriptions_table.c.id == db.bindparam('subscription_id'))
+                .where(subscriptions_table.c.next_billing_date == db.bindparam('billed_date'))
+                .values(next_billing_date=db.bindparam('next_date'), updated_at=now),
+                advanced
+            )
+        db.session.commit()
+        return inserted if inserted is not None and inserted >= 0 else len(invoices)
+
+    def _invoice_numbers(self, subscriptions: List[Any], now: datetime) -> List[str]:
+        """One invoice number per subscription, from each tenant's sequence when the format is per tenant"""
+        if not identifiers.tenant_scoped('invoice_number'):
+            return identifiers.allocate('invoice_number', len(subscriptions), now=now)
+        by_tenant = {}
+        for subscription in subscriptions:
+            by_tenant.setdefault(subscription.tenant_id, []).append(subscription)
+        numbers = {}
+        for tenant_id, tenant_subscriptions in by_tenant.items():
+            allocated = identifiers.allocate('invoice_number', len(tenant_subscriptions), tenant_id, now)
+            numbers.update(zip((subscription.id for subscription in tenant_subscriptions), allocated))
+        return [numbers[subscription.id] for subscription in subscriptions]
+
+def _insert_ignoring_duplicates(table, key_column: str):
+    """INSERT that skips rows whose idempotency key already exists, where the dialect supports it"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return table.insert()
+    return insert(table).on_conflict_do_nothing(index_elements=[key_column])
+
+def run_billing_shard(database_uri: str, shard: int, shard_count: int, shard_by: str,
+                      now: datetime, chunk_size: int, run_id: str, progress_queue) -> Dict[str, Any]:
+    """Bill one shard inside a pool worker, with its own app and connection pool"""
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    def report(generated, total):
+        if progress_queue is not None:
+            progress_queue.put((run_id, shard, generated, total))
+
+    with app.app_context():
+        billing_run = BillingRun(chunk_size=chunk_size, shard=shard, shard_count=shard_count, shard_by=shard_by)
+        result = billing_run.run(now=now, progress=report)
+        db.engine.dispose()
+    return result
+
+class ShardedBillingRun:
+    """Splits a billing run into shards and bills them in a process pool"""
+
+    def __init__(self, database_uri: str, socketio=None, shard_count: Optional[int] = None,
+                 max_workers: Optional[int] = None, shard_by: str = 'customer', chunk_size: int = 1000):
+        if shard_by not in SHARD_KEYS:
+            raise ValueError(f"Unknown shard key: {shard_by}")
+        self.database_uri = database_uri
+        self.socketio = socketio
+        self.max_workers = max_workers or int(os.getenv('BILLING_WORKERS', os.cpu_count() or 1))
+        self.shard_count = shard_count or self.max_workers
+        self.shard_by = shard_by
+        self.chunk_size = chunk_size
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Bill every shard; failed shards are reported and can be re-run safely"""
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+        run_id = uuid.uuid4().hex
+        mp_manager = multiprocessing.Manager()
+        progress_queue = mp_manager.Queue()
+        listener = threading.Thread(target=self._listen_for_progress, args=(progress_queue,), daemon=True)
+        listener.start()
+
+        shards = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(run_billing_shard, self.database_uri, shard, self.shard_count, self.shard_by,
+                                    now, self.chunk_size, run_id, progress_queue): shard
+                    for shard in range(self.shard_count)
+                }
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'status': 'error', 'message': str(e)}
+                    result['shard'] = futures[future]
+                    shards.append(result)
+                    self._emit('billing_run_shard_completed', {'run_id': run_id, **result})
+        finally:
+            progress_queue.put(None)
+            listener.join(timeout=5)
+            mp_manager.shutdown()
+
+        shards.sort(key=lambda result: result['shard'])
+        generated = sum(result.get('invoices_generated', 0) for result in shards)
+        failed = [result['shard'] for result in shards if result['status'] != 'success']
+        duration = time.perf_counter() - started
+        summary = {
+            'status': 'success' if not failed else 'partial',
+            'run_id': run_id,
+            'invoices_generated': generated,
+            'shard_count': self.shard_count,
+            'shard_by': self.shard_by,
+            'workers': self.max_workers,
+            'failed_shards': failed,
+            'shards': shards,
+            'duration_seconds': round(duration, 3),
+            'invoices_per_second': round(generated / duration, 1) if duration else None,
+            'processed_at': datetime.utcnow().isoformat()
+        }
+        self._emit('billing_run_completed', {key: value for key, value in summary.items() if key != 'shards'})
+        return summary
+
+    def _listen_for_progress(self, progress_queue):
+        while True:
+            try:
+                update = progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if update is None:
+                return
+            run_id, shard, generated, total = update
+            self._emit('billing_run_progress', {
+                'run_id': run_id, 'shard': shard, 'invoices_generated': generated, 'due': total
+            })
+
+    def _emit(self, event: str, payload: Dict[str, Any]):
+        if self.socketio is not None:
+            try:
+                self.socketio.emit(event, payload)
+            except Exception as e:
+                logger.error(f"Error emitting {event}: {e}")
@@ -5,7 +5,7 @@ Blockchain services for cryptocurrency payments and DeFi integration
 import hashlib
 import secrets
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -48,11 +48,17 @@ class BlockchainService:
     
     def process_crypto_payment(self, customer_id: int, invoice_id: int, 
                              amount_usd: float, network: str, 
-                             sender_address: str, receiver_address: str) -> Dict[str, Any]:
-        """Process cryptocurrency payment"""
+                             sender_address: str, receiver_address: str,
+                             idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Process cryptocurrency payment
+        
+        With an idempotency key the transaction hash is derived from it, so a
+        retried request produces the same hash instead of a second payment.
+        """
         try:
             # Mock blockchain transaction
-            tx_hash = f"0x{hashlib.sha256(f'{customer_id}{invoice_id}{amount_usd}{datetime.now()}'.encode()).hexdigest()}"
+            nonce = idempotency_key if idempotency_key is not None else datetime.now()
+            tx_hash = f"0x{hashlib.sha256(f'{customer_id}{invoice_id}{amount_usd}{nonce}'.encode()).hexdigest()}"
             
             return {
                 'status': 'success',
@@ -1,19 +1,26 @@
 from web3 import Web3
 from eth_account import Account
 from eth_account.signers.local import LocalAccount
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+from rpc_client import JsonRpcClient
 
 # This is a placeholder for actual blockchain interaction utilities.
 # In a real application, you would connect to specific blockchain nodes (e.g., Ethereum, Polygon, Binance Smart Chain)
 # using their RPC URLs and interact with deployed smart contracts.
 
 class BlockchainUtils:
-    def __init__(self, rpc_url: str = "http://127.0.0.1:8545"):
+    def __init__(self, rpc_url: str = "http://127.0.0.1:8545", pool_size: int = 10, max_batch_size: int = 100,
+                 gas_price_ttl: float = 5.0):
         """
         Initializes the Web3 connection.
         For production, use Infura, Alchemy, or a self-hosted node.
+        Reads and transaction fields go through a pooled, batching JSON-RPC client;
+        web3 shares its connection pool for contract calls.
         """
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.rpc = JsonRpcClient(rpc_url, pool_size=pool_size, max_batch_size=max_batch_size,
+                                 gas_price_ttl=gas_price_ttl)
+        self.w3 = Web3(Web3.HTTPProvider(rpc_url, session=self.rpc.session))
         if not self.w3.is_connected():
             print(f"Warning: Could not connect to Ethereum node at {rpc_url}. Please ensure it's running.")
             # Fallback or raise error depending on application requirements
@@ -23,6 +30,13 @@ class BlockchainUtils:
         """Checks if connected to the blockchain node."""
         return self.w3 is not None and self.w3.is_connected()
 
+    @property
+    def gas_price(self) -> Optional[int]:
+        """Current gas price in wei, cached for a few seconds."""
+        if self.w3 is None:
+            return None
+        return self.rpc.gas_price()
+
     def generate_wallet(self) -> Dict[str, str]:
         """Generates a new Ethereum wallet address and private key."""
         account = Account.create()
@@ -33,39 +47,64 @@ class BlockchainUtils:
 
     def get_balance(self, address: str) -> Optional[float]:
         """Gets the ETH balance of an address in Ether."""
-        if not self.is_connected():
+        if self.w3 is None:
             return None
         try:
-            balance_wei = self.w3.eth.get_balance(address)
-            return self.w3.from_wei(balance_wei, 'ether')
+            balance_wei = int(self.rpc.call('eth_getBalance', address, 'latest'), 16)
+            return Web3.from_wei(balance_wei, 'ether')
         except Exception as e:
             print(f"Error getting balance for {address}: {e}")
             return None
 
+    def get_balances(self, addresses: List[str]) -> Dict[str, Optional[float]]:
+        """
+        Gets the ETH balances of many addresses in Ether, with batched eth_getBalance calls.
+        Addresses the node could not answer for map to None.
+        """
+        if self.w3 is None:
+            return {address: None for address in addresses}
+        try:
+            balances = self.rpc.get_balances(addresses)
+            return {address: None if wei is None else Web3.from_wei(wei, 'ether')
+                    for address, wei in balances.items()}
+        except Exception as e:
+            print(f"Error getting balances for {len(addresses)} addresses: {e}")
+            return {address: None for address in addresses}
+
+    def get_transaction_count(self, address: str) -> Optional[int]:
+        """Gets the next nonce of an address, including pending transactions."""
+        if self.w3 is None:
+            return None
+        try:
+            return int(self.rpc.call('eth_getTransactionCount', address, 'pending'), 16)
+        except Exception as e:
+            print(f"Error getting transaction count for {address}: {e}")
+            return None
+
     def send_transaction(self, private_key: str, to_address: str, amount_ether: float, gas_limit: int = 21000) -> Optional[str]:
         """
         Sends ETH from one address to another.
         Returns the transaction hash.
+        The nonce and gas price come back in one batched request (the gas price is
+        usually cached), so sending takes two round trips at most.
         """
-        if not self.is_connected():
+        if self.w3 is None:
             return None
         try:
             account: LocalAccount = Account.from_key(private_key)
-            nonce = self.w3.eth.get_transaction_count(account.address)
-            gas_price = self.w3.eth.gas_price
+            nonce, gas_price = self.rpc.transaction_fields(account.address)
 
             transaction = {
                 'from': account.address,
                 'to': to_address,
-                'value': self.w3.to_wei(amount_ether, 'ether'),
+                'value': Web3.to_wei(amount_ether, 'ether'),
                 'gas': gas_limit,
                 'gasPrice': gas_price,
                 'nonce': nonce,
             }
 
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            return tx_hash.hex()
+            signed_txn = Account.sign_transaction(transaction, private_key)
+            return self.rpc.send_raw_transaction(Web3.to_hex(signed_txn.rawTransaction))
         except Exception as e:
             print(f"Error sending transaction: {e}")
             return None
@@ -75,12 +114,11 @@ class BlockchainUtils:
         Deploys a smart contract to the blockchain.
         Returns the contract address.
         """
-        if not self.is_connected():
+        if self.w3 is None:
             return None
         try:
             account: LocalAccount = Account.from_key(private_key)
-            nonce = self.w3.eth.get_transaction_count(account.address)
-            gas_price = self.w3.eth.gas_price
+            nonce, gas_price = self.rpc.transaction_fields(account.address)
 
             Contract = self.w3.eth.contract(abi=abi, bytecode=bytecode)
             construct_txn = Contract.constructor(*constructor_args).build_transaction({
@@ -103,7 +141,7 @@ class BlockchainUtils:
         Calls a smart contract method (state-changing or view).
         For state-changing methods, returns transaction hash. For view methods, returns the result.
         """
-        if not self.is_connected():
+        if self.w3 is None:
             return None
         try:
             contract = self.w3.eth.contract(address=contract_address, abi=abi)
@@ -115,8 +153,7 @@ class BlockchainUtils:
             else:
                 # This is a state-changing transaction
                 account: LocalAccount = Account.from_key(private_key)
-                nonce = self.w3.eth.get_transaction_count(account.address)
-                gas_price = self.w3.eth.gas_price
+                nonce, gas_price = self.rpc.transaction_fields(account.address)
 
                 transaction = method(*method_args).build_transaction({
                     'from': account.address,
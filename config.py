@@ -28,10 +28,50 @@ class Config:
     # Blockchain configuration
     ETHEREUM_RPC_URL = os.getenv('ETHEREUM_RPC_URL')
     BITCOIN_RPC_URL = os.getenv('BITCOIN_RPC_URL')
+    RPC_POOL_SIZE = int(os.getenv('RPC_POOL_SIZE', 10))  # pooled HTTP connections per node
+    RPC_MAX_BATCH_SIZE = int(os.getenv('RPC_MAX_BATCH_SIZE', 100))  # calls per JSON-RPC batch request
+    GAS_PRICE_TTL_SECONDS = float(os.getenv('GAS_PRICE_TTL_SECONDS', 5))  # how long a fetched gas price is reused
     
     # AI/ML configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     MODELS_DIR = os.getenv('MODELS_DIR', 'models')
+    INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'leaf_tables')  # sklearn, leaf_tables, compiled
+    MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', 5))  # seconds between registry checks
+    TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', 1))  # training job process pool size
+    TRAINING_N_JOBS = os.getenv('TRAINING_N_JOBS')  # parallel tree fitting per job
+    MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'true').lower() == 'true'  # load models in a background thread at startup
+    SCORE_REFRESH_CHUNK_SIZE = int(os.getenv('SCORE_REFRESH_CHUNK_SIZE', 500))  # customers per nightly rescoring chunk
+    AI_SCORE_MAX_AGE_HOURS = float(os.getenv('AI_SCORE_MAX_AGE_HOURS', 24))  # stored scores older than this are reported stale
+    
+    # Billing automation
+    BILLING_RUN_CHUNK_SIZE = int(os.getenv('BILLING_RUN_CHUNK_SIZE', 1000))  # invoices per billing run transaction
+    BILLING_SHARDS = int(os.getenv('BILLING_SHARDS', 1))  # >1 bills shards in a process pool
+    BILLING_SHARD_BY = os.getenv('BILLING_SHARD_BY', 'customer')  # customer, tenant
+    BILLING_WORKERS = os.getenv('BILLING_WORKERS')  # billing pool size, defaults to the CPU count
+    
+    # Dashboard
+    DASHBOARD_METRICS_RECONCILE_SECONDS = float(os.getenv('DASHBOARD_METRICS_RECONCILE_SECONDS', 300))  # full recount interval
+    METRICS_PUSH_INTERVAL = float(os.getenv('METRICS_PUSH_INTERVAL', 2))  # seconds between pushed metric snapshots
+    METRICS_COALESCE_WINDOW = float(os.getenv('METRICS_COALESCE_WINDOW', 0.25))  # delay that folds write bursts into one push
+    FORECAST_MAX_SCENARIOS = int(os.getenv('FORECAST_MAX_SCENARIOS', 20000))  # scenarios per revenue forecast request
+    FORECAST_MAX_HORIZON = int(os.getenv('FORECAST_MAX_HORIZON', 120))  # months per revenue forecast
+    FORECAST_MAX_POINTS = int(os.getenv('FORECAST_MAX_POINTS', 240000))  # scenarios x months per revenue forecast request
+    PAYMENT_DEDUP_CACHE_SIZE = int(os.getenv('PAYMENT_DEDUP_CACHE_SIZE', 10000))  # recent payment responses kept for retries
+    PAYMENT_DEDUP_BLOOM_CAPACITY = int(os.getenv('PAYMENT_DEDUP_BLOOM_CAPACITY', 1000000))  # keys before the filter's error rate rises
+    PAYMENT_CLAIM_LEASE_SECONDS = float(os.getenv('PAYMENT_CLAIM_LEASE_SECONDS', 120))  # before a stuck Pending payment can be retried
+    FRAUD_MODEL_WEIGHT = float(os.getenv('FRAUD_MODEL_WEIGHT', 0.5))  # share of the fraud model in the payment fraud score
+    FRAUD_BATCH_MAX_ROWS = int(os.getenv('FRAUD_BATCH_MAX_ROWS', 1000000))  # rows per bulk fraud scoring request
+    CUSTOMER_COUNT_CAP = int(os.getenv('CUSTOMER_COUNT_CAP', 10000))  # filtered customer totals stop counting here
+    CUSTOMER_IMPORT_CHUNK_SIZE = int(os.getenv('CUSTOMER_IMPORT_CHUNK_SIZE', 1000))  # customers per bulk import transaction
+    VELOCITY_BUCKET_SECONDS = int(os.getenv('VELOCITY_BUCKET_SECONDS', 60))  # fraud velocity window precision
+    VELOCITY_RECONCILE_SECONDS = float(os.getenv('VELOCITY_RECONCILE_SECONDS', 300))  # velocity reload from transactions
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'json')  # orjson for faster list responses when installed
+    
+    # Identifiers
+    ID_ALLOCATOR = os.getenv('ID_ALLOCATOR', 'table')  # table, hilo, sequence (PostgreSQL)
+    ID_BLOCK_SIZE = int(os.getenv('ID_BLOCK_SIZE', 100))  # numbers leased per block by the hilo allocator
+    CUSTOMER_CODE_FORMAT = os.getenv('CUSTOMER_CODE_FORMAT', 'CUST-{date:%Y%m%d}-{number:06d}')  # {tenant} numbers each tenant separately
+    INVOICE_NUMBER_FORMAT = os.getenv('INVOICE_NUMBER_FORMAT', 'INV-{date:%Y%m%d}-{number:04d}')  # fields: tenant, date, number
     
     # Other APIs
     COINGECKO_API_KEY = os.getenv('COINGECKO_API_KEY')
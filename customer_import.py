@@ -0,0 +1,270 @@
+"""
+Streaming bulk customer import for BillChain AI
+
+Reads NDJSON or CSV from a stream, validates rows in chunks and writes
+each chunk with one bulk INSERT and one commit. Customer codes come in
+blocks from the identifier allocator instead of a COUNT(*) per customer. AI
+scoring is left to the incremental score refresh (imported rows have no
+ai_scored_at yet) and welcome emails go to the email outbox in the same
+transaction, so neither slows the import down. Bad rows are reported with
+their line number and skipped; the rest of the stream carries on.
+"""
+
+import io
+import re
+import csv
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, Iterable, List, Optional, Tuple
+import logging
+
+from database import db, Customer, EmailOutbox
+from id_allocator import identifiers
+from revenue_rollups import revenue_rollups
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ['ndjson', 'csv']
+IMPORT_FIELDS = [
+    'tenant_id', 'customer_code', 'name', 'email', 'phone', 'address', 'country', 'company_name',
+    'industry', 'account_type', 'status', 'preferred_currency', 'communication_preferences'
+]
+REQUIRED_FIELDS = ['name', 'email']
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+def read_rows(stream, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """(line number, row) pairs from a binary stream; unparsable lines yield an Exception"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown import format: {fmt}")
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key is not None}
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+def validate_row(row, tenant_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Column values for one import row, or the reason it is rejected"""
+    if isinstance(row, Exception):
+        return None, f"Invalid JSON: {row}"
+    if not isinstance(row, dict):
+        return None, 'Row must be an object'
+
+    values = {}
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if value is not None:
+            values[field] = value
+
+    missing = [field for field in REQUIRED_FIELDS if field not in values]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+    if not EMAIL_PATTERN.match(str(values['email'])):
+        return None, f"Invalid email: {values['email']}"
+
+    prefs = values.get('communication_preferences', {})
+    if isinstance(prefs, str):
+        try:
+            prefs = json.loads(prefs)
+        except ValueError:
+            return None, 'communication_preferences must be JSON'
+    values['communication_preferences'] = json.dumps(prefs)
+
+    for field, value in values.items():
+        if not isinstance(value, str):
+            values[field] = str(value)
+        length = getattr(Customer.__table__.c[field].type, 'length', None)
+        if length and len(values[field]) > length:
+            return None, f"{field} is longer than {length} characters"
+
+    values.setdefault('tenant_id', tenant_id)
+    values.setdefault('account_type', 'Individual')
+    values.setdefault('status', 'Active')
+    values.setdefault('preferred_currency', 'USD')
+    return values, None
+
+class CustomerImport:
+    """Chunked bulk import of customers from NDJSON or CSV"""
+
+    def __init__(self, chunk_size: int = 1000, max_errors: int = 1000):
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+
+    def stream(self, rows: Iterable[Tuple[int, Any]], tenant_id: str = 'default',
+               send_welcome_email: bool = True) -> Iterator[Dict[str, Any]]:
+        """Import rows chunk by chunk, yielding a progress report per chunk and a final summary"""
+        started = datetime.utcnow()
+        totals = {'imported': 0, 'failed': 0, 'chunks': 0}
+        reported_errors = 0
+
+        chunk = []
+        for line_number, row in rows:
+            chunk.append((line_number, row))
+            if len(chunk) >= self.chunk_size:
+                report = self._import_chunk(chunk, tenant_id, send_welcome_email, totals)
+                reported_errors = self._cap_errors(report, reported_errors)
+                yield report
+                chunk = []
+        if chunk:
+            report = self._import_chunk(chunk, tenant_id, send_welcome_email, totals)
+            reported_errors = self._cap_errors(report, reported_errors)
+            yield report
+
+        duration = (datetime.utcnow() - started).total_seconds()
+        yield {
+            'type': 'summary',
+            'status': 'success' if not totals['failed'] else 'partial',
+            **totals,
+            'errors_truncated': totals['failed'] > reported_errors,
+            'scoring': 'queued',
+            'welcome_emails': 'queued' if send_welcome_email else 'skipped',
+            'duration_seconds': round(duration, 3),
+            'rows_per_second': round(totals['imported'] / duration, 1) if duration else None
+        }
+
+    def run(self, rows: Iterable[Tuple[int, Any]], tenant_id: str = 'default',
+            send_welcome_email: bool = True) -> Dict[str, Any]:
+        """Import everything and return the summary with the (capped) row errors"""
+        errors = []
+        summary = {}
+        for report in self.stream(rows, tenant_id, send_welcome_email):
+            if report['type'] == 'chunk':
+                errors.extend(report['errors'])
+            else:
+                summary = report
+        return {**summary, 'errors': errors}
+
+    def _cap_errors(self, report: Dict[str, Any], reported: int) -> int:
+        report['errors'] = report['errors'][:max(self.max_errors - reported, 0)]
+        return reported + len(report['errors'])
+
+    def _import_chunk(self, chunk, tenant_id: str, send_welcome_email: bool, totals: Dict[str, int]) -> Dict[str, Any]:
+        errors = []
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        for line_number, row in chunk:
+            values, error = validate_row(row, tenant_id)
+            if error:
+                errors.append({'line': line_number, 'error': error})
+            else:
+                valid.append((line_number, values))
+
+        valid = self._drop_duplicate_codes(valid, errors)
+        imported = 0
+        if valid:
+            try:
+                imported = self._insert(valid, send_welcome_email)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error importing customer chunk: {e}")
+                errors.extend({'line': line_number, 'error': f"Chunk failed: {e}"} for line_number, _ in valid)
+
+        totals['imported'] += imported
+        totals['failed'] += len(errors)
+        totals['chunks'] += 1
+        return {
+            'type': 'chunk',
+            'chunk': totals['chunks'],
+            'first_line': chunk[0][0],
+            'last_line': chunk[-1][0],
+            'imported': imported,
+            'failed': len(errors),
+            'errors': sorted(errors, key=lambda error: error['line'])
+        }
+
+    def _drop_duplicate_codes(self, valid, errors):
+        """Reject supplied customer codes that already exist or repeat within the chunk"""
+        supplied = [values['customer_code'] for _, values in valid if 'customer_code' in values]
+        if not supplied:
+            return valid
+        taken = set(db.session.execute(
+            db.select(Customer.customer_code).where(Customer.customer_code.in_(supplied))
+        ).scalars())
+        kept = []
+        for line_number, values in valid:
+            code = values.get('customer_code')
+            if code is not None and code in taken:
+                errors.append({'line': line_number, 'error': f"Duplicate customer_code: {code}"})
+                continue
+            if code is not None:
+                taken.add(code)
+            kept.append((line_number, values))
+        return kept
+
+    def _insert(self, valid, send_welcome_email: bool) -> int:
+        now = datetime.utcnow()
+        uncoded = {}
+        for _, values in valid:
+            if 'customer_code' not in values:
+                uncoded.setdefault(values['tenant_id'], []).append(values)
+        for tenant_id, tenant_values in uncoded.items():
+            codes = identifiers.allocate('customer_code', len(tenant_values), tenant_id, now)
+            for values, code in zip(tenant_values, codes):
+                values['customer_code'] = code
+
+        rows = [{**{field: values.get(field) for field in IMPORT_FIELDS}, 'created_at': now, 'updated_at': now}
+                for _, values in valid]
+
+        db.session.execute(db.insert(Customer), rows)
+        revenue_rollups.record_bulk_customers(rows)
+        if send_welcome_email:
+            codes = [row['customer_code'] for row in rows]
+            ids = dict(db.session.execute(
+                db.select(Customer.customer_code, Customer.id).where(Customer.customer_code.in_(codes))
+            ).all())
+            next_billing_date = (now + timedelta(days=30)).strftime('%Y-%m-%d')
+            db.session.execute(db.insert(EmailOutbox), [
+                {
+                    'customer_id': ids.get(row['customer_code']),
+                    'to_email': row['email'],
+                    'subject': 'Welcome to BillChain AI',
+                    'content': f"Welcome {row['name']}! Your account has been created successfully.",
+                    'template_name': 'welcome',
+                    'template_data': json.dumps({'customer_name': row['name'], 'plan_name': 'Basic',
+                                                 'next_billing_date': next_billing_date}),
+                    'status': 'queued',
+                    'attempts': 0,
+                    'created_at': now
+                }
+                for row in rows
+            ])
+        db.session.commit()
+        return len(rows)
+
+def send_queued_emails(communication_service, limit: int = 500) -> Dict[str, Any]:
+    """Send up to ``limit`` queued outbox emails, oldest first"""
+    try:
+        messages = (EmailOutbox.query.filter_by(status='queued')
+                    .order_by(EmailOutbox.id).limit(limit).all())
+        sent = failed = 0
+        for message in messages:
+            message.attempts += 1
+            result = communication_service.send_email(
+                message.to_email, message.subject, message.content,
+                template_name=message.template_name,
+                template_data=json.loads(message.template_data or '{}')
+            )
+            if result.get('status') == 'success':
+                message.status = 'sent'
+                message.sent_at = datetime.utcnow()
+                sent += 1
+            else:
+                message.last_error = result.get('message')
+                if message.attempts >= 3:
+                    message.status = 'failed'
+                failed += 1
+        db.session.commit()
+        return {'status': 'success', 'sent': sent, 'failed': failed}
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error sending queued emails: {e}")
+        return {'status': 'error', 'message': str(e)}
@@ -0,0 +1,149 @@
+"""
+Customer search and keyset pagination for BillChain AI
+
+Search is backed by an index instead of leading-wildcard LIKE scans: an
+FTS5 trigram table kept in sync by triggers on SQLite, and pg_trgm GIN
+indexes on PostgreSQL. Both match substrings, like the LIKE filter they
+replace. Listing pages by a (created_at, id) cursor, so deep pages cost the
+same as the first one and no page needs a COUNT(*).
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+import logging
+
+from sqlalchemy import text
+
+from database import db, Customer
+
+logger = logging.getLogger(__name__)
+
+SEARCH_COLUMNS = ['name', 'email', 'customer_code']
+FTS_TABLE = 'customers_fts'
+MIN_TRIGRAM_LENGTH = 3  # shorter terms cannot use a trigram index
+
+SQLITE_INDEX = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, email, customer_code, content='customers', content_rowid='id', tokenize='trigram')""",
+    f"""CREATE TRIGGER IF NOT EXISTS customers_fts_insert AFTER INSERT ON customers BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, email, customer_code)
+        VALUES (new.id, new.name, new.email, new.customer_code);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS customers_fts_delete AFTER DELETE ON customers BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, customer_code)
+        VALUES ('delete', old.id, old.name, old.email, old.customer_code);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS customers_fts_update AFTER UPDATE OF name, email, customer_code ON customers BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, customer_code)
+        VALUES ('delete', old.id, old.name, old.email, old.customer_code);
+        INSERT INTO {FTS_TABLE}(rowid, name, email, customer_code)
+        VALUES (new.id, new.name, new.email, new.customer_code);
+    END"""
+]
+
+POSTGRES_INDEX = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+    f"CREATE INDEX IF NOT EXISTS ix_customers_{column}_trgm ON customers USING gin ({column} gin_trgm_ops)"
+    for column in SEARCH_COLUMNS
+]
+
+class CustomerSearch:
+    """Dialect-aware indexed customer search"""
+
+    def __init__(self):
+        self.backend = None  # 'fts5', 'trigram' or None for plain LIKE
+
+    def ensure_index(self):
+        """Create the search index if missing; safe to call on every start"""
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == 'sqlite':
+                with db.engine.begin() as connection:
+                    existed = connection.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+                    ).first() is not None
+                    for statement in SQLITE_INDEX:
+                        connection.execute(text(statement))
+                    if not existed:
+                        # Index the rows that were there before the triggers
+                        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                self.backend = 'fts5'
+            elif dialect == 'postgresql':
+                with db.engine.begin() as connection:
+                    for statement in POSTGRES_INDEX:
+                        connection.execute(text(statement))
+                self.backend = 'trigram'
+            else:
+                self.backend = None
+        except Exception as e:
+            # e.g. SQLite built without FTS5, or no permission to create pg_trgm
+            self.backend = None
+            logger.warning(f"Customer search index unavailable, using LIKE: {e}")
+        return self.backend
+
+    def filter(self, query, search: str):
+        """Restrict a Customer query to rows matching ``search`` in any search column"""
+        search = search.strip()
+        if not search:
+            return query
+        if self.backend == 'fts5' and len(search) >= MIN_TRIGRAM_LENGTH:
+            phrase = '"' + search.replace('"', '""') + '"'
+            matches = text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :phrase").bindparams(phrase=phrase)
+            return query.filter(Customer.id.in_(matches))
+        if self.backend == 'trigram':
+            # ILIKE '%term%' is served by the gin_trgm_ops indexes
+            return query.filter(db.or_(*[getattr(Customer, column).icontains(search, autoescape=True)
+                                         for column in SEARCH_COLUMNS]))
+        return query.filter(db.or_(*[getattr(Customer, column).contains(search, autoescape=True)
+                                     for column in SEARCH_COLUMNS]))
+
+def encode_cursor(customer: Customer) -> str:
+    created_at = customer.created_at.isoformat() if customer.created_at else None
+    payload = json.dumps([created_at, customer.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str):
+    """(created_at, id) from a cursor, created_at None for undated rows; raises ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, customer_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(created_at) if created_at is not None else None), int(customer_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def keyset_page(query, per_page: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """One page of a Customer query, newest first, continuing after ``cursor``
+
+    Rows without created_at (bulk or raw SQL inserts) come last, newest id
+    first. Dated and undated rows are read by separate index-ordered
+    queries; the second only runs once the dated rows run out.
+    """
+    created_at, customer_id = decode_cursor(cursor) if cursor else (None, None)
+    rows: List[Customer] = []
+    if customer_id is None or created_at is not None:
+        dated = query.filter(Customer.created_at.isnot(None))
+        if customer_id is not None:
+            dated = dated.filter(db.tuple_(Customer.created_at, Customer.id) < db.tuple_(created_at, customer_id))
+        rows = dated.order_by(Customer.created_at.desc(), Customer.id.desc()).limit(per_page + 1).all()
+    if len(rows) <= per_page:
+        undated = query.filter(Customer.created_at.is_(None))
+        if customer_id is not None and created_at is None:
+            undated = undated.filter(Customer.id < customer_id)
+        rows += undated.order_by(Customer.id.desc()).limit(per_page + 1 - len(rows)).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    return {
+        'items': items,
+        'has_more': has_more,
+        'next_cursor': encode_cursor(items[-1]) if has_more else None
+    }
+
+def capped_count(query, cap: int) -> Dict[str, Any]:
+    """Count matches up to ``cap``; beyond that the total is reported as a lower bound"""
+    limited = query.with_entities(Customer.id).order_by(None).limit(cap + 1).subquery()
+    total = db.session.query(db.func.count()).select_from(limited).scalar()
+    return {'total': min(total, cap), 'total_is_estimate': total > cap}
+
+# Global search instance
+customer_search = CustomerSearch()
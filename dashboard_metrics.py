@@ -0,0 +1,259 @@
+"""
+Incrementally maintained dashboard metrics for BillChain AI
+
+Keeps the dashboard counters and sums in memory and updates them from
+SQLAlchemy flush events on customers, invoices and transactions, applying
+the deltas only when the transaction commits. Bulk statements, which do not
+go through the unit of work, mark the cache stale instead, and a periodic
+reconciliation recomputes everything from the database so other worker
+processes' writes are picked up too.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any
+from collections import defaultdict, Counter
+import logging
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from database import db, Customer, Invoice, Transaction
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = [
+    'total_customers', 'active_customers', 'high_churn_risk',
+    'total_revenue', 'pending_invoices', 'crypto_transactions', 'crypto_volume'
+]
+COUNT_METRICS = {'total_customers', 'active_customers', 'high_churn_risk', 'pending_invoices', 'crypto_transactions'}
+REVENUE_WINDOW_DAYS = 30
+
+def _customer_metrics(values):
+    return {
+        'total_customers': 1,
+        'active_customers': int(values.get('status') == 'Active'),
+        'high_churn_risk': int(values.get('churn_risk_level') == 'High')
+    }
+
+def _invoice_metrics(values):
+    paid = values.get('status') == 'Paid'
+    amount = float(values.get('total_amount') or 0) if paid else 0.0
+    metrics = {
+        'total_revenue': amount,
+        'pending_invoices': int(values.get('status') == 'Pending')
+    }
+    if paid and values.get('invoice_date') is not None:
+        metrics[('revenue_day', values['invoice_date'].date())] = amount
+    return metrics
+
+def _transaction_metrics(values):
+    on_chain = values.get('blockchain_tx_hash') is not None
+    return {
+        'crypto_transactions': int(on_chain),
+        'crypto_volume': float(values.get('amount') or 0) if on_chain else 0.0
+    }
+
+TRACKED = {
+    Customer: (_customer_metrics, ['status', 'churn_risk_level']),
+    Invoice: (_invoice_metrics, ['status', 'total_amount', 'invoice_date']),
+    Transaction: (_transaction_metrics, ['blockchain_tx_hash', 'amount'])
+}
+TRACKED_TABLES = {model.__tablename__ for model in TRACKED}
+
+class DashboardMetrics:
+    """Constant-time dashboard metrics kept current by ORM events"""
+
+    def __init__(self, reconcile_interval: float = 300):
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._revenue_by_day = defaultdict(float)
+        self._stale = True
+        self._reconciled_at = None
+        self._installed = False
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call ``callback()`` whenever committed writes change the metrics"""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error notifying metrics listener: {e}")
+
+    def install(self):
+        """Start listening to session events"""
+        if not self._installed:
+            # Load the old value on assignment, even when the attribute was expired by a commit
+            for model, (contribution, fields) in TRACKED.items():
+                for name in fields:
+                    track_old_values(getattr(model, name))
+            event.listen(Session, 'before_flush', self._before_flush)
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+            event.listen(Session, 'do_orm_execute', self._on_execute)
+            self._installed = True
+
+    def remove(self):
+        """Stop listening to session events"""
+        if self._installed:
+            for model, (contribution, fields) in TRACKED.items():
+                for name in fields:
+                    untrack_old_values(getattr(model, name))
+            event.remove(Session, 'before_flush', self._before_flush)
+            event.remove(Session, 'after_flush', self._after_flush)
+            event.remove(Session, 'after_commit', self._after_commit)
+            event.remove(Session, 'after_soft_rollback', self._after_rollback)
+            event.remove(Session, 'do_orm_execute', self._on_execute)
+            self._installed = False
+
+    def invalidate(self):
+        """Force a reconciliation on the next read"""
+        self._stale = True
+        self._notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current metrics, reconciling first if the cache is stale or due"""
+        if self._needs_reconcile():
+            self.reconcile()
+
+        window_start = (datetime.utcnow() - timedelta(days=REVENUE_WINDOW_DAYS)).date()
+        with self._lock:
+            metrics = {key: int(round(value)) if key in COUNT_METRICS else value
+                       for key, value in self._counters.items()}
+            metrics['monthly_revenue'] = sum(
+                amount for day, amount in self._revenue_by_day.items() if day >= window_start
+            )
+            metrics['reconciled_at'] = self._reconciled_at.isoformat() if self._reconciled_at else None
+        return metrics
+
+    def reconcile(self):
+        """Recompute every metric from the database"""
+        window_start = datetime.utcnow() - timedelta(days=REVENUE_WINDOW_DAYS + 1)
+        paid = Invoice.status == 'Paid'
+        # One query over the partial on-chain index, which covers both the count and the volume
+        crypto_transactions, crypto_volume = (db.session.query(db.func.count(Transaction.amount),
+                                                               db.func.sum(Transaction.amount))
+                                              .filter(Transaction.blockchain_tx_hash.isnot(None)).one())
+        counters = {
+            'total_customers': Customer.query.count(),
+            'active_customers': Customer.query.filter_by(status='Active').count(),
+            'high_churn_risk': Customer.query.filter_by(churn_risk_level='High').count(),
+            'total_revenue': float(db.session.query(db.func.sum(Invoice.total_amount)).filter(paid).scalar() or 0),
+            'pending_invoices': Invoice.query.filter_by(status='Pending').count(),
+            'crypto_transactions': crypto_transactions,
+            'crypto_volume': float(crypto_volume or 0)
+        }
+        revenue_by_day = defaultdict(float)
+        rows = (db.session.query(Invoice.invoice_date, Invoice.total_amount)
+                .filter(paid, Invoice.invoice_date >= window_start).all())
+        for invoice_date, amount in rows:
+            revenue_by_day[invoice_date.date()] += float(amount or 0)
+
+        with self._lock:
+            self._counters = counters
+            self._revenue_by_day = revenue_by_day
+            self._stale = False
+            self._reconciled_at = datetime.utcnow()
+        logger.info("Dashboard metrics reconciled")
+
+    def _needs_reconcile(self):
+        if self._stale or self._reconciled_at is None:
+            return True
+        return (datetime.utcnow() - self._reconciled_at).total_seconds() >= self.reconcile_interval
+
+    # --- Session events ---
+
+    def _before_flush(self, session, flush_context, instances):
+        # Load every tracked field now, so old and new values are compared from the same row
+        # (deleted rows cannot be refreshed after the flush)
+        for obj in list(session.dirty) + list(session.deleted):
+            tracked = TRACKED.get(type(obj))
+            if tracked is not None:
+                for name in tracked[1]:
+                    getattr(obj, name)
+
+    def _after_flush(self, session, flush_context):
+        deltas = session.info.setdefault('dashboard_metric_deltas', defaultdict(float))
+        for obj in session.new:
+            self._add(deltas, obj, lambda name: getattr(obj, name), 1)
+        for obj in session.deleted:
+            self._add(deltas, obj, lambda name: inspect(obj).dict.get(name), -1)
+        for obj in session.dirty:
+            if type(obj) not in TRACKED or not session.is_modified(obj):
+                continue
+            state = inspect(obj)
+            self._add(deltas, obj, lambda name: previous_value(state, name), -1)
+            self._add(deltas, obj, lambda name: getattr(obj, name), 1)
+
+    def _add(self, deltas, obj, value_of, sign):
+        tracked = TRACKED.get(type(obj))
+        if tracked is None:
+            return
+        contribution, fields = tracked
+        for key, value in contribution({name: value_of(name) for name in fields}).items():
+            deltas[key] += sign * value
+
+    def _after_commit(self, session):
+        deltas = session.info.pop('dashboard_metric_deltas', None)
+        if not deltas:
+            return
+        with self._lock:
+            for key, value in deltas.items():
+                if isinstance(key, tuple):
+                    self._revenue_by_day[key[1]] += value
+                else:
+                    self._counters[key] += value
+        self._notify()
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop('dashboard_metric_deltas', None)
+        if previous_transaction.nested:
+            # Deltas from before the savepoint were dropped too
+            self.invalidate()
+
+    def _on_execute(self, orm_execute_state):
+        # Bulk INSERT/UPDATE/DELETE bypass flush events; recompute on the next read
+        if orm_execute_state.is_select:
+            return
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in TRACKED_TABLES:
+            self.invalidate()
+
+def keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+_old_value_users = Counter()
+
+def track_old_values(attribute):
+    """Load an attribute's previous value on set, so flush handlers can read it
+
+    The listener is shared and reference counted, since SQLAlchemy keeps one
+    registration per function and attribute.
+    """
+    key = (attribute.class_, attribute.key)
+    if not _old_value_users[key]:
+        event.listen(attribute, 'set', keep_old_value, active_history=True)
+    _old_value_users[key] += 1
+
+def untrack_old_values(attribute):
+    key = (attribute.class_, attribute.key)
+    _old_value_users[key] -= 1
+    if _old_value_users[key] <= 0:
+        del _old_value_users[key]
+        event.remove(attribute, 'set', keep_old_value)
+
+def previous_value(state, name):
+    """Attribute value before the current flush"""
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return state.dict.get(name)
+
+# Global metrics instance
+dashboard_metrics = DashboardMetrics()
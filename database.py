@@ -4,15 +4,35 @@ Database models and schemas for the BillChain AI billing system
 
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
+from sqlalchemy import event, DDL
 from datetime import datetime
 import json
+import os
 
 # Initialize extensions
 db = SQLAlchemy()
 ma = Marshmallow()
 
+# Hash partitions for the tenant-keyed tables on PostgreSQL; 0 keeps them unpartitioned
+TENANT_PARTITIONS = int(os.getenv('TENANT_PARTITIONS', 0))
+
+def tenant_partitioned(*args):
+    """__table_args__ hash-partitioning a table by tenant_id when TENANT_PARTITIONS is set"""
+    if not TENANT_PARTITIONS:
+        return args
+    return args + ({'postgresql_partition_by': 'HASH (tenant_id)'},)
+
 class Customer(db.Model):
     __tablename__ = 'customers'
+    __table_args__ = (
+        # Filters lead, the keyset pagination order follows
+        db.Index('ix_customers_created_at_id', 'created_at', 'id'),
+        db.Index('ix_customers_tenant_created_at_id', 'tenant_id', 'created_at', 'id'),
+        db.Index('ix_customers_tenant_status', 'tenant_id', 'status'),
+        db.Index('ix_customers_status_created_at_id', 'status', 'created_at', 'id'),
+        db.Index('ix_customers_churn_risk_created_at_id', 'churn_risk_level', 'created_at', 'id'),
+        db.Index('ix_customers_segment_created_at_id', 'customer_segment', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     tenant_id = db.Column(db.String(100), nullable=False, default='default')
@@ -34,6 +54,8 @@ class Customer(db.Model):
     churn_risk_level = db.Column(db.String(20), default='Low')
     lifetime_value = db.Column(db.Float, default=0.0)
     customer_segment = db.Column(db.String(50))
+    ai_scored_at = db.Column(db.DateTime)  # when the AI fields were last computed
+    churned_at = db.Column(db.DateTime)  # set when status leaves Active, cleared on reactivation
     
     # Blockchain fields
     crypto_wallets = db.Column(db.Text)  # JSON string of wallet addresses
@@ -65,6 +87,10 @@ class Product(db.Model):
 
 class Subscription(db.Model):
     __tablename__ = 'subscriptions'
+    __table_args__ = (
+        db.Index('ix_subscriptions_due', 'status', 'auto_renew', 'next_billing_date'),  # billing run
+        db.Index('ix_subscriptions_customer_id', 'customer_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
@@ -88,6 +114,10 @@ class Subscription(db.Model):
 
 class Invoice(db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_status_invoice_date', 'status', 'invoice_date'),  # revenue windows, pending counts
+        db.Index('ix_invoices_customer_status_date', 'customer_id', 'status', 'invoice_date'),  # open invoice per customer
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
@@ -107,6 +137,7 @@ class Invoice(db.Model):
     # AI and automation fields
     ai_generated = db.Column(db.Boolean, default=False)
     auto_sent = db.Column(db.Boolean, default=False)
+    idempotency_key = db.Column(db.String(100), unique=True)  # set by billing runs, one per subscription cycle
     
     notes = db.Column(db.Text)
     
@@ -115,6 +146,18 @@ class Invoice(db.Model):
 
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        db.Index('ix_transactions_customer_created_at', 'customer_id', 'created_at'),  # per-customer velocity
+        db.Index('ix_transactions_created_at', 'created_at'),
+        # Payment deduplication: one row per client idempotency key and per on-chain hash
+        db.Index('ix_transactions_idempotency_key', 'idempotency_key', unique=True),
+        db.Index('ix_transactions_blockchain_tx_hash', 'blockchain_tx_hash', unique=True),
+        # Only on-chain payments, covering the crypto count and volume sum; leading with the hash
+        # makes it cheaper than the dedup index for the IS NOT NULL range
+        db.Index('ix_transactions_on_chain', 'blockchain_tx_hash', 'amount',
+                 sqlite_where=db.text('blockchain_tx_hash IS NOT NULL'),
+                 postgresql_where=db.text('blockchain_tx_hash IS NOT NULL')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
@@ -128,6 +171,8 @@ class Transaction(db.Model):
     payment_method = db.Column(db.String(50))  # card, bank_transfer, crypto, etc.
     payment_gateway = db.Column(db.String(50))
     gateway_transaction_id = db.Column(db.String(200))
+    idempotency_key = db.Column(db.String(200))  # client-supplied, for safe retries
+    claimed_at = db.Column(db.DateTime)  # lease start of a Pending payment's worker
     
     # Blockchain fields
     blockchain_network = db.Column(db.String(50))
@@ -149,6 +194,9 @@ class Transaction(db.Model):
 
 class SupportTicket(db.Model):
     __tablename__ = 'support_tickets'
+    __table_args__ = (
+        db.Index('ix_support_tickets_customer_status', 'customer_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
@@ -171,6 +219,86 @@ class SupportTicket(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     resolved_at = db.Column(db.DateTime)
 
+class RevenueRollupDaily(db.Model):
+    __tablename__ = 'revenue_rollup_daily'
+    __table_args__ = tenant_partitioned()
+    
+    tenant_id = db.Column(db.String(100), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # paid invoices by invoice_date
+    paid_invoices = db.Column(db.Integer, nullable=False, default=0)
+    pending_invoices = db.Column(db.Integer, nullable=False, default=0)
+    new_customers = db.Column(db.Integer, nullable=False, default=0)
+    churned_customers = db.Column(db.Integer, nullable=False, default=0)
+
+class RevenueRollupMonthly(db.Model):
+    __tablename__ = 'revenue_rollup_monthly'
+    __table_args__ = tenant_partitioned()
+    
+    tenant_id = db.Column(db.String(100), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    paid_invoices = db.Column(db.Integer, nullable=False, default=0)
+    pending_invoices = db.Column(db.Integer, nullable=False, default=0)
+    new_customers = db.Column(db.Integer, nullable=False, default=0)
+    churned_customers = db.Column(db.Integer, nullable=False, default=0)
+
+class CustomerRevenue(db.Model):
+    __tablename__ = 'customer_revenue'
+    
+    customer_id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.String(100), nullable=False, index=True)
+    paid_revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+def _create_tenant_partitions(table):
+    for remainder in range(TENANT_PARTITIONS):
+        event.listen(table, 'after_create', DDL(
+            f"CREATE TABLE IF NOT EXISTS {table.name}_p{remainder} PARTITION OF {table.name} "
+            f"FOR VALUES WITH (MODULUS {TENANT_PARTITIONS}, REMAINDER {remainder})"
+        ).execute_if(dialect='postgresql'))
+
+if TENANT_PARTITIONS:
+    _create_tenant_partitions(RevenueRollupDaily.__table__)
+    _create_tenant_partitions(RevenueRollupMonthly.__table__)
+
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_id', 'status', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'))
+    to_email = db.Column(db.String(200), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    template_name = db.Column(db.String(100))
+    template_data = db.Column(db.Text)  # JSON string
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class NumberSequence(db.Model):
+    __tablename__ = 'number_sequences'
+    
+    name = db.Column(db.String(200), primary_key=True)  # identifier kind, plus the tenant for per-tenant formats
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+
+class JobCheckpoint(db.Model):
+    __tablename__ = 'job_checkpoints'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(100), unique=True, nullable=False)
+    status = db.Column(db.String(20), default='completed')  # running, completed
+    last_id = db.Column(db.Integer, default=0)  # keyset cursor of the current run
+    details = db.Column(db.Text)  # JSON string
+    
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # Marshmallow Schemas
 class CustomerSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
@@ -187,30 +315,30 @@ class SubscriptionSchema(ma.SQLAlchemyAutoSchema):
         model = Subscription
         load_instance = True
     
-    customer = ma.Nested(CustomerSchema, exclude=['subscriptions'])
-    product = ma.Nested(ProductSchema, exclude=['subscriptions'])
+    customer = ma.Nested(CustomerSchema)
+    product = ma.Nested(ProductSchema)
 
 class InvoiceSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Invoice
         load_instance = True
     
-    customer = ma.Nested(CustomerSchema, exclude=['invoices'])
+    customer = ma.Nested(CustomerSchema)
 
 class TransactionSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Transaction
         load_instance = True
     
-    customer = ma.Nested(CustomerSchema, exclude=['transactions'])
-    invoice = ma.Nested(InvoiceSchema, exclude=['transactions'])
+    customer = ma.Nested(CustomerSchema)
+    invoice = ma.Nested(InvoiceSchema)
 
 class SupportTicketSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = SupportTicket
         load_instance = True
     
-    customer = ma.Nested(CustomerSchema, exclude=['support_tickets'])
+    customer = ma.Nested(CustomerSchema)
 
 # Initialize schemas
 customer_schema = CustomerSchema()
@@ -241,6 +369,47 @@ class DatabaseManager:
         """Create all database tables"""
         db.create_all()
     
+    def add_missing_columns(self):
+        """Add model columns missing from tables created by an older schema
+
+        ``create_all`` only creates whole tables, so columns added to an
+        existing model are added here with ALTER TABLE. New columns must be
+        nullable; a unique column gets a unique index instead of the inline
+        constraint, which SQLite cannot add to an existing table.
+        """
+        inspector = db.inspect(db.engine)
+        existing_tables = set(inspector.get_table_names())
+        preparer = db.engine.dialect.identifier_preparer
+        added = []
+        with db.engine.begin() as connection:
+            for table in db.metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    continue
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    if column.primary_key or not column.nullable:
+                        raise RuntimeError(f"Cannot add required column {table.name}.{column.name} to an existing table")
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    connection.execute(db.text(
+                        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+                    ))
+                    if column.unique:
+                        connection.execute(db.text(
+                            f"CREATE UNIQUE INDEX {preparer.quote(f'uq_{table.name}_{column.name}')} "
+                            f"ON {preparer.format_table(table)} ({preparer.format_column(column)})"
+                        ))
+                    added.append(f"{table.name}.{column.name}")
+        return added
+    
+    def create_indexes(self):
+        """Create model indexes missing from tables that already existed"""
+        self.add_missing_columns()  # indexes may cover columns the old schema lacks
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+    
     def drop_tables(self):
         """Drop all database tables"""
         db.drop_all()
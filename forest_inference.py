@@ -0,0 +1,127 @@
+"""
+Compiled tree-ensemble inference for the churn and CLTV random forests
+"""
+
+import numpy as np
+import sklearn
+import logging
+
+logger = logging.getLogger(__name__)
+
+# scikit-learn >= 1.4 stores class fractions in tree_.value and no longer
+# renormalizes leaf values inside DecisionTreeClassifier.predict_proba
+_TREE_VALUES_ARE_FRACTIONS = tuple(int(part) for part in sklearn.__version__.split('.')[:2]) >= (1, 4)
+
+INFERENCE_ENGINES = ['sklearn', 'leaf_tables', 'compiled']
+
+def leaf_values(estimator, n_classes=None):
+    """Per-node output of one fitted tree, exactly as its predict path produces it.
+
+    Classifiers give class probabilities of shape (n_nodes, n_classes);
+    regressors give the node mean of shape (n_nodes,).
+    """
+    tree = estimator.tree_
+    if n_classes is None:
+        return np.ascontiguousarray(tree.value[:, 0, 0])
+
+    values = tree.value[:, 0, :n_classes]
+    if not _TREE_VALUES_ARE_FRACTIONS:
+        normalizer = values.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        values = values / normalizer
+    return np.ascontiguousarray(values)
+
+class CompiledForest:
+    """A fitted RandomForestClassifier/Regressor flattened into contiguous node arrays.
+
+    All trees share one set of arrays (feature, threshold, left, right, value),
+    indexed by global node id. Leaves point back to themselves, so a batch is
+    evaluated by stepping every (tree, row) cursor ``max_depth`` times with
+    whole-array gathers instead of walking trees one at a time.
+    """
+
+    ARRAY_NAMES = ['feature', 'threshold', 'left', 'right', 'value', 'roots']
+
+    def __init__(self, model, arrays=None):
+        self.model = model
+        self.is_classifier = hasattr(model, 'classes_')
+        self.n_classes = int(model.n_classes_) if self.is_classifier else None
+        self.n_trees = len(model.estimators_)
+
+        if arrays is not None:
+            # Prebuilt (possibly memory-mapped) node arrays from the model registry
+            for name in self.ARRAY_NAMES:
+                setattr(self, name, arrays[name])
+            self.max_depth = int(arrays['max_depth'])
+            self.node_count = len(self.feature)
+            return
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count, dtype=np.intp)
+            is_leaf = tree.children_left == -1
+
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(leaf_values(estimator, self.n_classes))
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64)
+        self.left = np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp)
+        self.right = np.ascontiguousarray(np.concatenate(rights), dtype=np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = max_depth
+        self.node_count = offset
+
+    def to_arrays(self):
+        """Node arrays and traversal depth, for persisting the compiled forest"""
+        arrays = {name: getattr(self, name) for name in self.ARRAY_NAMES}
+        arrays['max_depth'] = self.max_depth
+        return arrays
+
+    def apply(self, X):
+        """Leaf node id reached in every tree, shape (n_trees, n_samples)"""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_samples, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.intp) * n_features)[np.newaxis, :]
+
+        nodes = np.repeat(self.roots[:, np.newaxis], n_samples, axis=1)
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_raw(self, X):
+        """Averaged forest output: class probabilities or regression values"""
+        leaves = self.apply(X)
+        if self.is_classifier:
+            output = np.zeros((leaves.shape[1], self.n_classes), dtype=np.float64)
+        else:
+            output = np.zeros(leaves.shape[1], dtype=np.float64)
+
+        # Accumulate tree by tree, in estimator order, so the floating point sum
+        # is identical to sklearn's
+        for tree_values in self.value[leaves]:
+            output += tree_values
+        output /= self.n_trees
+        return output
+
+    def verify(self, X):
+        """Check that the compiled output is bit-identical to the sklearn model"""
+        if self.is_classifier:
+            expected = self.model.predict_proba(X)
+        else:
+            expected = self.model.predict(X)
+        return bool(np.array_equal(self.predict_raw(X), expected))
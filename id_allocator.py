@@ -0,0 +1,194 @@
+"""
+Identifier allocation for BillChain AI
+
+Customer codes and invoice numbers come from monotonic sequences instead
+of COUNT(*) + 1, so allocation costs the same at any table size and
+concurrent writers never hand out the same number. Three number sources
+are available:
+
+- table: a row per sequence in number_sequences, advanced with one
+  UPDATE per request (the row lock serialises writers); portable.
+- hilo: an in-process lease of ``block_size`` numbers taken from the table
+  source, so most identifiers need no database round trip. Numbers stay
+  unique across processes but are only ordered within one, and a restart
+  leaves a gap.
+- sequence: a native PostgreSQL sequence per key; other dialects fall back
+  to the table source.
+
+Each kind has a configurable format. A format that contains ``{tenant}``
+gets one sequence per tenant; otherwise the kind shares one sequence, so
+every format keeps its identifiers unique.
+"""
+
+import os
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from database import db, Customer, Invoice, NumberSequence
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ['table', 'hilo', 'sequence']
+
+# kind -> default format and the legacy count the shared sequence starts after
+KINDS = {
+    'customer_code': {
+        'format': 'CUST-{date:%Y%m%d}-{number:06d}',
+        'start_after': lambda: db.select(db.func.count(Customer.id))
+    },
+    'invoice_number': {
+        'format': 'INV-{date:%Y%m%d}-{number:04d}',
+        'start_after': lambda: db.select(db.func.count(Invoice.id))
+    }
+}
+
+class TableSequence:
+    """Numbers from a row in number_sequences, reserved in short transactions of their own"""
+
+    def __init__(self, engine, name: str, start_after=None):
+        self.engine = engine
+        self.name = name
+        self.start_after = start_after
+
+    def allocate(self, count: int) -> range:
+        """Reserve ``count`` consecutive numbers"""
+        while True:
+            with self.engine.begin() as connection:
+                next_value = self._advance(connection, count)
+            if next_value is not None:
+                return range(next_value - count, next_value)
+            self._create()
+
+    def _advance(self, connection, count: int) -> Optional[int]:
+        statement = (db.update(NumberSequence)
+                     .where(NumberSequence.name == self.name)
+                     .values(next_value=NumberSequence.next_value + count))
+        if connection.dialect.update_returning:
+            return connection.execute(statement.returning(NumberSequence.next_value)).scalar()
+        if not connection.execute(statement).rowcount:
+            return None
+        return connection.execute(
+            db.select(NumberSequence.next_value).where(NumberSequence.name == self.name)
+        ).scalar_one()
+
+    def _create(self):
+        try:
+            with self.engine.begin() as connection:
+                start = connection.execute(self.start_after).scalar_one() + 1 if self.start_after is not None else 1
+                connection.execute(db.insert(NumberSequence).values(name=self.name, next_value=start))
+        except IntegrityError:
+            # Another writer created it first
+            pass
+
+class HiLoSequence:
+    """Hands out numbers from a leased block, leasing the next block when it runs out"""
+
+    def __init__(self, source: TableSequence, block_size: int = 100):
+        self.source = source
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._block = iter(())
+        self._pid = None
+
+    def allocate(self, count: int) -> List[int]:
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker must not reuse the parent's lease
+                self._block = iter(())
+                self._pid = os.getpid()
+            numbers = []
+            while len(numbers) < count:
+                number = next(self._block, None)
+                if number is None:
+                    self._block = iter(self.source.allocate(max(self.block_size, count - len(numbers))))
+                    continue
+                numbers.append(number)
+            return numbers
+
+class PostgresSequence:
+    """Numbers from a native sequence, created on first use"""
+
+    def __init__(self, engine, name: str, start_after=None):
+        self.engine = engine
+        self.sequence = 'idseq_' + hashlib.sha1(name.encode('utf-8')).hexdigest()[:24]
+        self.start_after = start_after
+        self._created = False
+
+    def allocate(self, count: int) -> List[int]:
+        with self.engine.begin() as connection:
+            if not self._created:
+                start = connection.execute(self.start_after).scalar_one() + 1 if self.start_after is not None else 1
+                connection.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {self.sequence} START WITH {start}"))
+                self._created = True
+            return list(connection.execute(
+                text(f"SELECT nextval('{self.sequence}') FROM generate_series(1, :count)"), {'count': count}
+            ).scalars())
+
+class IdentifierAllocator:
+    """Formatted, race-free identifiers per kind and tenant"""
+
+    def __init__(self, strategy: str = 'table', block_size: int = 100, formats: Optional[Dict[str, str]] = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown identifier strategy: {strategy}")
+        self.strategy = strategy
+        self.block_size = block_size
+        self.formats = {kind: settings['format'] for kind, settings in KINDS.items()}
+        self.formats.update(formats or {})
+        self._sources: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def tenant_scoped(self, kind: str) -> bool:
+        """Whether ``kind`` numbers each tenant separately"""
+        return '{tenant' in self.formats[kind]
+
+    def allocate(self, kind: str, count: int, tenant_id: Optional[str] = None,
+                 now: Optional[datetime] = None) -> List[str]:
+        """``count`` new identifiers of one kind, in allocation order"""
+        if count <= 0:
+            return []
+        if kind not in self.formats:
+            raise ValueError(f"Unknown identifier kind: {kind}")
+        now = now or datetime.utcnow()
+        tenant_id = tenant_id or 'default'
+        numbers = self._source(kind, tenant_id).allocate(count)
+        return [self.formats[kind].format(number=number, tenant=tenant_id, date=now) for number in numbers]
+
+    def allocate_one(self, kind: str, tenant_id: Optional[str] = None, now: Optional[datetime] = None) -> str:
+        return self.allocate(kind, 1, tenant_id, now)[0]
+
+    def _source(self, kind: str, tenant_id: str):
+        scoped = self.tenant_scoped(kind)
+        name = f"{kind}:{tenant_id}" if scoped else kind
+        engine = db.engine
+        key = (engine, name)  # per engine: tests and pool workers each bring their own
+        with self._lock:
+            source = self._sources.get(key)
+            if source is None:
+                # Only the shared sequence continues after rows numbered by COUNT(*) + 1
+                start_after = None if scoped else KINDS.get(kind, {}).get('start_after', lambda: None)()
+                source = self._create_source(engine, name, start_after)
+                self._sources[key] = source
+            return source
+
+    def _create_source(self, engine, name: str, start_after):
+        if self.strategy == 'sequence':
+            if engine.dialect.name == 'postgresql':
+                return PostgresSequence(engine, name, start_after)
+            logger.warning(f"Native sequences need PostgreSQL; using the table source on {engine.dialect.name}")
+        source = TableSequence(engine, name, start_after)
+        if self.strategy == 'hilo':
+            return HiLoSequence(source, self.block_size)
+        return source
+
+# Global allocator, configured from the environment
+identifiers = IdentifierAllocator(
+    strategy=os.getenv('ID_ALLOCATOR', 'table'),
+    block_size=int(os.getenv('ID_BLOCK_SIZE', 100)),
+    formats={kind: os.environ[f"{kind.upper()}_FORMAT"] for kind in KINDS if os.getenv(f"{kind.upper()}_FORMAT")}
+)
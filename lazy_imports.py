@@ -0,0 +1,53 @@
+"""
+Deferred imports for heavy service modules
+
+The ML, blockchain and communication stacks are only imported the first
+time one of their attributes is used, so the web process can answer
+/health before pandas and scikit-learn have finished loading.
+"""
+
+import importlib
+import threading
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._module_name)
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+class LazyObject:
+    """Proxy for a module-level service object or factory result, built on first use"""
+
+    def __init__(self, module_name, attribute, call=False):
+        self._module = LazyModule(module_name)
+        self._attribute = attribute
+        self._call = call
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    target = getattr(self._module, self._attribute)
+                    self._target = target() if self._call else target
+        return self._target
+
+    @property
+    def is_loaded(self):
+        return self._target is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
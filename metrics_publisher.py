@@ -0,0 +1,139 @@
+"""
+Server-push real-time metrics for BillChain AI dashboards
+
+One background task computes the metrics snapshot per interval and
+broadcasts only the changed values to SocketIO rooms, one room per
+subscribed metric subset. Bursts of writes are coalesced into a single
+early publish. While no room has members the loop stays idle, and a
+polling client gets a fresh snapshot once the cached one is older than
+the push interval.
+"""
+
+import time
+import threading
+from typing import Dict, Any, Optional, Callable, List
+import logging
+
+from flask_socketio import join_room, leave_room
+
+logger = logging.getLogger(__name__)
+
+ALL_METRICS = '*'
+
+class MetricsPublisher:
+    """Computes metrics once per tick and pushes deltas to subscribed rooms"""
+
+    def __init__(self, socketio, app, snapshot: Callable[[], Dict[str, Any]],
+                 interval: float = 2.0, coalesce_window: float = 0.25, namespace: str = '/'):
+        self.socketio = socketio
+        self.app = app
+        self.snapshot = snapshot
+        self.interval = interval
+        self.coalesce_window = coalesce_window
+        self.namespace = namespace
+
+        self.latest: Dict[str, Any] = {}
+        self.latest_at: Optional[float] = None  # monotonic time of the last snapshot
+        self.publish_count = 0
+        self._subscriptions: Dict[str, str] = {}  # sid -> room
+        self._room_metrics: Dict[str, Optional[List[str]]] = {}
+        self._room_members: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._running = False
+
+    def start(self):
+        """Start the background publisher once"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self.socketio.start_background_task(self._run)
+
+    def stop(self):
+        self._running = False
+        self._changed.set()
+
+    def notify(self):
+        """Signal that metrics changed; publishes early after the coalescing window"""
+        self._changed.set()
+
+    def subscribe(self, sid: str, metrics: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Join the room for a metric subset and return its current values"""
+        metrics = sorted(set(metrics)) if metrics else None
+        room = f"metrics:{','.join(metrics) if metrics else ALL_METRICS}"
+
+        self.unsubscribe(sid)
+        with self._lock:
+            self._subscriptions[sid] = room
+            self._room_metrics[room] = metrics
+            self._room_members[room] = self._room_members.get(room, 0) + 1
+        join_room(room, sid=sid, namespace=self.namespace)
+        self.start()
+
+        return _select(self.current(), metrics)
+
+    def current(self) -> Dict[str, Any]:
+        """Latest snapshot, recomputed (and pushed) if older than the push interval"""
+        if self.latest_at is None or time.monotonic() - self.latest_at >= self.interval:
+            self.publish_once()
+        return self.latest
+
+    def unsubscribe(self, sid: str):
+        """Leave the current subscription, if any"""
+        with self._lock:
+            room = self._subscriptions.pop(sid, None)
+            if room is None:
+                return
+            self._room_members[room] -= 1
+            if self._room_members[room] <= 0:
+                del self._room_members[room]
+                del self._room_metrics[room]
+        try:
+            leave_room(room, sid=sid, namespace=self.namespace)
+        except Exception:
+            # The client is already gone when called from the disconnect handler
+            pass
+
+    def publish_once(self) -> int:
+        """Compute one snapshot and emit the changed values to every room"""
+        with self.app.app_context():
+            current = self.snapshot()
+        self.publish_count += 1
+        self.latest_at = time.monotonic()
+
+        changed = {key: value for key, value in current.items() if self.latest.get(key) != value}
+        self.latest = current
+        if not changed:
+            return 0
+
+        with self._lock:
+            rooms = list(self._room_metrics.items())
+        emitted = 0
+        for room, metrics in rooms:
+            delta = _select(changed, metrics)
+            if delta:
+                self.socketio.emit('metrics_delta', delta, to=room, namespace=self.namespace)
+                emitted += 1
+        return emitted
+
+    def _run(self):
+        while self._running:
+            triggered = self._changed.wait(self.interval)
+            if not self._running:
+                return
+            if triggered:
+                # Let a burst of writes settle into one publish
+                self.socketio.sleep(self.coalesce_window)
+                self._changed.clear()
+            if not self._room_members:
+                continue  # idle; current() refreshes on demand
+            try:
+                self.publish_once()
+            except Exception as e:
+                logger.error(f"Error publishing metrics: {e}")
+
+def _select(values: Dict[str, Any], metrics: Optional[List[str]]) -> Dict[str, Any]:
+    if metrics is None:
+        return dict(values)
+    return {key: values[key] for key in metrics if key in values}
@@ -0,0 +1,197 @@
+"""
+Versioned model artifact store for BillChain AI
+
+Layout under the registry root::
+
+    <model_name>/
+        CURRENT                     promoted version id
+        <version>/
+            manifest.json           features, metrics, file hashes
+            model.joblib            fitted sklearn estimator
+            scaler.joblib           scaler the estimator was fitted with
+            forest/<array>.npy      compiled node arrays (forest models only)
+
+Versions are written to a temporary directory and renamed into place, and
+CURRENT is swapped with os.replace, so readers never see a half-written
+artifact. Compiled forest arrays are stored as raw .npy files and loaded
+with mmap_mode, so every worker process on a host shares one page-cached
+copy of the tree arrays.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+
+import numpy as np
+import joblib
+import sklearn
+
+from forest_inference import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+
+class ModelRegistryError(Exception):
+    """Raised when an artifact is missing or fails verification"""
+
+class ModelRegistry:
+    """Versioned, atomically published model artifacts"""
+
+    def __init__(self, root: str, keep_versions: int = 5):
+        self.root = root
+        self.keep_versions = keep_versions
+        os.makedirs(root, exist_ok=True)
+
+    def publish(self, name: str, model, scaler, features: List[str],
+                metrics: Optional[Dict[str, Any]] = None, promote: bool = True) -> Dict[str, Any]:
+        """Write a new immutable version of a model and optionally promote it"""
+        model_dir = os.path.join(self.root, name)
+        os.makedirs(model_dir, exist_ok=True)
+        staging_dir = os.path.join(model_dir, f".staging-{uuid.uuid4().hex}")
+        os.makedirs(staging_dir)
+
+        try:
+            files = ['model.joblib', 'scaler.joblib']
+            joblib.dump(model, os.path.join(staging_dir, 'model.joblib'))
+            joblib.dump(scaler, os.path.join(staging_dir, 'scaler.joblib'))
+
+            forest = None
+            if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+                compiled = CompiledForest(model).to_arrays()
+                os.makedirs(os.path.join(staging_dir, 'forest'))
+                for array_name in CompiledForest.ARRAY_NAMES:
+                    relative_path = os.path.join('forest', f'{array_name}.npy')
+                    np.save(os.path.join(staging_dir, relative_path), compiled[array_name])
+                    files.append(relative_path)
+                forest = {'max_depth': int(compiled['max_depth'])}
+
+            hashes = {path: _file_sha256(os.path.join(staging_dir, path)) for path in files}
+            created_at = datetime.utcnow()
+            version = f"{created_at.strftime('%Y%m%d%H%M%S%f')}-{hashes['model.joblib'][:8]}"
+
+            manifest = {
+                'name': name,
+                'version': version,
+                'created_at': created_at.isoformat(),
+                'model_class': type(model).__name__,
+                'sklearn_version': sklearn.__version__,
+                'features': list(features),
+                'metrics': _jsonable(metrics or {}),
+                'hash': hashes['model.joblib'],
+                'files': hashes,
+                'forest': forest
+            }
+            with open(os.path.join(staging_dir, MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            os.rename(staging_dir, os.path.join(model_dir, version))
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        if promote:
+            self.promote(name, version)
+        self.prune(name)
+        logger.info(f"Published {name} model version {version}")
+        return manifest
+
+    def promote(self, name: str, version: str):
+        """Point CURRENT at an existing version"""
+        if not os.path.exists(os.path.join(self.root, name, version, MANIFEST_FILE)):
+            raise ModelRegistryError(f"Unknown {name} model version: {version}")
+        pointer_path = os.path.join(self.root, name, CURRENT_FILE)
+        temp_path = f"{pointer_path}.{uuid.uuid4().hex}"
+        with open(temp_path, 'w') as f:
+            f.write(version)
+        os.replace(temp_path, pointer_path)
+        logger.info(f"Promoted {name} model version {version}")
+
+    def current_version(self, name: str) -> Optional[str]:
+        """Currently promoted version, if any"""
+        try:
+            with open(os.path.join(self.root, name, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, name: str, version: str) -> Dict[str, Any]:
+        """Manifest of one version"""
+        try:
+            with open(os.path.join(self.root, name, version, MANIFEST_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ModelRegistryError(f"Unknown {name} model version: {version}")
+
+    def list_versions(self, name: str) -> List[Dict[str, Any]]:
+        """Manifests of all published versions, newest first"""
+        model_dir = os.path.join(self.root, name)
+        if not os.path.isdir(model_dir):
+            return []
+        versions = [entry for entry in os.listdir(model_dir)
+                    if os.path.exists(os.path.join(model_dir, entry, MANIFEST_FILE))]
+        return [self.manifest(name, version) for version in sorted(versions, reverse=True)]
+
+    def load(self, name: str, version: Optional[str] = None, mmap_mode: Optional[str] = 'r',
+             verify: bool = True) -> Dict[str, Any]:
+        """Load a version (default: the promoted one)
+
+        Returns ``{'manifest', 'model', 'scaler', 'compiled'}``; ``compiled`` is a
+        CompiledForest over memory-mapped node arrays, or None for non-forest models.
+        """
+        version = version or self.current_version(name)
+        if not version:
+            raise ModelRegistryError(f"No promoted {name} model")
+
+        version_dir = os.path.join(self.root, name, version)
+        manifest = self.manifest(name, version)
+
+        if verify:
+            for path, expected in manifest['files'].items():
+                if _file_sha256(os.path.join(version_dir, path)) != expected:
+                    raise ModelRegistryError(f"Hash mismatch for {name} {version}: {path}")
+
+        model = joblib.load(os.path.join(version_dir, 'model.joblib'), mmap_mode=mmap_mode)
+        scaler = joblib.load(os.path.join(version_dir, 'scaler.joblib'), mmap_mode=mmap_mode)
+
+        compiled = None
+        if manifest.get('forest'):
+            arrays = {
+                array_name: np.load(os.path.join(version_dir, 'forest', f'{array_name}.npy'), mmap_mode=mmap_mode)
+                for array_name in CompiledForest.ARRAY_NAMES
+            }
+            arrays['max_depth'] = manifest['forest']['max_depth']
+            compiled = CompiledForest(model, arrays=arrays)
+
+        return {'manifest': manifest, 'model': model, 'scaler': scaler, 'compiled': compiled}
+
+    def prune(self, name: str):
+        """Delete old versions beyond keep_versions, never the promoted one"""
+        current = self.current_version(name)
+        versions = [manifest['version'] for manifest in self.list_versions(name)]
+        for version in versions[self.keep_versions:]:
+            if version != current:
+                shutil.rmtree(os.path.join(self.root, name, version), ignore_errors=True)
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _jsonable(value):
+    """Convert numpy scalars in metrics to plain JSON types"""
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
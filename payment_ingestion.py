@@ -0,0 +1,388 @@
+"""
+Idempotent crypto payment ingestion for BillChain AI
+
+Every payment becomes a Transaction row. Retries are deduplicated on the
+client's idempotency key and on the blockchain transaction hash, both of
+which have a unique index:
+
+1. An LRU of recent responses answers repeated keys without touching the
+   database, and requests for a key already in flight in this process
+   wait for the first one instead of racing it.
+2. A Bloom filter of every known key and hash lets brand-new payments
+   skip the duplicate lookup; only "maybe seen" requests query the index.
+3. The key is claimed by inserting a Pending row before the payment is
+   processed. The unique index settles races between worker processes,
+   so a duplicate is caught even when this process has never seen it.
+   A claim is released when processing fails, and one left behind by a
+   worker that died is taken over once its lease expires.
+
+A replay returns the stored outcome of the first request. Reusing a key
+for a different payment is rejected.
+"""
+
+import os
+import json
+import math
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, Any, Optional, Callable, Tuple
+import logging
+
+from sqlalchemy.exc import IntegrityError
+
+from database import db, Transaction
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded false positive rate"""
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+def fraud_status(fraud_analysis: Dict[str, Any]) -> str:
+    if fraud_analysis.get('is_fraud'):
+        return 'blocked'
+    return 'suspicious' if fraud_analysis.get('risk_level') in ('medium', 'high') else 'clean'
+
+def payment_response(transaction: Transaction) -> Tuple[Dict[str, Any], int]:
+    """Response body and status code of a stored payment attempt"""
+    metadata = json.loads(transaction.transaction_metadata or '{}')
+    if transaction.fraud_status == 'blocked':
+        return {
+            'status': 'blocked',
+            'reason': 'Transaction blocked due to fraud detection',
+            'fraud_analysis': metadata.get('fraud_analysis', {}),
+            'transaction_id': transaction.id
+        }, 403
+    if transaction.status == 'Pending':
+        return {'status': 'error', 'message': 'A payment with this idempotency key is still being processed',
+                'transaction_id': transaction.id}, 409
+    return {
+        'status': 'success',
+        'transaction_id': transaction.id,
+        'tx_hash': transaction.blockchain_tx_hash,
+        'network': transaction.blockchain_network,
+        'amount_usd': float(transaction.amount),
+        'sender_address': transaction.sender_address,
+        'receiver_address': transaction.receiver_address,
+        'processed_at': metadata.get('processed_at'),
+        'confirmations': metadata.get('confirmations', 1)
+    }, 200
+
+class PaymentIngestion:
+    """Deduplicated, persisted crypto payments"""
+
+    def __init__(self, cache_size: int = 10000, bloom_capacity: int = 1000000, bloom_error_rate: float = 0.001,
+                 claim_lease_seconds: float = 120.0):
+        self.cache_size = cache_size
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.claim_lease = timedelta(seconds=claim_lease_seconds)
+        self._lock = threading.Lock()
+        self._responses = LRUCache(cache_size)  # 'key:...' / 'hash:...' -> (request, response, status code)
+        self._seen = BloomFilter(bloom_capacity, bloom_error_rate)
+        self._warm = False  # until warm(), the filter cannot rule anything out
+        self._warming = None  # names remembered while warm() is loading
+        self._in_flight: Dict[str, threading.Event] = {}
+        self.stats = {'cache_hits': 0, 'database_hits': 0, 'lookups_skipped': 0, 'claim_conflicts': 0,
+                      'claims_taken_over': 0}
+
+    def warm(self):
+        """Load every stored key and hash into the Bloom filter"""
+        try:
+            with self._lock:
+                self._warming = []
+            seen = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+            for column, prefix in [(Transaction.idempotency_key, 'key:'), (Transaction.blockchain_tx_hash, 'hash:')]:
+                values = db.session.execute(db.select(column).where(column.isnot(None))).scalars()
+                for value in values.yield_per(10000):
+                    seen.add(prefix + value)
+            with self._lock:
+                # Payments recorded while loading may have missed the snapshot
+                for name in self._warming:
+                    seen.add(name)
+                self._seen = seen
+                self._warming = None
+                self._warm = True
+            logger.info(f"Payment dedup filter warmed with {seen.count} keys and hashes")
+            return {'status': 'success', 'entries': seen.count}
+
+        except Exception as e:
+            with self._lock:
+                self._warming = None
+            logger.error(f"Error warming payment dedup filter: {e}")
+            return {'status': 'error', 'message': str(e)}
+
+    # --- Lookups ---
+
+    def replay(self, data: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Stored response for a request already seen, or None for a new payment"""
+        names = self._names(data)
+        if not names:
+            return None
+        for name in names:
+            cached = self._wait_and_get(name)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                return self._checked(data, *cached)
+
+        if self._warm and not any(name in self._seen for name in names):
+            # Definitely new; the claim's unique index still guards against other workers
+            self.stats['lookups_skipped'] += 1
+            return None
+        transaction = self._find(data)
+        if transaction is None or self._expired(transaction):
+            return None  # an expired claim is taken over by ingest()
+        self.stats['database_hits'] += 1
+        return self._checked(data, *self._remember(transaction))
+
+    def _names(self, data):
+        names = []
+        if data.get('idempotency_key'):
+            names.append(f"key:{data['idempotency_key']}")
+        if data.get('tx_hash'):
+            names.append(f"hash:{data['tx_hash']}")
+        return names
+
+    def _find(self, data) -> Optional[Transaction]:
+        conditions = []
+        if data.get('idempotency_key'):
+            conditions.append(Transaction.idempotency_key == data['idempotency_key'])
+        if data.get('tx_hash'):
+            conditions.append(Transaction.blockchain_tx_hash == data['tx_hash'])
+        if not conditions:
+            return None
+        return Transaction.query.filter(db.or_(*conditions)).first()
+
+    def _wait_and_get(self, name):
+        with self._lock:
+            cached = self._responses.get(name)
+            event = self._in_flight.get(name) if cached is None else None
+        if event is not None:
+            # The first request for this key is still running here; answer with its outcome
+            event.wait(timeout=30)
+            with self._lock:
+                cached = self._responses.get(name)
+        return cached
+
+    def _remember(self, transaction: Transaction):
+        request = {'customer_id': transaction.customer_id, 'invoice_id': transaction.invoice_id,
+                   'amount': transaction.amount}
+        response, status_code = payment_response(transaction)
+        entry = (request, response, status_code)
+        with self._lock:
+            for name in self._transaction_names(transaction):
+                self._seen.add(name)
+                if self._warming is not None:
+                    self._warming.append(name)
+                if status_code != 409:
+                    self._responses.put(name, entry)
+        return entry
+
+    def _transaction_names(self, transaction):
+        names = []
+        if transaction.idempotency_key:
+            names.append(f"key:{transaction.idempotency_key}")
+        if transaction.blockchain_tx_hash:
+            names.append(f"hash:{transaction.blockchain_tx_hash}")
+        return names
+
+    def _same_payment(self, request, data) -> bool:
+        return (str(request['customer_id']) == str(data['customer_id'])
+                and str(request['invoice_id']) == str(data.get('invoice_id'))
+                and Decimal(str(request['amount'])).quantize(Decimal('0.01'))
+                == Decimal(str(data['amount_usd'])).quantize(Decimal('0.01')))
+
+    def _expired(self, transaction: Transaction) -> bool:
+        """Whether a Pending claim outlived its lease, so its worker is presumed dead"""
+        return (transaction.status == 'Pending'
+                and (transaction.claimed_at is None or transaction.claimed_at < datetime.utcnow() - self.claim_lease))
+
+    def _checked(self, data, request, response, status_code):
+        if not self._same_payment(request, data):
+            return {'status': 'error',
+                    'message': 'Idempotency key or transaction hash was already used for a different payment'}, 422
+        return {**response, 'idempotent_replay': True}, status_code
+
+    # --- Ingestion ---
+
+    def ingest(self, data: Dict[str, Any], fraud_analysis: Dict[str, Any],
+               processor: Callable[..., Dict[str, Any]]) -> Tuple[Dict[str, Any], int]:
+        """Record and process one payment (or its blocked attempt), returning the response"""
+        names = self._names(data)
+        event = threading.Event()
+        with self._lock:
+            busy = any(name in self._in_flight for name in names)
+            if not busy:
+                for name in names:
+                    self._in_flight[name] = event
+        if busy:
+            # Another thread is processing this key: answer with its outcome
+            return self.replay(data) or self.ingest(data, fraud_analysis, processor)
+
+        try:
+            return self._ingest(data, fraud_analysis, processor)
+        finally:
+            with self._lock:
+                for name in names:
+                    if self._in_flight.get(name) is event:
+                        del self._in_flight[name]
+            event.set()
+
+    def _ingest(self, data, fraud_analysis, processor):
+        blocked = bool(fraud_analysis.get('is_fraud'))
+        transaction = Transaction(
+            customer_id=data['customer_id'],
+            invoice_id=data.get('invoice_id'),
+            transaction_type='payment',
+            amount=data['amount_usd'],
+            currency='USD',
+            status='Cancelled' if blocked else 'Pending',
+            claimed_at=None if blocked else datetime.utcnow(),
+            payment_method='crypto',
+            payment_gateway='blockchain',
+            blockchain_network=data['network'],
+            blockchain_tx_hash=data.get('tx_hash'),
+            sender_address=data['sender_address'],
+            receiver_address=data['receiver_address'],
+            idempotency_key=data.get('idempotency_key'),
+            fraud_score=fraud_analysis.get('fraud_score', 0.0),
+            fraud_status=fraud_status(fraud_analysis),
+            transaction_metadata=json.dumps({'fraud_analysis': fraud_analysis}, default=str)
+        )
+        transaction, existing_response = self._claim(transaction, data)
+        if existing_response is not None:
+            return existing_response
+        if blocked:
+            return self._remember(transaction)[1:]
+
+        try:
+            payment_result = processor(
+                data['customer_id'], data['invoice_id'], data['amount_usd'], data['network'],
+                data['sender_address'], data['receiver_address'],
+                idempotency_key=data.get('idempotency_key')
+            )
+        except Exception:
+            self._release(transaction)
+            raise
+        if payment_result.get('status') != 'success':
+            self._release(transaction)
+            return payment_result, 400
+
+        metadata = json.loads(transaction.transaction_metadata)
+        metadata.update({'processed_at': payment_result.get('processed_at'),
+                         'confirmations': payment_result.get('confirmations', 1)})
+        transaction.blockchain_tx_hash = transaction.blockchain_tx_hash or payment_result.get('tx_hash')
+        transaction.status = 'Completed'
+        transaction.transaction_metadata = json.dumps(metadata, default=str)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # The processor's hash already belongs to another payment
+            db.session.rollback()
+            self.stats['claim_conflicts'] += 1
+            owner = Transaction.query.filter_by(blockchain_tx_hash=payment_result.get('tx_hash')).first()
+            db.session.delete(transaction)
+            db.session.commit()
+            if owner is None:
+                raise
+            return self._checked(data, *self._remember(owner))
+        return self._remember(transaction)[1:]
+
+    def _claim(self, transaction, data):
+        """Insert the row that owns this key
+
+        Returns the row this request now owns, or on a unique conflict the
+        existing payment's response. An expired claim for the same payment
+        is taken over instead.
+        """
+        db.session.add(transaction)
+        try:
+            db.session.commit()
+            return transaction, None
+        except IntegrityError:
+            db.session.rollback()
+            self.stats['claim_conflicts'] += 1
+            existing = self._find(data)
+            if existing is None:
+                raise
+            request = {'customer_id': existing.customer_id, 'invoice_id': existing.invoice_id,
+                       'amount': existing.amount}
+            if self._expired(existing) and self._same_payment(request, data) and self._take_over(existing, transaction):
+                return existing, None
+            return None, self._checked(data, *self._remember(existing))
+
+    def _take_over(self, existing, transaction) -> bool:
+        """Renew an expired claim for this request; False if another worker renewed it first"""
+        now = datetime.utcnow()
+        table = Transaction.__table__
+        taken = db.session.connection().execute(
+            table.update()
+            .where(table.c.id == existing.id, table.c.status == 'Pending',
+                   db.or_(table.c.claimed_at.is_(None), table.c.claimed_at < now - self.claim_lease))
+            .values(claimed_at=now, status=transaction.status, fraud_score=transaction.fraud_score,
+                    fraud_status=transaction.fraud_status, transaction_metadata=transaction.transaction_metadata)
+        ).rowcount
+        db.session.commit()
+        if not taken:
+            return False
+        db.session.refresh(existing)
+        self.stats['claims_taken_over'] += 1
+        logger.warning(f"Took over expired payment claim {existing.id}")
+        return True
+
+    def _release(self, transaction):
+        """Delete a failed payment's claim so the client can retry with the same key"""
+        db.session.rollback()
+        db.session.delete(transaction)
+        db.session.commit()
+
+# Global ingestion instance, configured from the environment
+payment_ingestion = PaymentIngestion(
+    cache_size=int(os.getenv('PAYMENT_DEDUP_CACHE_SIZE', 10000)),
+    bloom_capacity=int(os.getenv('PAYMENT_DEDUP_BLOOM_CAPACITY', 1000000)),
+    claim_lease_seconds=float(os.getenv('PAYMENT_CLAIM_LEASE_SECONDS', 120))
+)
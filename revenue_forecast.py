@@ -0,0 +1,123 @@
+"""
+Vectorized revenue forecasting for BillChain AI
+
+Projects monthly revenue for many what-if scenarios at once. Every
+scenario's growth and churn rate is broadcast against the forecast
+horizon, so a grid of thousands of scenarios is one NumPy expression
+instead of a Python loop per scenario and month. Results are returned as
+a columnar payload: one list per field, one row per scenario.
+"""
+
+from statistics import NormalDist
+from typing import Dict, Any, Optional, Sequence
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HORIZON = 12
+DEFAULT_VOLATILITY = 0.02  # monthly standard deviation of the net growth rate
+
+def scenario_grid(growth_rates: Sequence[float], churn_rates: Sequence[float]):
+    """Every combination of the given growth and churn rates, growth-major"""
+    growth, churn = np.meshgrid(np.asarray(growth_rates, dtype=float), np.asarray(churn_rates, dtype=float),
+                                indexing='ij')
+    return growth.ravel(), churn.ravel()
+
+def forecast_scenarios(current_revenue, growth_rates, churn_rates, horizon: int = DEFAULT_HORIZON,
+                       volatility: float = DEFAULT_VOLATILITY, confidence_level: float = 0.8) -> Dict[str, np.ndarray]:
+    """Monthly revenue for each scenario over ``horizon`` months
+
+    ``current_revenue``, ``growth_rates`` and ``churn_rates`` broadcast
+    against each other (scalars or arrays of one length). Bands assume the
+    monthly net rate varies with ``volatility``, widening with sqrt(month).
+    """
+    if horizon < 1:
+        raise ValueError('horizon must be at least 1')
+    if not 0 < confidence_level < 1:
+        raise ValueError('confidence_level must be between 0 and 1')
+
+    revenue, growth, churn = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(current_revenue, dtype=float)),
+        np.atleast_1d(np.asarray(growth_rates, dtype=float)),
+        np.atleast_1d(np.asarray(churn_rates, dtype=float))
+    )
+    months = np.arange(1, horizon + 1, dtype=float)
+
+    # (scenarios, 1) against (horizon,) -> (scenarios, horizon)
+    net_rate = (growth - churn)[:, None]
+    predicted = revenue[:, None] * (1 + net_rate) ** months
+    z = NormalDist().inv_cdf(0.5 + confidence_level / 2)
+    spread = np.exp(z * volatility * np.sqrt(months))
+
+    return {
+        'months': months.astype(int),
+        'growth_rate': growth,
+        'churn_rate': churn,
+        'predicted_revenue': predicted,
+        'lower_bound': predicted / spread,
+        'upper_bound': predicted * spread,
+        'confidence': 0.85 - months * 0.02,  # confidence decreases over time
+        'projected_yearly_revenue': predicted[:, :12].sum(axis=1)
+    }
+
+def columnar_payload(forecast: Dict[str, np.ndarray], decimals: int = 2) -> Dict[str, Any]:
+    """JSON-ready columnar form of a forecast"""
+    return {
+        'scenario_count': int(len(forecast['growth_rate'])),
+        'months': forecast['months'].tolist(),
+        'confidence': np.round(forecast['confidence'], 2).tolist(),
+        'scenarios': {
+            'growth_rate': forecast['growth_rate'].tolist(),
+            'churn_rate': forecast['churn_rate'].tolist()
+        },
+        'predicted_revenue': np.round(forecast['predicted_revenue'], decimals).tolist(),
+        'lower_bound': np.round(forecast['lower_bound'], decimals).tolist(),
+        'upper_bound': np.round(forecast['upper_bound'], decimals).tolist(),
+        'projected_yearly_revenue': np.round(forecast['projected_yearly_revenue'], decimals).tolist()
+    }
+
+def forecast_request(current_revenue: float, growth_rates, churn_rates, grid: bool = False,
+                     horizon: int = DEFAULT_HORIZON, volatility: Optional[float] = None,
+                     confidence_level: float = 0.8, max_scenarios: Optional[int] = None,
+                     max_horizon: Optional[int] = None, max_points: Optional[int] = None) -> Dict[str, Any]:
+    """Validate scenario parameters, forecast them and return the columnar payload
+
+    Limits are checked before anything is expanded: ``max_scenarios`` on
+    the scenario count (the grid's product of lengths), ``max_horizon`` on
+    the months, and ``max_points`` on scenarios x months, the output size.
+    """
+    try:
+        horizon = int(horizon)
+        if horizon < 1:
+            return {'status': 'error', 'message': 'horizon must be at least 1'}
+        if max_horizon and horizon > max_horizon:
+            return {'status': 'error', 'message': f'horizon must be at most {max_horizon} months'}
+
+        growth = np.atleast_1d(np.asarray(growth_rates, dtype=float))
+        churn = np.atleast_1d(np.asarray(churn_rates, dtype=float))
+        if grid:
+            scenario_count = len(growth) * len(churn)
+        elif len(growth) != len(churn) and 1 not in (len(growth), len(churn)):
+            return {'status': 'error', 'message': 'growth_rates and churn_rates must have the same length'}
+        else:
+            scenario_count = max(len(growth), len(churn))
+
+        if max_scenarios and scenario_count > max_scenarios:
+            return {'status': 'error', 'message': f'At most {max_scenarios} scenarios per request'}
+        if max_points and scenario_count * horizon > max_points:
+            return {'status': 'error',
+                    'message': f'At most {max_points} scenario months per request; reduce the scenarios or the horizon'}
+        if grid:
+            growth, churn = scenario_grid(growth, churn)
+
+        forecast = forecast_scenarios(
+            current_revenue, growth, churn, horizon=horizon,
+            volatility=DEFAULT_VOLATILITY if volatility is None else volatility,
+            confidence_level=confidence_level
+        )
+        return {'status': 'success', 'current_revenue': float(current_revenue), **columnar_payload(forecast)}
+
+    except (TypeError, ValueError) as e:
+        return {'status': 'error', 'message': str(e)}
@@ -0,0 +1,307 @@
+"""
+Daily and monthly revenue rollups for BillChain AI analytics
+
+Per-tenant rollup rows (revenue, paid/pending invoice counts, new and
+churned customers) plus a per-customer paid revenue table are maintained
+incrementally from SQLAlchemy flush events, inside the same transaction as
+the invoice or customer write. Analytics then read a handful of rollup rows
+instead of scanning invoices. rebuild() recomputes everything from the base
+tables, for backfills and after bulk statements that bypass the ORM.
+"""
+
+import math
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Dict, Any, Optional
+from collections import defaultdict
+import logging
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from database import db, Customer, Invoice, RevenueRollupDaily, RevenueRollupMonthly, CustomerRevenue
+from dashboard_metrics import previous_value, track_old_values, untrack_old_values
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLUMNS = ['revenue', 'paid_invoices', 'pending_invoices', 'new_customers', 'churned_customers']
+INVOICE_FIELDS = ['customer_id', 'status', 'total_amount', 'invoice_date']
+CUSTOMER_FIELDS = ['tenant_id', 'status', 'created_at', 'churned_at']
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def _invoice_contribution(values, tenant_id):
+    """Rollup deltas of one invoice in the given state"""
+    if values.get('invoice_date') is None or tenant_id is None:
+        return {}, {}
+    day = values['invoice_date'].date()
+    paid = values.get('status') == 'Paid'
+    amount = Decimal(str(values.get('total_amount') or 0)) if paid else Decimal(0)
+    columns = {
+        'revenue': amount,
+        'paid_invoices': int(paid),
+        'pending_invoices': int(values.get('status') == 'Pending')
+    }
+    customer = {(values['customer_id'], tenant_id): amount} if paid else {}
+    return {(tenant_id, day): columns}, customer
+
+def _customer_contribution(values):
+    """Rollup deltas of one customer in the given state"""
+    if values.get('created_at') is None:
+        return {}
+    tenant_id = values.get('tenant_id') or 'default'
+    buckets = defaultdict(dict)
+    buckets[(tenant_id, values['created_at'].date())]['new_customers'] = 1
+    if values.get('status') != 'Active' and values.get('churned_at') is not None:
+        buckets[(tenant_id, values['churned_at'].date())]['churned_customers'] = 1
+    return buckets
+
+class RevenueRollups:
+    """Incrementally maintained per-tenant revenue rollups"""
+
+    def __init__(self):
+        self._installed = False
+
+    def install(self):
+        """Start maintaining the rollups from session events"""
+        if self._installed:
+            return
+        for model, fields in [(Invoice, INVOICE_FIELDS), (Customer, CUSTOMER_FIELDS)]:
+            for name in fields:
+                track_old_values(getattr(model, name))
+        event.listen(Session, 'before_flush', self._before_flush)
+        event.listen(Session, 'after_flush', self._after_flush)
+        self._installed = True
+
+    def remove(self):
+        if not self._installed:
+            return
+        for model, fields in [(Invoice, INVOICE_FIELDS), (Customer, CUSTOMER_FIELDS)]:
+            for name in fields:
+                untrack_old_values(getattr(model, name))
+        event.remove(Session, 'before_flush', self._before_flush)
+        event.remove(Session, 'after_flush', self._after_flush)
+        self._installed = False
+
+    # --- Reads ---
+
+    def revenue_since(self, since: date, tenant_id: Optional[str] = None) -> float:
+        """Paid revenue from the daily rollup, whole days from ``since``"""
+        query = db.session.query(db.func.sum(RevenueRollupDaily.revenue)).filter(RevenueRollupDaily.day >= since)
+        if tenant_id:
+            query = query.filter(RevenueRollupDaily.tenant_id == tenant_id)
+        return float(query.scalar() or 0)
+
+    def monthly(self, months: int = 12, tenant_id: Optional[str] = None, today: Optional[date] = None):
+        """Monthly totals, oldest first, for the last ``months`` months including the current one"""
+        today = today or datetime.utcnow().date()
+        first = month_start(today)
+        for _ in range(months - 1):
+            first = month_start(first - timedelta(days=1))
+
+        columns = [db.func.sum(getattr(RevenueRollupMonthly, name)) for name in ROLLUP_COLUMNS]
+        query = (db.session.query(RevenueRollupMonthly.month, *columns)
+                 .filter(RevenueRollupMonthly.month >= first)
+                 .group_by(RevenueRollupMonthly.month)
+                 .order_by(RevenueRollupMonthly.month))
+        if tenant_id:
+            query = query.filter(RevenueRollupMonthly.tenant_id == tenant_id)
+        return [
+            {'month': row[0].isoformat(), **{name: float(value or 0) if name == 'revenue' else int(value or 0)
+                                             for name, value in zip(ROLLUP_COLUMNS, row[1:])}}
+            for row in query.all()
+        ]
+
+    def growth_rate(self, tenant_id: Optional[str] = None, today: Optional[date] = None) -> Optional[float]:
+        """Revenue growth of the last complete month over the one before it"""
+        today = today or datetime.utcnow().date()
+        last_month = month_start(month_start(today) - timedelta(days=1))
+        previous_month = month_start(last_month - timedelta(days=1))
+        revenue = {row['month']: row['revenue'] for row in self.monthly(3, tenant_id, today)}
+        previous = revenue.get(previous_month.isoformat(), 0.0)
+        if not previous:
+            return None
+        return (revenue.get(last_month.isoformat(), 0.0) - previous) / previous
+
+    def customer_concentration(self, tenant_id: Optional[str] = None, top_share: float = 0.1) -> Optional[float]:
+        """Share of paid revenue coming from the top ``top_share`` of paying customers"""
+        query = CustomerRevenue.query.filter(CustomerRevenue.paid_revenue > 0)
+        if tenant_id:
+            query = query.filter(CustomerRevenue.tenant_id == tenant_id)
+        paying = query.count()
+        if not paying:
+            return None
+        total = float(query.with_entities(db.func.sum(CustomerRevenue.paid_revenue)).scalar() or 0)
+        top = (query.with_entities(CustomerRevenue.paid_revenue)
+               .order_by(CustomerRevenue.paid_revenue.desc())
+               .limit(max(1, math.ceil(paying * top_share))).subquery())
+        top_total = float(db.session.query(db.func.sum(top.c.paid_revenue)).scalar() or 0)
+        return top_total / total if total else None
+
+    # --- Maintenance ---
+
+    def rebuild(self):
+        """Recompute every rollup from invoices and customers"""
+        try:
+            daily = defaultdict(lambda: defaultdict(int))
+            customers = defaultdict(Decimal)
+            tenants = dict(db.session.query(Customer.id, Customer.tenant_id).all())
+
+            invoice_rows = db.session.query(*[getattr(Invoice, name) for name in INVOICE_FIELDS]).yield_per(5000)
+            for row in invoice_rows:
+                buckets, paid = _invoice_contribution(dict(zip(INVOICE_FIELDS, row)), tenants.get(row[0]))
+                _merge(daily, buckets, 1)
+                for key, amount in paid.items():
+                    customers[key] += amount
+
+            customer_rows = db.session.query(*[getattr(Customer, name) for name in CUSTOMER_FIELDS]).yield_per(5000)
+            for row in customer_rows:
+                _merge(daily, _customer_contribution(dict(zip(CUSTOMER_FIELDS, row))), 1)
+
+            monthly = defaultdict(lambda: defaultdict(int))
+            for (tenant_id, day), columns in daily.items():
+                _merge(monthly, {(tenant_id, month_start(day)): columns}, 1)
+
+            for model in [RevenueRollupDaily, RevenueRollupMonthly, CustomerRevenue]:
+                db.session.execute(db.delete(model))
+            _bulk_insert(RevenueRollupDaily, 'day', daily)
+            _bulk_insert(RevenueRollupMonthly, 'month', monthly)
+            if customers:
+                db.session.execute(db.insert(CustomerRevenue), [
+                    {'customer_id': customer_id, 'tenant_id': tenant_id, 'paid_revenue': amount}
+                    for (customer_id, tenant_id), amount in customers.items()
+                ])
+            db.session.commit()
+            logger.info(f"Rebuilt revenue rollups: {len(daily)} daily rows, {len(monthly)} monthly rows")
+            return {'status': 'success', 'daily_rows': len(daily), 'monthly_rows': len(monthly)}
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error rebuilding revenue rollups: {e}")
+            return {'status': 'error', 'message': str(e)}
+
+    def record_bulk_customers(self, rows):
+        """Count customers written by a bulk INSERT, which bypasses the flush events"""
+        if not self._installed:
+            return
+        daily = defaultdict(lambda: defaultdict(int))
+        for row in rows:
+            _merge(daily, _customer_contribution(row), 1)
+        monthly = defaultdict(lambda: defaultdict(int))
+        for (tenant_id, day), columns in daily.items():
+            _merge(monthly, {(tenant_id, month_start(day)): columns}, 1)
+
+        connection = db.session.connection()
+        _apply_deltas(connection, RevenueRollupDaily, 'day', daily)
+        _apply_deltas(connection, RevenueRollupMonthly, 'month', monthly)
+
+    # --- Session events ---
+
+    def _before_flush(self, session, flush_context, instances):
+        now = datetime.utcnow()
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Customer):
+                if obj.status not in (None, 'Active') and obj.churned_at is None:
+                    obj.churned_at = now
+                elif obj.status == 'Active' and obj.churned_at is not None:
+                    obj.churned_at = None
+        for obj in list(session.dirty) + list(session.deleted):
+            fields = INVOICE_FIELDS if isinstance(obj, Invoice) else CUSTOMER_FIELDS if isinstance(obj, Customer) else []
+            for name in fields:
+                getattr(obj, name)
+
+    def _after_flush(self, session, flush_context):
+        changes = []  # (model, sign, values)
+        for obj in session.new:
+            changes.append((type(obj), 1, obj, lambda obj, name: getattr(obj, name)))
+        for obj in session.deleted:
+            changes.append((type(obj), -1, obj, lambda obj, name: inspect(obj).dict.get(name)))
+        for obj in session.dirty:
+            if isinstance(obj, (Invoice, Customer)) and session.is_modified(obj):
+                changes.append((type(obj), -1, obj, lambda obj, name: previous_value(inspect(obj), name)))
+                changes.append((type(obj), 1, obj, lambda obj, name: getattr(obj, name)))
+
+        changes = [change for change in changes if change[0] in (Invoice, Customer)]
+        if not changes:
+            return
+
+        invoice_values = [(sign, {name: value_of(obj, name) for name in INVOICE_FIELDS})
+                          for model, sign, obj, value_of in changes if model is Invoice]
+        connection = session.connection()
+        tenants = {}
+        customer_ids = {values['customer_id'] for sign, values in invoice_values}
+        if customer_ids:
+            tenants = dict(connection.execute(
+                db.select(Customer.id, Customer.tenant_id).where(Customer.id.in_(customer_ids))
+            ).all())
+
+        daily = defaultdict(lambda: defaultdict(int))
+        customers = defaultdict(Decimal)
+        for sign, values in invoice_values:
+            buckets, paid = _invoice_contribution(values, tenants.get(values['customer_id']))
+            _merge(daily, buckets, sign)
+            for key, amount in paid.items():
+                customers[key] += sign * amount
+        for model, sign, obj, value_of in changes:
+            if model is Customer:
+                _merge(daily, _customer_contribution({name: value_of(obj, name) for name in CUSTOMER_FIELDS}), sign)
+
+        monthly = defaultdict(lambda: defaultdict(int))
+        for (tenant_id, day), columns in daily.items():
+            _merge(monthly, {(tenant_id, month_start(day)): columns}, 1)
+
+        _apply_deltas(connection, RevenueRollupDaily, 'day', daily)
+        _apply_deltas(connection, RevenueRollupMonthly, 'month', monthly)
+        for (customer_id, tenant_id), amount in customers.items():
+            if amount:
+                _add_or_insert(connection, CustomerRevenue, {'customer_id': customer_id},
+                               {'paid_revenue': amount}, {'tenant_id': tenant_id})
+
+def _merge(target, buckets, sign):
+    for key, columns in buckets.items():
+        for name, value in columns.items():
+            target[key][name] += sign * value
+
+def _bulk_insert(model, period_column, rows):
+    if rows:
+        db.session.execute(db.insert(model), [
+            {'tenant_id': tenant_id, period_column: period, **{name: columns.get(name, 0) for name in ROLLUP_COLUMNS}}
+            for (tenant_id, period), columns in rows.items()
+        ])
+
+def _apply_deltas(connection, model, period_column, rows):
+    for (tenant_id, period), columns in rows.items():
+        deltas = {name: value for name, value in columns.items() if value}
+        if deltas:
+            _add_or_insert(connection, model, {'tenant_id': tenant_id, period_column: period}, deltas)
+
+def _add_or_insert(connection, model, key: Dict[str, Any], deltas: Dict[str, Any], extra: Optional[Dict[str, Any]] = None):
+    """Add deltas to an existing rollup row, or insert it
+
+    A single upsert where the dialect has one, so two sessions creating the
+    same row cannot fail each other's flush with a duplicate key.
+    """
+    table = model.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table).values({**key, **(extra or {}), **deltas})
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={name: table.c[name] + statement.excluded[name] for name in deltas}
+        ))
+        return
+    updated = connection.execute(
+        table.update()
+        .where(*[table.c[name] == value for name, value in key.items()])
+        .values({name: table.c[name] + value for name, value in deltas.items()})
+    ).rowcount
+    if not updated:
+        connection.execute(table.insert().values({**key, **(extra or {}), **deltas}))
+
+# Global rollups instance
+revenue_rollups = RevenueRollups()
@@ -0,0 +1,167 @@
+"""
+Pooled, batched JSON-RPC client for Ethereum nodes
+
+Keeps HTTP connections to the node open in a requests session pool and
+packs many calls into JSON-RPC batch requests, so checking thousands of
+wallet balances costs a few POSTs instead of one round trip per address.
+Large batches are split into chunks of ``max_batch_size`` and sent over
+the pool concurrently. The gas price, which every transaction needs but
+changes slowly, is cached for ``gas_price_ttl`` seconds.
+"""
+
+import time
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+class JsonRpcError(Exception):
+    """Error object returned by the node for one call"""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(f"JSON-RPC error {code}: {message}")
+        self.code = code
+        self.message = message
+        self.data = data
+
+def _from_hex(value: Optional[str]) -> Optional[int]:
+    return int(value, 16) if isinstance(value, str) else value
+
+class JsonRpcClient:
+    """JSON-RPC over a pooled HTTP session, with batching and a short gas price cache"""
+
+    def __init__(self, url: str, pool_size: int = 10, timeout: float = 10.0, max_batch_size: int = 100,
+                 retries: int = 2, gas_price_ttl: float = 5.0):
+        self.url = url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self.gas_price_ttl = gas_price_ttl
+
+        # Only connection failures are retried: the request never reached the node
+        retry = Retry(total=retries, connect=retries, read=False, status=False, other=False,
+                      backoff_factor=0.05, allowed_methods=None)
+        self.session = requests.Session()
+        self.session.mount(url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry))
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._gas_price: Optional[Tuple[float, int]] = None  # (fetched at, wei)
+        self.requests_sent = 0
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.session.close()
+
+    # --- Transport ---
+
+    def _post(self, payload):
+        with self._lock:
+            self.requests_sent += 1
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _request(self, method: str, params: Sequence[Any]) -> Dict[str, Any]:
+        return {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': list(params)}
+
+    def call(self, method: str, *params) -> Any:
+        """Result of one call; raises JsonRpcError if the node returns an error"""
+        reply = self._post(self._request(method, params))
+        if reply.get('error'):
+            error = reply['error']
+            raise JsonRpcError(error.get('code'), error.get('message'), error.get('data'))
+        return reply.get('result')
+
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Any]:
+        """Results of ``(method, params)`` calls in order; a failed call's slot holds its JsonRpcError"""
+        payload = [self._request(method, params) for method, params in calls]
+        chunks = [payload[start:start + self.max_batch_size]
+                  for start in range(0, len(payload), self.max_batch_size)]
+        if len(chunks) > 1:
+            replies = list(self._pool().map(self._post_chunk, chunks))
+        else:
+            replies = [self._post_chunk(chunk) for chunk in chunks]
+
+        by_id = {reply.get('id'): reply for chunk in replies for reply in chunk}
+        results = []
+        for request in payload:
+            reply = by_id.get(request['id'])
+            if reply is None:
+                results.append(JsonRpcError(-32603, f"No response for {request['method']}"))
+            elif reply.get('error'):
+                error = reply['error']
+                results.append(JsonRpcError(error.get('code'), error.get('message'), error.get('data')))
+            else:
+                results.append(reply.get('result'))
+        return results
+
+    def _post_chunk(self, chunk):
+        replies = self._post(chunk)
+        if isinstance(replies, dict):
+            # Nodes that do not support batches answer with a single error object
+            error = replies.get('error') or {}
+            raise JsonRpcError(error.get('code', -32600), error.get('message', 'Batch requests are not supported'))
+        return replies
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='json-rpc')
+        return self._executor
+
+    # --- Ethereum helpers ---
+
+    def get_balances(self, addresses: Sequence[str], block: str = 'latest') -> Dict[str, Optional[int]]:
+        """Balance in wei per address, None where the node returned an error"""
+        results = self.batch([('eth_getBalance', (address, block)) for address in addresses])
+        return {address: None if isinstance(result, JsonRpcError) else _from_hex(result)
+                for address, result in zip(addresses, results)}
+
+    def get_transaction_counts(self, addresses: Sequence[str], block: str = 'pending') -> Dict[str, Optional[int]]:
+        """Next nonce per address, None where the node returned an error"""
+        results = self.batch([('eth_getTransactionCount', (address, block)) for address in addresses])
+        return {address: None if isinstance(result, JsonRpcError) else _from_hex(result)
+                for address, result in zip(addresses, results)}
+
+    def gas_price(self) -> int:
+        """Gas price in wei, refreshed at most every ``gas_price_ttl`` seconds"""
+        cached = self._cached_gas_price()
+        if cached is not None:
+            return cached
+        return self._store_gas_price(_from_hex(self.call('eth_gasPrice')))
+
+    def transaction_fields(self, address: str) -> Tuple[int, int]:
+        """(pending nonce, gas price) for a new transaction, in a single round trip"""
+        gas_price = self._cached_gas_price()
+        if gas_price is not None:
+            return _from_hex(self.call('eth_getTransactionCount', address, 'pending')), gas_price
+        nonce, gas_price = self.batch([('eth_getTransactionCount', (address, 'pending')), ('eth_gasPrice', ())])
+        for result in (nonce, gas_price):
+            if isinstance(result, JsonRpcError):
+                raise result
+        return _from_hex(nonce), self._store_gas_price(_from_hex(gas_price))
+
+    def send_raw_transaction(self, raw_transaction: str) -> str:
+        return self.call('eth_sendRawTransaction', raw_transaction)
+
+    def _cached_gas_price(self) -> Optional[int]:
+        cached = self._gas_price
+        if cached is not None and time.monotonic() - cached[0] < self.gas_price_ttl:
+            return cached[1]
+        return None
+
+    def _store_gas_price(self, wei: int) -> int:
+        self._gas_price = (time.monotonic(), wei)
+        return wei
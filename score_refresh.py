@@ -0,0 +1,139 @@
+"""
+Incremental AI score refresh for BillChain AI
+
+Streams customers through the churn and CLTV models in keyset-paginated
+chunks. Each chunk is scored in one batch, written back with a single bulk
+UPDATE and committed together with a checkpoint, so a crashed run resumes
+after the last committed chunk. Only customers changed since they were last
+scored are rescored, unless the promoted model versions changed.
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable
+import logging
+
+from database import db, Customer, JobCheckpoint
+from serializers import customer_serializer
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = 'ai_score_refresh'
+
+def ai_score_columns(churn_result: Dict[str, Any], cltv_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Customer AI column values from one churn and one CLTV prediction"""
+    columns = {}
+    if churn_result.get('status') == 'success':
+        columns['churn_risk_score'] = churn_result['churn_probability']
+        columns['churn_risk_level'] = churn_result['risk_level']
+    if cltv_result.get('status') == 'success':
+        columns['lifetime_value'] = cltv_result['predicted_cltv']
+        columns['customer_segment'] = cltv_result['value_segment']
+    return columns
+
+class ScoreRefreshJob:
+    """Chunked, resumable rescoring of the stored customer AI columns"""
+
+    def __init__(self, service_getter: Callable, chunk_size: int = 500):
+        self.service_getter = service_getter
+        self.chunk_size = chunk_size
+
+    def run(self, full: bool = False, max_chunks: Optional[int] = None) -> Dict[str, Any]:
+        """Rescore changed customers, resuming an interrupted run if there is one
+
+        ``max_chunks`` bounds the work done by this call; the run stays open
+        and the next call continues from the checkpoint.
+        """
+        try:
+            service = self.service_getter()
+            service.ensure_models_loaded()
+            if service.churn_model is None and service.cltv_model is None:
+                return {'status': 'error', 'message': 'No trained models to score with'}
+
+            checkpoint = self._checkpoint()
+            details = json.loads(checkpoint.details or '{}')
+            model_versions = dict(service.model_versions)
+
+            resumed = checkpoint.status == 'running'
+            if not resumed:
+                # New model versions invalidate every stored score
+                full = full or details.get('model_versions') != model_versions
+                details = {'full': full, 'model_versions': model_versions, 'scored': 0, 'chunks': 0}
+                checkpoint.status = 'running'
+                checkpoint.last_id = 0
+                checkpoint.started_at = datetime.utcnow()
+                checkpoint.completed_at = None
+            full = details['full']
+
+            last_id = checkpoint.last_id or 0
+            chunks_this_call = 0
+            while True:
+                if max_chunks is not None and chunks_this_call >= max_chunks:
+                    logger.info(f"Score refresh paused after {chunks_this_call} chunks at customer {last_id}")
+                    return {'status': 'running', 'resumed': resumed, 'last_id': last_id, **details}
+
+                customers = self._next_chunk(last_id, full)
+                if not customers:
+                    break
+
+                scored = self._score_chunk(service, customers)
+                last_id = customers[-1].id
+                details['scored'] += scored
+                details['chunks'] += 1
+                chunks_this_call += 1
+
+                # Scores and cursor commit together, so a crash never loses or repeats a chunk
+                checkpoint.last_id = last_id
+                checkpoint.details = json.dumps(details)
+                db.session.commit()
+                db.session.expunge_all()
+                checkpoint = self._checkpoint()
+
+            checkpoint.status = 'completed'
+            checkpoint.completed_at = datetime.utcnow()
+            checkpoint.details = json.dumps(details)
+            db.session.commit()
+            logger.info(f"Score refresh rescored {details['scored']} customers in {details['chunks']} chunks")
+            return {'status': 'success', 'resumed': resumed, 'last_id': last_id, **details}
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error refreshing AI scores: {e}")
+            return {'status': 'error', 'message': str(e)}
+
+    def _checkpoint(self) -> JobCheckpoint:
+        checkpoint = JobCheckpoint.query.filter_by(job_name=JOB_NAME).first()
+        if checkpoint is None:
+            checkpoint = JobCheckpoint(job_name=JOB_NAME, status='completed', last_id=0)
+            db.session.add(checkpoint)
+            db.session.flush()
+        return checkpoint
+
+    def _next_chunk(self, last_id: int, full: bool):
+        query = Customer.query.filter(Customer.id > last_id)
+        if not full:
+            query = query.filter(db.or_(
+                Customer.ai_scored_at.is_(None),
+                Customer.updated_at > Customer.ai_scored_at
+            ))
+        return query.order_by(Customer.id).limit(self.chunk_size).all()
+
+    def _score_chunk(self, service, customers) -> int:
+        """Score one chunk in batch and write it back with one bulk UPDATE"""
+        customers_data = customer_serializer.dump_many(customers)
+        churn_batch = service.predict_churn_batch(customers_data)
+        cltv_batch = service.predict_cltv_batch(customers_data)
+
+        scored_at = datetime.utcnow()
+        updates = []
+        for i, customer in enumerate(customers):
+            churn_result = churn_batch['results'][i] if churn_batch['status'] == 'success' else churn_batch
+            cltv_result = cltv_batch['results'][i] if cltv_batch['status'] == 'success' else cltv_batch
+            columns = ai_score_columns(churn_result, cltv_result)
+            if columns:
+                # updated_at is pinned to ai_scored_at so the write itself is not seen as a change
+                updates.append({'id': customer.id, 'ai_scored_at': scored_at, 'updated_at': scored_at, **columns})
+
+        if updates:
+            db.session.execute(db.update(Customer), updates)
+        return len(updates)
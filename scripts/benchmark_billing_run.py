@@ -0,0 +1,73 @@
+"""
+Benchmark the set-based billing run against the per-subscription loop it replaced.
+
+Usage:
+    python scripts/benchmark_billing_run.py --subscriptions 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db, Subscription, Invoice
+from billing_run import BillingRun
+from test_billing import create_billing_app, seed_subscriptions
+
+
+def legacy_run(now):
+    """The original loop: one existence query and one COUNT per subscription"""
+    due_subscriptions = Subscription.query.filter(
+        Subscription.status == 'Active',
+        Subscription.auto_renew == True,
+        Subscription.next_billing_date <= now + timedelta(days=5)
+    ).all()
+    generated = 0
+    for subscription in due_subscriptions:
+        existing_invoice = Invoice.query.filter(
+            Invoice.customer_id == subscription.customer_id,
+            Invoice.status.in_(['Draft', 'Sent', 'Pending']),
+            Invoice.invoice_date >= subscription.next_billing_date - timedelta(days=5)
+        ).first()
+        if not existing_invoice:
+            db.session.add(Invoice(
+                customer_id=subscription.customer_id,
+                invoice_number=f"INV-{now.strftime('%Y%m%d')}-{Invoice.query.count() + 1:04d}",
+                subtotal=subscription.amount,
+                total_amount=subscription.amount,
+                due_date=subscription.next_billing_date + timedelta(days=7),
+                ai_generated=True,
+                auto_sent=True
+            ))
+            subscription.next_billing_date = subscription.next_billing_date + timedelta(days=30)
+            generated += 1
+    db.session.commit()
+    return generated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Billing run benchmark')
+    parser.add_argument('--subscriptions', type=int, default=5000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+    now = datetime.utcnow()
+
+    for name in ['legacy', 'set_based']:
+        app = create_billing_app()
+        with app.app_context():
+            db.create_all()
+            seed_subscriptions(args.subscriptions, now)
+            start = time.perf_counter()
+            if name == 'legacy':
+                generated = legacy_run(now)
+            else:
+                generated = BillingRun(chunk_size=args.chunk_size).run(now=now)['invoices_generated']
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10} {generated:>7} invoices {elapsed:>8.2f}s {generated / elapsed:>10.0f} invoices/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark how the sharded billing run scales with worker processes.
+
+Generates a subscription dataset once, then bills it with each worker count,
+resetting invoices and billing dates between runs. SQLite serializes writers,
+so point --database-url at Postgres to measure real scaling.
+
+Usage:
+    python scripts/benchmark_billing_shards.py --subscriptions 1000000 --workers 1 2 4 8 \
+        --database-url postgresql://localhost/billchain_bench
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from database import db, Customer, Product, Subscription, Invoice, NumberSequence
+from billing_run import ShardedBillingRun
+
+
+def create_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    db.init_app(app)
+    return app
+
+
+def generate_dataset(count, billing_date, batch_size=50000):
+    """One customer and one due monthly subscription per row, inserted in batches"""
+    product = Product(name='Pro Plan', base_price=99.99)
+    db.session.add(product)
+    db.session.commit()
+
+    for start in range(0, count, batch_size):
+        end = min(start + batch_size, count)
+        db.session.execute(db.insert(Customer), [
+            {'id': i + 1, 'customer_code': f'BENCH-{i}', 'name': f'Customer {i}',
+             'email': f'c{i}@example.com', 'tenant_id': f'tenant-{i % 64}'}
+            for i in range(start, end)
+        ])
+        db.session.execute(db.insert(Subscription), [
+            {'customer_id': i + 1, 'product_id': product.id, 'amount': 49.0, 'status': 'Active',
+             'billing_cycle': 'monthly', 'auto_renew': True, 'next_billing_date': billing_date}
+            for i in range(start, end)
+        ])
+        db.session.commit()
+        print(f"  generated {end} subscriptions", end='\r')
+    print()
+
+
+def reset(billing_date):
+    db.session.execute(db.delete(Invoice))
+    db.session.execute(db.delete(NumberSequence))
+    db.session.execute(db.update(Subscription).values(next_billing_date=billing_date))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded billing run benchmark')
+    parser.add_argument('--subscriptions', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--shard-by', choices=['customer', 'tenant'], default='customer')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'billing_bench.db')}")
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    billing_date = now + timedelta(days=1)
+    app = create_app(args.database_url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate_dataset(args.subscriptions, billing_date)
+
+    print(f"{'workers':>7} {'invoices':>10} {'seconds':>9} {'invoices/s':>11} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        with app.app_context():
+            reset(billing_date)
+        result = ShardedBillingRun(args.database_url, shard_count=workers, max_workers=workers,
+                                   shard_by=args.shard_by, chunk_size=args.chunk_size).run(now=now)
+        assert result['status'] == 'success', result['failed_shards']
+        baseline = baseline or result['duration_seconds']
+        print(f"{workers:>7} {result['invoices_generated']:>10} {result['duration_seconds']:>9.2f} "
+              f"{result['invoices_per_second']:>11.0f} {baseline / result['duration_seconds']:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Microbenchmark per-request churn scoring latency.
+
+Compares the original path (predict_proba followed by predict on the same
+row) with the fused single-pass scoring used by predict_churn.
+
+Usage:
+    python scripts/benchmark_churn_scoring.py --requests 500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_services import AdvancedAnalyticsService
+from services import CustomerService
+
+
+def legacy_predict_churn(service, customer):
+    """Original scoring: the forest runs once for predict_proba and again for predict"""
+    features_scaled = service.scaler.transform(service._prepare_customer_features(customer))
+    churn_probability = service.churn_model.predict_proba(features_scaled)[0][1]
+    churn_prediction = service.churn_model.predict(features_scaled)[0]
+    return service._churn_result(churn_probability, churn_prediction)
+
+
+def measure(func, customers, requests):
+    latencies = []
+    for i in range(requests):
+        customer = customers[i % len(customers)]
+        start = time.perf_counter()
+        func(customer)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        'median': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Churn scoring latency benchmark')
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    service = AdvancedAnalyticsService(models_dir=tempfile.mkdtemp())
+    customers = CustomerService().get_all_customers()
+    service.train_churn_model(customers)
+    service.train_cltv_model(customers)
+
+    # Warm the leaf table cache so both paths are measured in steady state
+    service.predict_churn(customers[0])
+
+    for customer in customers:
+        assert legacy_predict_churn(service, customer) == service.predict_churn(customer)
+
+    legacy = measure(lambda c: legacy_predict_churn(service, c), customers, args.requests)
+    fused = measure(service.predict_churn, customers, args.requests)
+    insights = measure(lambda c: service.get_customer_insights(c['id'], c), customers, args.requests)
+
+    print(f"Requests per path:        {args.requests}")
+    print(f"predict_proba + predict:  median {legacy['median']:.2f} ms, p95 {legacy['p95']:.2f} ms")
+    print(f"fused predict_churn:      median {fused['median']:.2f} ms, p95 {fused['p95']:.2f} ms")
+    print(f"get_customer_insights:    median {insights['median']:.2f} ms, p95 {insights['p95']:.2f} ms")
+    print(f"Speedup (median):         {legacy['median'] / fused['median']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
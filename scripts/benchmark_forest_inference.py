@@ -0,0 +1,67 @@
+"""
+Benchmark the forest inference engines on API-sized batches.
+
+Usage:
+    python scripts/benchmark_forest_inference.py --batch-sizes 1 10 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_services import AdvancedAnalyticsService
+from forest_inference import INFERENCE_ENGINES
+from services import CustomerService
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Forest inference engine benchmark')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    customers = CustomerService().get_all_customers()
+    services = {}
+    for engine in INFERENCE_ENGINES:
+        service = AdvancedAnalyticsService(models_dir=tempfile.mkdtemp(), inference_engine=engine)
+        np.random.seed(42)
+        service.train_churn_model(customers)
+        np.random.seed(42)
+        service.train_cltv_model(customers)
+        services[engine] = service
+
+    reference = services['sklearn']
+    print(f"{'model':<6} {'batch':>5} " + ' '.join(f"{engine:>12}" for engine in INFERENCE_ENGINES) + '   (ms, best of %d)' % args.repeat)
+    for name in ['churn', 'cltv']:
+        for batch_size in args.batch_sizes:
+            rows = [customers[i % len(customers)] for i in range(batch_size)]
+            features_scaled = reference.scaler.transform(reference._prepare_customer_features(rows))
+            timings = []
+            expected = None
+            for engine, service in services.items():
+                model = getattr(service, f'{name}_model')
+                output = service._forest_predict(name, model, features_scaled)
+                if expected is None:
+                    expected = output
+                assert np.array_equal(output, expected), f"{engine} output differs from sklearn"
+                timings.append(best_of(lambda: service._forest_predict(name, model, features_scaled), args.repeat))
+            print(f"{name:<6} {batch_size:>5} " + ' '.join(f"{timing:>12.3f}" for timing in timings))
+
+
+if __name__ == '__main__':
+    main()
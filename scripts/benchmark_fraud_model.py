@@ -0,0 +1,81 @@
+"""
+Benchmark online fraud scoring with the model trained by train_models.py.
+
+Trains fraud_model.pkl in a scratch directory, then times one payment
+assessment (rules plus the model's dot product) against sklearn's
+predict_proba on a single row. Exits non-zero when the p99 latency is
+over budget.
+
+Usage:
+    python scripts/benchmark_fraud_model.py --calls 20000 --budget-us 100
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+
+def percentiles(timings):
+    timings = np.array(timings) * 1e6
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fraud model serving benchmark')
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--budget-us', type=float, default=100.0)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import train_models
+    train_models.train_fraud_detection_model()
+
+    import joblib
+    from ai_services import FraudModelServer
+    model_path = os.path.join(train_models.MODELS_DIR, 'fraud_model.pkl')
+    model = joblib.load(model_path)
+    server = FraudModelServer(model_path)
+    start = time.perf_counter()
+    assert server.load()
+    print(f"\nmodel loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    transactions = [{'amount': float(rng.uniform(10, 1010)), 'transactions_24h': int(rng.integers(1, 20)),
+                     'ip_country_match': int(rng.random() > 0.05), 'hour': int(rng.integers(0, 24)),
+                     'payment_method': 'ethereum'} for _ in range(args.calls)]
+
+    sklearn_timings = []
+    for transaction in transactions[:2000]:
+        row = [[transaction['amount'], transaction['transactions_24h'], transaction['ip_country_match'],
+                transaction['hour']]]
+        start = time.perf_counter()
+        model.predict_proba(pd.DataFrame(row, columns=model.feature_names_in_))
+        sklearn_timings.append(time.perf_counter() - start)
+
+    assess_timings = []
+    for transaction in transactions:
+        start = time.perf_counter()
+        server.assess(transaction)
+        assess_timings.append(time.perf_counter() - start)
+
+    sklearn_p50, sklearn_p99 = percentiles(sklearn_timings)
+    p50, p99 = percentiles(assess_timings)
+    print(f"sklearn predict_proba on a one-row DataFrame: p50 {sklearn_p50:.1f} us, p99 {sklearn_p99:.1f} us")
+    print(f"FraudModelServer.assess (rules + model): p50 {p50:.1f} us, p99 {p99:.1f} us "
+          f"(budget {args.budget_us:.0f} us)")
+    if p99 > args.budget_us:
+        print("Over the latency budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark the broadcast scenario forecast against a per-scenario monthly loop.
+
+Usage:
+    python scripts/benchmark_revenue_forecast.py --scenarios 10000
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from revenue_forecast import forecast_request, forecast_scenarios, scenario_grid
+
+
+def loop_forecast(current_revenue, growth_rates, churn_rates, horizon):
+    """The original approach: one Python loop per scenario and month"""
+    results = []
+    for growth_rate in growth_rates:
+        for churn_rate in churn_rates:
+            revenue = current_revenue
+            predictions = []
+            for month in range(1, horizon + 1):
+                revenue = revenue * (1 + growth_rate - churn_rate)
+                predictions.append({
+                    'month': month,
+                    'predicted_revenue': round(revenue, 2),
+                    'confidence': 0.85 - (month * 0.02)
+                })
+            results.append({'growth_rate': growth_rate, 'churn_rate': churn_rate, 'revenue_predictions': predictions})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Revenue forecast benchmark')
+    parser.add_argument('--scenarios', type=int, default=10000)
+    parser.add_argument('--horizon', type=int, default=12)
+    args = parser.parse_args()
+
+    side = int(math.ceil(math.sqrt(args.scenarios)))
+    growth_rates = [i * 0.2 / side for i in range(side)]
+    churn_rates = [i * 0.1 / side for i in range(side)]
+
+    start = time.perf_counter()
+    loop = loop_forecast(50000.0, growth_rates, churn_rates, args.horizon)
+    loop_seconds = time.perf_counter() - start
+    loop_json = json.dumps(loop)
+    loop_json_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    growth, churn = scenario_grid(growth_rates, churn_rates)
+    forecast_scenarios(50000.0, growth, churn, horizon=args.horizon)
+    broadcast_only = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = forecast_request(50000.0, growth_rates, churn_rates, grid=True, horizon=args.horizon)
+    payload_seconds = time.perf_counter() - start
+    vector_json = json.dumps(result)
+    vector_json_seconds = time.perf_counter() - start
+
+    print(f"scenarios: {result['scenario_count']}, horizon: {args.horizon} (broadcast also computes confidence bands)")
+    print(f"{'approach':>10} {'compute s':>10} {'payload s':>10} {'with JSON s':>12} {'payload KB':>11}")
+    print(f"{'loop':>10} {'':>10} {loop_seconds:>10.3f} {loop_json_seconds:>12.3f} {len(loop_json) / 1024:>11.0f}")
+    print(f"{'broadcast':>10} {broadcast_only:>10.4f} {payload_seconds:>10.3f} {vector_json_seconds:>12.3f} "
+          f"{len(vector_json) / 1024:>11.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark wallet balance checks: one JSON-RPC request per address against batched requests.
+
+Runs against a local stub node that adds a fixed latency to every request.
+
+Usage:
+    python scripts/benchmark_rpc_batching.py --addresses 2000 --latency-ms 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from rpc_client import JsonRpcClient
+from test_rpc_client import StubNode
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON-RPC batching benchmark')
+    parser.add_argument('--addresses', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--pool-size', type=int, default=10)
+    args = parser.parse_args()
+
+    node = StubNode(latency=args.latency_ms / 1000)
+    addresses = [hex(i) for i in range(1, args.addresses + 1)]
+    try:
+        # Previous behaviour: a fresh connection and one request per address
+        start = time.perf_counter()
+        single = {}
+        for address in addresses:
+            reply = requests.post(node.url, json={'jsonrpc': '2.0', 'id': 1, 'method': 'eth_getBalance',
+                                                  'params': [address, 'latest']}, timeout=10).json()
+            single[address] = int(reply['result'], 16)
+        single_seconds = time.perf_counter() - start
+
+        client = JsonRpcClient(node.url, pool_size=args.pool_size, max_batch_size=args.batch_size)
+        start = time.perf_counter()
+        pooled = {address: int(client.call('eth_getBalance', address, 'latest'), 16) for address in addresses}
+        pooled_seconds = time.perf_counter() - start
+
+        posts = node.posts
+        start = time.perf_counter()
+        batched = client.get_balances(addresses)
+        batched_seconds = time.perf_counter() - start
+        batch_posts = node.posts - posts
+        client.close()
+
+        assert single == pooled == batched
+        print(f"{args.addresses} balances, {args.latency_ms:.0f} ms node latency")
+        print(f"one request per address:        {single_seconds:.2f}s")
+        print(f"pooled connection, per address: {pooled_seconds:.2f}s")
+        print(f"batched ({batch_posts} requests):        {batched_seconds:.2f}s "
+              f"({single_seconds / batched_seconds:.0f}x)")
+    finally:
+        node.close()
+
+
+if __name__ == '__main__':
+    main()
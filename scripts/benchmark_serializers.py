@@ -0,0 +1,61 @@
+"""
+Benchmark the compiled row serializers against the marshmallow auto-schemas.
+
+Usage:
+    python scripts/benchmark_serializers.py --rows 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db, Customer, Transaction, customers_schema, transactions_schema
+from serializers import customer_serializer, transaction_serializer, orjson, _json_default
+from test_serializers import create_serializer_app, seed_rows
+
+
+def timed(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serializer benchmark')
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    app = create_serializer_app()
+    with app.app_context():
+        db.create_all()
+        seed_rows(args.rows)
+
+        customers = Customer.query.all()
+        transactions = Transaction.query.options(*transaction_serializer.eager_options()).all()
+
+        print(f"{'payload':>13} {'rows':>6} {'marshmallow rows/s':>19} {'compiled rows/s':>16} {'speedup':>8}")
+        for name, rows, schema, serializer in [('customers', customers, customers_schema, customer_serializer),
+                                               ('transactions', transactions, transactions_schema, transaction_serializer)]:
+            slow, expected = timed(lambda: schema.dump(rows))
+            fast, actual = timed(lambda: serializer.dump_many(rows))
+            assert actual == expected
+            print(f"{name:>13} {len(rows):>6} {len(rows) / slow:>19.0f} {len(rows) / fast:>16.0f} {slow / fast:>7.1f}x")
+
+        data = {'transactions': transaction_serializer.dump_many(transactions)}
+        encode_json, body = timed(lambda: app.json.dumps(data))
+        print(f"\njson encode: {encode_json * 1000:.1f} ms for {len(body) / 1024:.0f} KB")
+        if orjson is not None:
+            encode_orjson, _ = timed(lambda: orjson.dumps(data, default=_json_default, option=orjson.OPT_SORT_KEYS))
+            print(f"orjson encode: {encode_orjson * 1000:.1f} ms ({encode_json / encode_orjson:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
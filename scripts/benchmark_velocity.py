@@ -0,0 +1,75 @@
+"""
+Benchmark fraud velocity lookups: the 24h range count against the in-memory store.
+
+Usage:
+    python scripts/benchmark_velocity.py --transactions 200000 --customers 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db, Customer, Transaction
+from velocity import VelocityStore
+from test_velocity import create_velocity_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Velocity store benchmark')
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    app = create_velocity_app()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(Customer), [
+            {'customer_code': f'CUST-{i}', 'name': f'Customer {i}', 'email': f'c{i}@example.com'}
+            for i in range(args.customers)
+        ])
+        now = datetime.utcnow()
+        db.session.execute(db.insert(Transaction), [
+            {'customer_id': rng.randint(1, args.customers), 'transaction_type': 'payment',
+             'amount': round(rng.uniform(1, 500), 2), 'created_at': now - timedelta(seconds=rng.uniform(0, 8 * 86400))}
+            for _ in range(args.transactions)
+        ])
+        db.session.commit()
+        ids = [rng.randint(1, args.customers) for _ in range(args.lookups)]
+
+        start = time.perf_counter()
+        expected = [Transaction.query.filter(Transaction.customer_id == customer_id,
+                                             Transaction.created_at >= now - timedelta(hours=24)).count()
+                    for customer_id in ids]
+        query_seconds = (time.perf_counter() - start) / len(ids)
+
+        store = VelocityStore()
+        start = time.perf_counter()
+        result = store.rebuild(now)
+        rebuild_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = [store.features(customer_id, now) for customer_id in ids]
+        first_seconds = (time.perf_counter() - start) / len(ids)
+        start = time.perf_counter()
+        for customer_id in ids:
+            store.features(customer_id, now)
+        store_seconds = (time.perf_counter() - start) / len(ids)
+
+        # The store's 24h window starts on a bucket boundary, so the oldest minute may differ
+        assert all(abs(features['transactions_24h'] - count) <= 5 for features, count in zip(actual, expected))
+        print(f"rebuild: {result['transactions']} transactions in {rebuild_seconds:.2f}s")
+        print(f"24h range count: {query_seconds * 1e6:.0f} us per lookup")
+        print(f"velocity store, first lookup after rebuild: {first_seconds * 1e6:.1f} us")
+        print(f"velocity store (1h, 24h, 7d counts and sums): {store_seconds * 1e6:.1f} us per lookup "
+              f"({query_seconds / store_seconds:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Load test for the server-push metrics stream.
+
+Connects many simulated SocketIO clients to the app in-process, subscribes
+them to metric subsets, generates write bursts, and counts the SQL queries
+issued and the deltas delivered. With push, database work per tick stays
+constant as the number of clients grows.
+
+Usage:
+    python scripts/load_test_metrics_stream.py --clients 100 500 --ticks 10
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('MODEL_WARMUP', 'false')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'metrics_load.db')}")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app import app, socketio, db, metrics_publisher, dashboard_metrics
+from database import Customer
+
+SUBSETS = [None, ['active_customers', 'churn_risk_customers'], ['monthly_revenue', 'pending_invoices']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Metrics stream load test')
+    parser.add_argument('--clients', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--ticks', type=int, default=10)
+    parser.add_argument('--writes-per-tick', type=int, default=20)
+    args = parser.parse_args()
+
+    queries = {'count': 0}
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a, **k: queries.__setitem__('count', queries['count'] + 1))
+
+    print(f"{'clients':>7} {'ticks':>5} {'snapshot queries/tick':>22} {'deltas delivered':>17} {'ms/tick':>8}")
+    serial = 0
+    for client_count in args.clients:
+        clients = [socketio.test_client(app) for _ in range(client_count)]
+        for i, client in enumerate(clients):
+            subset = SUBSETS[i % len(SUBSETS)]
+            client.emit('subscribe_metrics', {'metrics': subset} if subset else {})
+            client.get_received()
+        dashboard_metrics.reconcile_interval = 3600
+
+        snapshot_queries = 0
+        elapsed = 0.0
+        for _ in range(args.ticks):
+            with app.app_context():
+                for _ in range(args.writes_per_tick):
+                    serial += 1
+                    db.session.add(Customer(customer_code=f'LOAD-{serial}', name='Load', email=f'l{serial}@example.com'))
+                db.session.commit()
+
+            before = queries['count']
+            start = time.perf_counter()
+            metrics_publisher.publish_once()
+            elapsed += time.perf_counter() - start
+            snapshot_queries += queries['count'] - before
+
+        delivered = sum(
+            sum(1 for message in client.get_received() if message['name'] == 'metrics_delta') for client in clients
+        )
+        for client in clients:
+            client.disconnect()
+        print(f"{client_count:>7} {args.ticks:>5} {snapshot_queries / args.ticks:>22.1f} "
+              f"{delivered:>17} {elapsed * 1000 / args.ticks:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Stress the identifier allocator with concurrent writer processes.
+
+Every worker creates customers one at a time, taking its customer code
+either from the allocator or from the old COUNT(*) + 1 scheme, and counts
+the inserts rejected by the unique constraint on customer_code.
+
+Usage:
+    python scripts/stress_id_allocator.py --workers 8 --customers 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.exc import IntegrityError
+
+from database import db, Customer
+from id_allocator import IdentifierAllocator
+
+
+def create_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    db.init_app(app)
+    return app
+
+
+def worker(database_uri, strategy, worker_id, customers):
+    app = create_app(database_uri)
+    allocator = IdentifierAllocator(strategy=strategy) if strategy != 'count' else None
+    duplicates = 0
+    with app.app_context():
+        for i in range(customers):
+            if allocator is None:
+                code = f"CUST-{Customer.query.count() + 1:06d}"
+            else:
+                code = allocator.allocate_one('customer_code')
+            db.session.add(Customer(customer_code=code, name=f'W{worker_id}', email=f'w{worker_id}-{i}@example.com'))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                duplicates += 1
+    return duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Identifier allocator stress test')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--strategies', nargs='+', default=['count', 'table', 'hilo'])
+    args = parser.parse_args()
+
+    print(f"{'strategy':>9} {'inserted':>9} {'duplicates':>11} {'ids/s':>8}")
+    for strategy in args.strategies:
+        database_uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+        app = create_app(database_uri)
+        with app.app_context():
+            db.create_all()
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(worker, database_uri, strategy, worker_id, args.customers)
+                       for worker_id in range(args.workers)]
+            duplicates = sum(future.result() for future in futures)
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            inserted = Customer.query.count()
+            distinct = db.session.query(db.func.count(db.distinct(Customer.customer_code))).scalar()
+        assert inserted == distinct
+        print(f"{strategy:>9} {inserted:>9} {duplicates:>11} {inserted / elapsed:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Stress payment ingestion with retry storms from concurrent worker processes.
+
+Every worker replays the same set of idempotency keys in a shuffled order,
+as clients retrying through a load balancer would. Each worker has its own
+front cache and Bloom filter, like separate app processes. Checks that each
+key produced exactly one Transaction and one processed payment, and reports
+throughput and how requests were answered.
+
+Usage:
+    python scripts/stress_payment_retries.py --workers 8 --keys 200 --retries 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from database import db, Customer, Transaction
+from blockchain_services import BlockchainService
+from payment_ingestion import PaymentIngestion
+
+def create_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    db.init_app(app)
+    return app
+
+
+CLEAN = {'status': 'success', 'fraud_score': 0.1, 'is_fraud': False, 'risk_level': 'low'}
+
+
+def worker(database_uri, worker_id, keys, retries):
+    app = create_app(database_uri)
+    service = BlockchainService()
+    processed = []
+
+    def processor(*args, **kwargs):
+        processed.append(kwargs.get('idempotency_key'))
+        return service.process_crypto_payment(*args, **kwargs)
+
+    requests = [key for key in range(keys) for _ in range(retries)]
+    random.Random(worker_id).shuffle(requests)
+    with app.app_context():
+        ingestion = PaymentIngestion()
+        ingestion.warm()
+        for key in requests:
+            data = {'customer_id': 1, 'invoice_id': key, 'amount_usd': 10.0 + key, 'network': 'ethereum',
+                    'sender_address': '0xsender', 'receiver_address': '0xreceiver', 'idempotency_key': f'key-{key}'}
+            response, status_code = ingestion.replay(data) or ingestion.ingest(data, CLEAN, processor)
+            assert status_code in (200, 409), response
+    return processed, ingestion.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Payment retry storm stress test')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--keys', type=int, default=200)
+    parser.add_argument('--retries', type=int, default=20)
+    args = parser.parse_args()
+
+    database_uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'payments.db')}"
+    app = create_app(database_uri)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Customer(customer_code='CUST-1', name='Customer 1', email='c1@example.com'))
+        db.session.commit()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        results = list(pool.map(worker, [database_uri] * args.workers, range(args.workers),
+                                [args.keys] * args.workers, [args.retries] * args.workers))
+    elapsed = time.perf_counter() - start
+
+    processed = Counter(key for keys, _ in results for key in keys)
+    stats = Counter()
+    for _, worker_stats in results:
+        stats.update(worker_stats)
+    with app.app_context():
+        rows = Transaction.query.count()
+        duplicate_keys = (db.session.query(Transaction.idempotency_key).group_by(Transaction.idempotency_key)
+                          .having(db.func.count() > 1).count())
+
+    total = args.workers * args.keys * args.retries
+    print(f"{total} requests for {args.keys} keys in {elapsed:.2f}s ({total / elapsed:,.0f} req/s)")
+    print(f"transactions: {rows}, keys recorded twice: {duplicate_keys}, "
+          f"keys processed twice: {sum(count > 1 for count in processed.values())}")
+    print(f"answered from memory: {stats['cache_hits']}, from the index: {stats['database_hits']}, "
+          f"claim conflicts: {stats['claim_conflicts']}, new keys that skipped the lookup: {stats['lookups_skipped']}")
+    assert rows == args.keys and duplicate_keys == 0 and max(processed.values()) == 1
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Precompiled row serializers for BillChain AI list endpoints
+
+A RowSerializer compiles a marshmallow schema once into a flat plan of
+(output key, attribute, converter) entries, so dumping a row is a single
+loop over plain attribute reads instead of marshmallow's per-field
+machinery. The plan is derived from the schema itself and produces the
+same dict as ``schema.dump``; fields it has no fast converter for go
+through the marshmallow field unchanged.
+
+Nested relationships are never lazy-loaded one row at a time:
+``eager_options()`` gives the loader options to put on the query, and
+``dump_many`` fetches anything still unloaded with one IN query per
+relationship before serializing.
+
+``json_response`` encodes with orjson when JSON_ENCODER=orjson and the
+package is installed, otherwise through Flask's jsonify.
+"""
+
+import os
+import decimal
+from datetime import date
+from typing import Dict, Any, List, Callable, Iterable
+import logging
+
+from flask import jsonify, current_app
+from marshmallow import fields
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.interfaces import MANYTOONE
+from werkzeug.http import http_date
+
+from database import db, customer_schema, transaction_schema, invoice_schema, subscription_schema
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+def _isoformat(value):
+    return value.isoformat()
+
+def _decimal_converter(field: fields.Decimal) -> Callable:
+    places, rounding, as_string = field.places, field.rounding, field.as_string
+
+    def convert(value):
+        number = value if isinstance(value, decimal.Decimal) else decimal.Decimal(str(value))
+        if places is not None and number.is_finite():
+            number = number.quantize(places, rounding=rounding)
+        return field._to_string(number) if as_string else number
+    return convert
+
+def _fallback_converter(field, name: str) -> Callable:
+    # Anything without a fast path is serialized by the marshmallow field itself
+    return lambda value: field._serialize(value, name, None)
+
+class RowSerializer:
+    """A marshmallow schema compiled into a flat per-row field plan"""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.model = schema.opts.model
+        self.plan = []  # (output key, attribute, converter)
+        self.nested: Dict[str, 'RowSerializer'] = {}
+        for name, field in schema.dump_fields.items():
+            key = field.data_key or name
+            attribute = field.attribute or name
+            self.plan.append((key, attribute, self._converter(field, name, attribute)))
+
+    def _converter(self, field, name: str, attribute: str):
+        if isinstance(field, fields.Nested):
+            nested = RowSerializer(field.schema)
+            self.nested[attribute] = nested
+            if field.many:
+                return lambda values: [nested.dump(value) for value in values]
+            return nested.dump
+        if type(field) in (fields.DateTime, fields.Date) and field.format in (None, 'iso'):
+            return _isoformat
+        if type(field) is fields.Decimal:
+            return _decimal_converter(field)
+        if type(field) is fields.Float and not field.as_string:
+            return float
+        if type(field) is fields.Integer and not field.as_string:
+            return int
+        if type(field) is fields.String:
+            return lambda value: value if type(value) is str else str(value)
+        return _fallback_converter(field, name)
+
+    def dump(self, obj) -> Dict[str, Any]:
+        # Loaded attributes are read straight from the instance dict, skipping the descriptors
+        loaded = obj.__dict__
+        row = {}
+        for key, attribute, convert in self.plan:
+            value = loaded[attribute] if attribute in loaded else getattr(obj, attribute)
+            row[key] = None if value is None else convert(value)
+        return row
+
+    def dump_many(self, objs: Iterable[Any]) -> List[Dict[str, Any]]:
+        """Serialize rows, loading any unloaded nested relationship in bulk first"""
+        objs = list(objs)
+        self.prefetch(objs)
+        dump = self.dump
+        return [dump(obj) for obj in objs]
+
+    def eager_options(self) -> List[Any]:
+        """Loader options that fetch every nested relationship with the query itself"""
+        return [joinedload(getattr(self.model, attribute)).options(*nested.eager_options())
+                for attribute, nested in self.nested.items()]
+
+    def prefetch(self, objs: List[Any]):
+        """Load unloaded many-to-one relationships of ``objs`` with one query per relationship"""
+        if not objs or not self.nested:
+            return
+        mapper = inspect(self.model)
+        for attribute, nested in self.nested.items():
+            prop = mapper.relationships[attribute]
+            if prop.direction is not MANYTOONE or len(prop.local_columns) != 1:
+                continue
+            local_key = mapper.get_property_by_column(next(iter(prop.local_columns))).key
+            remote_column = next(iter(prop.remote_side))
+
+            missing = [obj for obj in objs if attribute in inspect(obj).unloaded]
+            ids = {getattr(obj, local_key) for obj in missing} - {None}
+            targets = {}
+            if ids:
+                target_key = inspect(nested.model).get_property_by_column(remote_column).key
+                rows = db.session.execute(
+                    db.select(nested.model).where(remote_column.in_(ids))
+                ).scalars().all()
+                targets = {getattr(row, target_key): row for row in rows}
+            for obj in missing:
+                set_committed_value(obj, attribute, targets.get(getattr(obj, local_key)))
+
+            nested.prefetch([target for target in (getattr(obj, attribute) for obj in objs) if target is not None])
+
+def _json_default(value):
+    # Same conversions as Flask's default JSON provider
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def json_response(payload, status: int = 200):
+    """JSON response through orjson when enabled, otherwise Flask's jsonify
+
+    orjson writes the same document with sorted keys; it differs from
+    jsonify byte-wise only for non-ASCII text (raw UTF-8 instead of \\u
+    escapes) and floats printed in exponent form.
+    """
+    if orjson is not None and os.getenv('JSON_ENCODER', 'json') == 'orjson':
+        body = orjson.dumps(payload, default=_json_default,
+                            option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                            | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+        return current_app.response_class(body, mimetype='application/json'), status
+    return jsonify(payload), status
+
+# Compiled serializers for the read-heavy endpoints
+customer_serializer = RowSerializer(customer_schema)
+transaction_serializer = RowSerializer(transaction_schema)
+invoice_serializer = RowSerializer(invoice_schema)
+subscription_serializer = RowSerializer(subscription_schema)
@@ -4,9 +4,15 @@ Test script for AI services functionality
 
 import sys
 import os
+import time
+import tempfile
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from ai_services import get_analytics_service
+import numpy as np
+import pandas as pd
+
+from ai_services import get_analytics_service, AdvancedAnalyticsService, FEATURE_COLUMNS
+from forest_inference import CompiledForest
 from services import CustomerService
 
 def test_ai_services():
@@ -86,5 +92,438 @@ def test_ai_services():
     
     print("\n🎉 AI Services testing completed!")
 
+def test_feature_builder_matches_row_extraction():
+    """Columnar feature builder must reproduce _extract_features exactly"""
+    analytics_service = AdvancedAnalyticsService(models_dir=tempfile.mkdtemp())
+    customers = CustomerService().get_all_customers()
+    customers[1]['account_type'] = 'Enterprise'
+    customers[2]['crypto_wallets'] = '["0xabc"]'
+    customers[3]['crypto_wallets'] = []
+    customers[4]['created_at'] = ''
+    del customers[5]['created_at']
+    
+    row_features = pd.DataFrame([analytics_service._extract_features(c) for c in customers])
+    columnar_features = analytics_service._prepare_customer_features(customers)
+    
+    assert list(columnar_features.columns) == FEATURE_COLUMNS
+    assert np.array_equal(row_features[FEATURE_COLUMNS].to_numpy(dtype=np.float64), columnar_features.to_numpy())
+    
+    # DataFrame input takes the same path
+    frame_features = analytics_service._prepare_customer_features(pd.DataFrame(customers))
+    assert np.array_equal(frame_features.to_numpy(), columnar_features.to_numpy())
+    
+    # Blanks take the defaults; values that are present but malformed are reported, not defaulted
+    malformed = [dict(customers[0], total_revenue=' '), dict(customers[1], total_revenue='not-a-number'),
+                 dict(customers[2], created_at='yesterday')]
+    errors = {}
+    malformed_features = analytics_service._prepare_customer_features(malformed, errors)
+    assert malformed_features['total_revenue'][0] == 0.0
+    assert sorted(errors) == [1, 2] and 'total_revenue' in errors[1] and 'created_at' in errors[2]
+    try:
+        analytics_service._prepare_customer_features(malformed[1])
+        assert False, 'expected a ValueError'
+    except ValueError as e:
+        assert 'not-a-number' in str(e)
+    print("✅ Columnar features match row-by-row extraction")
+
+def test_batch_predictions_match_single():
+    """Batch churn/CLTV scoring must agree with one-at-a-time scoring"""
+    analytics_service = AdvancedAnalyticsService(models_dir=tempfile.mkdtemp())
+    customers = CustomerService().get_all_customers()
+    analytics_service.train_churn_model(customers)
+    analytics_service.train_cltv_model(customers)
+    
+    malformed = dict(customers[0], total_revenue='not-a-number')
+    batch = customers[:20] + ['not a customer', malformed]
+    churn_batch = analytics_service.predict_churn_batch(batch)
+    cltv_batch = analytics_service.predict_cltv_batch(batch)
+    
+    assert churn_batch['status'] == 'success' and churn_batch['count'] == 22
+    for result in [churn_batch, cltv_batch]:
+        assert result['errors'] == 2
+        assert [row['status'] for row in result['results'][-2:]] == ['error', 'error']
+        assert 'total_revenue' in result['results'][-1]['message']
+    
+    for customer, churn_result, cltv_result in zip(customers[:20], churn_batch['results'], cltv_batch['results']):
+        assert churn_result == analytics_service.predict_churn(customer)
+        assert cltv_result == analytics_service.predict_cltv(customer)
+    
+    assert analytics_service.predict_churn(malformed)['status'] == 'error'
+    assert analytics_service.predict_cltv(malformed)['status'] == 'error'
+    print("✅ Batch predictions match single-customer predictions")
+
+def test_forest_scoring_matches_sklearn():
+    """Cached leaf tables must reproduce sklearn's forest outputs exactly"""
+    analytics_service = AdvancedAnalyticsService(models_dir=tempfile.mkdtemp())
+    customers = CustomerService().get_all_customers()
+    analytics_service.train_churn_model(customers)
+    analytics_service.train_cltv_model(customers)
+    
+    features_scaled = analytics_service.scaler.transform(analytics_service._prepare_customer_features(customers))
+    churn_model = analytics_service.churn_model
+    cltv_model = analytics_service.cltv_model
+    
+    probabilities, labels = analytics_service._score_churn(churn_model, features_scaled)
+    assert np.array_equal(probabilities, churn_model.predict_proba(features_scaled))
+    assert np.array_equal(labels, churn_model.predict(features_scaled))
+    assert np.array_equal(
+        analytics_service._forest_predict('cltv', cltv_model, features_scaled),
+        cltv_model.predict(features_scaled)
+    )
+    
+    # Retraining replaces the model object and invalidates its cached tables
+    analytics_service.train_churn_model(customers[:60])
+    assert analytics_service._forest_tables('churn', analytics_service.churn_model) is not None
+    assert analytics_service._forest_cache[('churn', 'leaf_tables')][0] is analytics_service.churn_model
+    print("✅ Cached forest scoring matches sklearn")
+
+def test_compiled_forest_matches_sklearn():
+    """The compiled NumPy engine must be bit-identical to sklearn"""
+    analytics_service = AdvancedAnalyticsService(models_dir=tempfile.mkdtemp(), inference_engine='compiled')
+    customers = CustomerService().get_all_customers()
+    analytics_service.train_churn_model(customers)
+    analytics_service.train_cltv_model(customers)
+    
+    features_scaled = analytics_service.scaler.transform(analytics_service._prepare_customer_features(customers))
+    for model in [analytics_service.churn_model, analytics_service.cltv_model]:
+        compiled = CompiledForest(model)
+        assert compiled.verify(features_scaled)
+        for estimator_index in [0, len(model.estimators_) - 1]:
+            tree_leaves = compiled.apply(features_scaled)[estimator_index] - compiled.roots[estimator_index]
+            assert np.array_equal(tree_leaves, model.estimators_[estimator_index].apply(features_scaled.astype(np.float32)))
+    
+    churn_batch = analytics_service.predict_churn_batch(customers)
+    assert analytics_service._forest_cache[('churn', 'compiled')][1] is not None
+    expected = analytics_service.churn_model.predict_proba(features_scaled)[:, 1]
+    assert [result['churn_probability'] for result in churn_batch['results']] == expected.tolist()
+    print("✅ Compiled forest matches sklearn")
+
+def test_training_job_swaps_model():
+    """Background training must finish in the pool and swap the live model"""
+    import time
+    from training_jobs import TrainingJobManager
+    
+    class RecordingSocketIO:
+        def __init__(self):
+            self.events = []
+        
+        def emit(self, event, payload):
+            self.events.append((event, payload))
+    
+    socketio = RecordingSocketIO()
+    analytics_service = AdvancedAnalyticsService(models_dir=tempfile.mkdtemp())
+    manager = TrainingJobManager(lambda: analytics_service, socketio=socketio, max_workers=1)
+    try:
+        job = manager.submit('cltv', CustomerService().get_all_customers(), n_jobs=2)
+        assert job['status'] == 'queued'
+        assert socketio.events[0] == ('training_job_progress', job)
+        
+        for _ in range(300):
+            job = manager.get_job(job['job_id'])
+            if job['status'] in ('completed', 'failed'):
+                break
+            time.sleep(0.1)
+        
+        assert job['status'] == 'completed', job['error']
+        assert job['result']['training_samples'] == 80
+        assert analytics_service.cltv_model is not None
+        assert analytics_service.cltv_model.n_jobs == 2
+        assert analytics_service.predict_cltv(CustomerService().get_customer_by_id(1))['status'] == 'success'
+        
+        # Clients only need the documented events: progress from 'queued' on, then the final state
+        names = [event for event, payload in socketio.events]
+        assert set(names) == {'training_job_progress', 'training_job_completed'}, names
+        assert [payload['status'] for event, payload in socketio.events if event == 'training_job_completed'] == ['completed']
+        progress = [payload['progress'] for event, payload in socketio.events if event == 'training_job_progress']
+        assert progress[0] == 0 and progress == sorted(progress)
+        print("✅ Training job completed and model swapped in")
+    finally:
+        manager.shutdown()
+
+def test_model_registry_versions_and_hot_reload():
+    """Published versions are verified, memory-mapped and hot-reloaded on promotion"""
+    from model_registry import ModelRegistryError
+    
+    models_dir = tempfile.mkdtemp()
+    customers = CustomerService().get_all_customers()
+    writer = AdvancedAnalyticsService(models_dir=models_dir, inference_engine='compiled')
+    writer.train_churn_model(customers)
+    first_version = writer.model_versions['churn']
+    
+    manifest = writer.registry.manifest('churn', first_version)
+    assert manifest['features'] == FEATURE_COLUMNS
+    assert 'accuracy' in manifest['metrics'] and manifest['hash'] == manifest['files']['model.joblib']
+    
+    # A second worker loads the promoted version with memory-mapped forest arrays
+    reader = AdvancedAnalyticsService(models_dir=models_dir, inference_engine='compiled', reload_interval=0)
+    assert reader.churn_model is None and not reader._models_loaded
+    reader.ensure_models_loaded()
+    assert reader.model_versions['churn'] == first_version
+    assert isinstance(reader._registry_forests['churn'][1].value, np.memmap)
+    assert reader.predict_churn(customers[0]) == writer.predict_churn(customers[0])
+    
+    # Publishing and promoting a new version is picked up on the next prediction
+    writer.train_churn_model(customers[:60])
+    second_version = writer.model_versions['churn']
+    reader.predict_churn(customers[0])
+    assert reader.model_versions['churn'] == second_version
+    
+    writer.registry.promote('churn', first_version)
+    assert reader.reload_if_promoted() == ['churn']
+    assert reader.model_versions['churn'] == first_version
+    
+    # Corrupted artifacts are rejected
+    with open(os.path.join(models_dir, 'registry', 'churn', second_version, 'model.joblib'), 'ab') as f:
+        f.write(b'corrupt')
+    try:
+        writer.registry.load('churn', second_version)
+        assert False, 'corrupted artifact loaded'
+    except ModelRegistryError:
+        pass
+    print("✅ Model registry versions, verification and hot reload working")
+
+def test_legacy_models_load_per_type():
+    """A model type without a registry version still loads its legacy pickle after another type is promoted"""
+    import joblib
+    
+    models_dir = tempfile.mkdtemp()
+    customers = CustomerService().get_all_customers()
+    trainer = AdvancedAnalyticsService(models_dir=tempfile.mkdtemp())
+    trainer.train_churn_model(customers)
+    trainer.train_cltv_model(customers)
+    joblib.dump(trainer.churn_model, os.path.join(models_dir, 'churn_model.pkl'))
+    joblib.dump(trainer.cltv_model, os.path.join(models_dir, 'cltv_model.pkl'))
+    joblib.dump(trainer.scalers['cltv'], os.path.join(models_dir, 'scaler.pkl'))
+    
+    before = AdvancedAnalyticsService(models_dir=models_dir)
+    before.ensure_models_loaded()
+    assert before.churn_model is not None and before.cltv_model is not None
+    
+    # Retraining churn publishes it to the registry; CLTV stays legacy
+    before.train_churn_model(customers)
+    restarted = AdvancedAnalyticsService(models_dir=models_dir)
+    restarted.ensure_models_loaded()
+    assert 'churn' in restarted.model_versions and 'cltv' not in restarted.model_versions
+    assert restarted.cltv_model is not None
+    assert restarted.predict_cltv(customers[0])['status'] == 'success'
+    assert restarted.predict_churn(customers[0])['status'] == 'success'
+    print("✅ Legacy models load per model type")
+
+def test_score_refresh_is_incremental_and_resumable():
+    """Nightly rescoring resumes from its checkpoint and skips unchanged customers"""
+    from flask import Flask
+    from database import db, Customer, JobCheckpoint
+    from score_refresh import ScoreRefreshJob
+    
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'refresh.db')}"
+    db.init_app(app)
+    
+    analytics_service = AdvancedAnalyticsService(models_dir=tempfile.mkdtemp())
+    customers = CustomerService().get_all_customers()
+    analytics_service.train_churn_model(customers)
+    analytics_service.train_cltv_model(customers)
+    job = ScoreRefreshJob(lambda: analytics_service, chunk_size=4)
+    
+    with app.app_context():
+        db.create_all()
+        for i in range(10):
+            db.session.add(Customer(customer_code=f'CUST-{i}', name=f'Customer {i}', email=f'c{i}@example.com'))
+        db.session.commit()
+        
+        # An interrupted run leaves its cursor behind and the next run picks it up
+        partial = job.run(max_chunks=1)
+        assert partial['status'] == 'running' and partial['last_id'] == 4
+        assert JobCheckpoint.query.filter_by(job_name='ai_score_refresh').one().status == 'running'
+        
+        resumed = job.run()
+        assert resumed['status'] == 'success' and resumed['resumed']
+        assert resumed['scored'] == 10 and resumed['chunks'] == 3
+        assert Customer.query.filter(Customer.ai_scored_at.is_(None)).count() == 0
+        
+        # Only customers changed since their last score are rescored
+        assert job.run()['scored'] == 0
+        changed = db.session.get(Customer, 7)
+        changed.status = 'Inactive'
+        db.session.commit()
+        assert job.run()['scored'] == 1
+        
+        # A new model version rescores everyone
+        analytics_service.train_churn_model(customers[:60])
+        assert job.run()['scored'] == 10
+    print("✅ Score refresh is incremental and resumable")
+
+def test_scenario_forecast_matches_monthly_loop():
+    """The broadcast forecast equals compounding each scenario month by month"""
+    from revenue_forecast import forecast_request, forecast_scenarios, scenario_grid
+    
+    growth, churn = scenario_grid([0.0, 0.05, 0.1], [0.02, 0.08])
+    forecast = forecast_scenarios(1000.0, growth, churn, horizon=12)
+    assert forecast['predicted_revenue'].shape == (6, 12)
+    for i in range(6):
+        revenue = 1000.0
+        for month in range(12):
+            revenue = revenue * (1 + growth[i] - churn[i])
+            assert abs(forecast['predicted_revenue'][i, month] - revenue) < 1e-6
+    assert (forecast['lower_bound'] < forecast['predicted_revenue']).all()
+    assert (forecast['upper_bound'] > forecast['predicted_revenue']).all()
+    
+    payload = forecast_request(1000.0, [0.0, 0.05, 0.1], [0.02, 0.08], grid=True, horizon=6)
+    assert payload['scenario_count'] == 6 and len(payload['predicted_revenue'][0]) == 6
+    assert payload['scenarios']['growth_rate'] == [0.0, 0.0, 0.05, 0.05, 0.1, 0.1]
+    assert forecast_request(1000.0, [0.1, 0.2], [0.01, 0.02, 0.03])['status'] == 'error'
+    assert forecast_request(1000.0, [0.1] * 5, 0.01, max_scenarios=4)['status'] == 'error'
+
+    # Oversized requests are rejected before the grid or the output is built
+    huge = np.zeros(100000)
+    start = time.perf_counter()
+    assert forecast_request(1000.0, huge, huge, grid=True, max_scenarios=20000)['status'] == 'error'
+    assert time.perf_counter() - start < 0.5
+    for horizon in [0, -3, 121]:
+        assert forecast_request(1000.0, 0.1, 0.01, horizon=horizon, max_horizon=120)['status'] == 'error'
+    assert forecast_request(1000.0, [0.1] * 100, 0.01, horizon=120, max_points=10000)['status'] == 'error'
+    assert forecast_request(1000.0, [0.1] * 100, 0.01, horizon=100, max_points=10000)['status'] == 'success'
+    print("✅ Scenario forecast matches the monthly loop")
+
+def test_batch_fraud_scores_match_scalar():
+    """Vectorized fraud scores equal advanced_fraud_detection row by row, boundaries included"""
+    from datetime import datetime, timedelta
+    from flask import Flask
+    from database import db, Customer, Transaction
+    from ai_services import advanced_fraud_detection
+    from fraud_scoring import score_batch, fraud_request, score_transactions, count_transactions
+    
+    rng = np.random.default_rng(3)
+    amounts = np.concatenate([[0, 5000, 5000.01, 10000, 10000.01], rng.uniform(0, 20000, 2000)])
+    hours = np.concatenate([[0, 5, 6, 23, 24], rng.integers(0, 25, 2000)])
+    velocity = np.concatenate([[0, 5, 6, 10, 11], rng.integers(0, 15, 2000)])
+    methods = np.concatenate([['card', 'bitcoin', 'ethereum', 'bank_transfer', 'crypto'],
+                              rng.choice(['card', 'bitcoin', 'ethereum', 'bank_transfer'], 2000)])
+    
+    scores = score_batch(amounts, hours, velocity, methods)
+    for i in range(len(amounts)):
+        expected = advanced_fraud_detection({'amount': float(amounts[i]), 'hour': int(hours[i]),
+                                             'transactions_24h': int(velocity[i]), 'payment_method': str(methods[i])})
+        assert scores['fraud_score'][i] == expected['fraud_score']
+        assert scores['is_fraud'][i] == expected['is_fraud']
+        assert scores['risk_level'][i] == expected['risk_level']
+        assert {name: bool(scores[name][i]) for name in expected['factors']} == expected['factors']
+    
+    # Dictionary-encoded methods and scalar defaults give the same scores
+    categories, codes = np.unique(methods, return_inverse=True)
+    encoded = score_batch(amounts, hours, velocity, {'categories': categories.tolist(), 'codes': codes.tolist()})
+    assert (encoded['fraud_score'] == scores['fraud_score']).all()
+    assert score_batch([6000])['fraud_score'][0] == advanced_fraud_detection({'amount': 6000})['fraud_score']
+    
+    payload = fraud_request({'amount': amounts.tolist(), 'hour': hours.tolist(), 'payment_method': methods.tolist()})
+    assert payload['fraud_score'] == score_batch(amounts, hours, None, methods)['fraud_score'].tolist()
+    assert payload['row_count'] == len(amounts) and payload['summary']['flagged'] == sum(payload['is_fraud'])
+    assert fraud_request({'amount': [1, 2], 'hour': [1, 2, 3]})['status'] == 'error'
+    assert fraud_request({'amount': [1, None]})['status'] == 'error'
+    assert fraud_request({'amount': [1] * 5}, max_rows=4)['status'] == 'error'
+    assert fraud_request({'amount': None}) == {'status': 'error', 'message': 'amount is required'}
+    
+    # Stored transactions are rescored with velocity counted from the preceding 24h
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'fraud.db')}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        customer = Customer(customer_code='CUST-1', name='Customer 1', email='c1@example.com')
+        db.session.add(customer)
+        db.session.commit()
+        day = datetime(2024, 3, 2)
+        times = [day - timedelta(hours=30)] + [day - timedelta(hours=2, minutes=i) for i in range(7)] + \
+                [day + timedelta(hours=1, minutes=i) for i in range(6)]
+        db.session.add_all([Transaction(customer_id=customer.id, transaction_type='payment', amount=100 * (i + 1),
+                                        blockchain_network='ethereum', created_at=moment)
+                            for i, moment in enumerate(times)])
+        db.session.commit()
+        
+        rescored = score_transactions(day, day + timedelta(days=1))
+        assert rescored['transactions_24h'].tolist() == [7, 8, 9, 10, 11, 12]
+        for i, transaction_id in enumerate(rescored['transaction_id'].tolist()):
+            transaction = db.session.get(Transaction, transaction_id)
+            expected = advanced_fraud_detection({
+                'amount': float(transaction.amount), 'hour': transaction.created_at.hour,
+                'payment_method': 'ethereum',
+                'transactions_24h': Transaction.query.filter(
+                    Transaction.created_at >= transaction.created_at - timedelta(hours=24),
+                    Transaction.created_at < transaction.created_at).count()
+            })
+            assert rescored['fraud_score'][i] == expected['fraud_score']
+        
+        # The row cap is checked with a bounded count before the range is loaded
+        assert count_transactions(day, day + timedelta(days=1), limit=4) == 4
+        assert fraud_request(since=day.isoformat(), max_rows=5)['status'] == 'error'
+        assert fraud_request(since=day.isoformat(), max_rows=6)['row_count'] == 6
+    print("✅ Batch fraud scores match the scalar rules")
+
+def test_fraud_model_server_matches_sklearn():
+    """The dot-product fraud scorer reproduces predict_proba and stays inside its latency budget"""
+    import time
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+    from ai_services import FraudModelServer, advanced_fraud_detection
+    
+    rng = np.random.default_rng(5)
+    X = pd.DataFrame({
+        'amount': rng.uniform(10, 1010, 2000),
+        'transaction_frequency_24h': rng.integers(1, 20, 2000),
+        'ip_country_match': rng.choice([0, 1], 2000, p=[0.05, 0.95]),
+        'time_of_day_hour': rng.integers(0, 24, 2000)
+    })
+    y = ((X['amount'] > 800) * 0.3 + (X['transaction_frequency_24h'] > 15) * 0.4 +
+         (X['ip_country_match'] == 0) * 0.5 + rng.random(2000) * 0.5 > 0.9).astype(int)
+    model = LogisticRegression(random_state=42).fit(X, y)
+    model_path = os.path.join(tempfile.mkdtemp(), 'fraud_model.pkl')
+    joblib.dump(model, model_path)
+    
+    # No model file: the rule result is returned unchanged
+    transaction = {'amount': 900.0, 'transactions_24h': 17, 'ip_country_match': 0, 'hour': 3,
+                   'payment_method': 'bitcoin'}
+    missing = FraudModelServer(os.path.join(tempfile.mkdtemp(), 'fraud_model.pkl'))
+    assert missing.load() is False
+    assert missing.assess(transaction) == advanced_fraud_detection(transaction)
+    
+    server = FraudModelServer(model_path, model_weight=0.5)
+    assert server.load()
+    expected = model.predict_proba(X)[:, 1]
+    assert np.abs(server.probabilities(X.to_numpy()) - expected).max() < 1e-12
+    for i in range(200):
+        row = X.iloc[i]
+        data = {'amount': row['amount'], 'transactions_24h': row['transaction_frequency_24h'],
+                'ip_country_match': row['ip_country_match'], 'hour': row['time_of_day_hour']}
+        assert abs(server.probability(data) - expected[i]) < 1e-12
+    
+    result = server.assess(transaction)
+    probability = model.predict_proba(pd.DataFrame([[900.0, 17, 0, 3]], columns=X.columns))[0, 1]
+    assert abs(result['model_probability'] - probability) < 1e-12
+    assert result['rule_score'] == advanced_fraud_detection(transaction)['fraud_score']
+    assert abs(result['fraud_score'] - (0.5 * result['rule_score'] + 0.5 * probability)) < 1e-12
+    assert result['is_fraud'] == (result['fraud_score'] > 0.5)
+    
+    # Median latency of a full assessment; tune for slow CI runners with FRAUD_LATENCY_BUDGET_US
+    budget = float(os.getenv('FRAUD_LATENCY_BUDGET_US', 100))
+    timings = []
+    for _ in range(2000):
+        start = time.perf_counter()
+        server.assess(transaction)
+        timings.append(time.perf_counter() - start)
+    median = sorted(timings)[len(timings) // 2] * 1e6
+    assert median < budget, f"Fraud assessment took {median:.1f}us (budget {budget:.0f}us)"
+    print(f"✅ Fraud model server matches sklearn ({median:.1f}us per assessment)")
+
 if __name__ == '__main__':
     test_ai_services()
+    test_feature_builder_matches_row_extraction()
+    test_batch_predictions_match_single()
+    test_forest_scoring_matches_sklearn()
+    test_compiled_forest_matches_sklearn()
+    test_training_job_swaps_model()
+    test_model_registry_versions_and_hot_reload()
+    test_legacy_models_load_per_type()
+    test_score_refresh_is_incremental_and_resumable()
+    test_scenario_forecast_matches_monthly_loop()
+    test_batch_fraud_scores_match_scalar()
+    test_fraud_model_server_matches_sklearn()
@@ -75,6 +75,7 @@ def test_api_endpoints():
             print("✅ Customers endpoint working")
             data = response.json()
             print(f"   Retrieved {len(data.get('customers', []))} customers")
+            print(f"   AI scores: {data.get('ai_scores')}")
         else:
             print(f"❌ Customers endpoint failed: {response.status_code}")
     except Exception as e:
@@ -105,10 +106,16 @@ def test_api_endpoints():
     try:
         response = requests.post(f"{base_url}/api/ai/train-churn-model", 
                                json={}, timeout=30)
-        if response.status_code == 200:
-            print("✅ Churn model training working")
-            data = response.json()
-            print(f"   Model accuracy: {data.get('accuracy', 'N/A')}")
+        if response.status_code == 202:
+            print("✅ Churn model training job submitted")
+            job_id = response.json().get('job_id')
+            job = {}
+            for _ in range(60):
+                job = requests.get(f"{base_url}/api/ai/training-jobs/{job_id}", timeout=5).json()
+                if job.get('status') in ('completed', 'failed'):
+                    break
+                time.sleep(0.5)
+            print(f"   Job status: {job.get('status')}, accuracy: {(job.get('result') or {}).get('accuracy', 'N/A')}")
         else:
             print(f"❌ Churn model training failed: {response.status_code}")
     except Exception as e:
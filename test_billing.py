@@ -0,0 +1,110 @@
+"""
+Test script for the subscription billing run
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from database import db, Customer, Product, Subscription, Invoice
+from billing_run import BillingRun
+
+def create_billing_app():
+    """Minimal app bound to a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'billing.db')}"
+    db.init_app(app)
+    return app
+
+def seed_subscriptions(count, now):
+    """One product, ``count`` customers and one due monthly subscription each"""
+    product = Product(name='Pro Plan', base_price=99.99)
+    db.session.add(product)
+    db.session.flush()
+
+    customers = [{'customer_code': f'CUST-{i}', 'name': f'Customer {i}', 'email': f'c{i}@example.com'}
+                 for i in range(count)]
+    db.session.execute(db.insert(Customer), customers)
+    customer_ids = db.session.execute(db.select(Customer.id).order_by(Customer.id)).scalars().all()
+    db.session.execute(db.insert(Subscription), [
+        {'customer_id': customer_id, 'product_id': product.id, 'amount': 99.99, 'status': 'Active',
+         'billing_cycle': 'monthly', 'auto_renew': True, 'next_billing_date': now + timedelta(days=2)}
+        for customer_id in customer_ids
+    ])
+    db.session.commit()
+    return customer_ids
+
+def test_billing_run_is_set_based_and_idempotent():
+    """Each due subscription is billed once, numbered uniquely and advanced"""
+    app = create_billing_app()
+    now = datetime(2024, 3, 1, 9, 0)
+
+    with app.app_context():
+        db.create_all()
+        customer_ids = seed_subscriptions(25, now)
+
+        # An open invoice for this cycle already covers the first customer
+        db.session.add(Invoice(customer_id=customer_ids[0], invoice_number='INV-MANUAL-1', subtotal=99.99,
+                               total_amount=99.99, status='Sent', invoice_date=now - timedelta(days=1)))
+        db.session.commit()
+
+        result = BillingRun(chunk_size=10).run(now=now)
+        assert result['status'] == 'success', result
+        assert result['invoices_generated'] == 24 and result['chunks'] == 3
+
+        numbers = db.session.execute(db.select(Invoice.invoice_number)).scalars().all()
+        assert len(numbers) == len(set(numbers)) == 25
+
+        advanced = Subscription.query.filter(Subscription.next_billing_date == now + timedelta(days=32)).count()
+        assert advanced == 24
+
+        # Billed subscriptions are no longer due, so a second run is a no-op
+        assert BillingRun(chunk_size=10).run(now=now)['invoices_generated'] == 0
+    print("✅ Billing run is set-based and idempotent")
+
+def test_sharded_billing_run_and_replay():
+    """Shards bill disjoint customers and a replayed chunk is a no-op"""
+    from billing_run import ShardedBillingRun, tenant_shard
+
+    app = create_billing_app()
+    now = datetime(2024, 3, 1, 9, 0)
+    with app.app_context():
+        db.create_all()
+        customer_ids = seed_subscriptions(40, now)
+        for customer_id in customer_ids:
+            db.session.get(Customer, customer_id).tenant_id = f'tenant-{customer_id % 3}'
+        db.session.commit()
+
+        # Tenant shards partition the due subscriptions
+        shard_sizes = [len(BillingRun(shard=shard, shard_count=2, shard_by='tenant')._due_subscriptions(now))
+                       for shard in range(2)]
+        assert sum(shard_sizes) == 40
+        assert shard_sizes[0] == sum(1 for i in customer_ids if tenant_shard(f'tenant-{i % 3}', 2) == 0)
+
+        # Replaying a committed chunk inserts nothing and does not advance twice
+        billing_run = BillingRun()
+        chunk = billing_run._due_subscriptions(now)[:5]
+        assert billing_run._bill_chunk(chunk, now) == 5
+        assert billing_run._bill_chunk(chunk, now) == 0
+        assert Invoice.query.count() == 5
+        assert Subscription.query.filter(Subscription.next_billing_date == now + timedelta(days=32)).count() == 5
+
+        database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+
+    result = ShardedBillingRun(database_uri, shard_count=4, max_workers=2).run(now=now)
+    assert result['status'] == 'success', result
+    assert result['invoices_generated'] == 35 and len(result['shards']) == 4
+
+    with app.app_context():
+        numbers = db.session.execute(db.select(Invoice.invoice_number)).scalars().all()
+        assert len(numbers) == len(set(numbers)) == 40
+        assert Subscription.query.filter(Subscription.next_billing_date == now + timedelta(days=32)).count() == 40
+    print("✅ Sharded billing run is safe to replay")
+
+if __name__ == '__main__':
+    test_billing_run_is_set_based_and_idempotent()
+    test_sharded_billing_run_and_replay()
@@ -0,0 +1,74 @@
+"""
+Test script for BlockchainUtils against the stub JSON-RPC node
+
+Needs web3 and eth_account; the tests are skipped when they are not installed.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from test_rpc_client import StubNode
+
+try:
+    from web3 import Web3
+    from eth_account import Account
+    from blockchain_utils import BlockchainUtils
+except ImportError:  # optional dependency
+    Web3 = None
+
+WEB3_MISSING = "web3 not installed, skipping BlockchainUtils tests"
+
+pytestmark = pytest.mark.skipif(Web3 is None, reason=WEB3_MISSING)
+
+def test_balances_use_one_batched_request():
+    """get_balances sends one POST and maps addresses the node rejects to None"""
+    node = StubNode()
+    utils = BlockchainUtils(node.url, max_batch_size=50)
+    try:
+        assert utils.is_connected()
+        posts = node.posts
+        balances = utils.get_balances(['0x1', '0x2', 'not-an-address'])
+        assert node.posts - posts == 1
+        assert [call['method'] for call in node.requests[-1]] == ['eth_getBalance'] * 3
+        assert balances['0x2'] == Web3.from_wei(2 * 10 ** 15, 'ether')
+        assert balances['not-an-address'] is None
+        assert utils.get_balance('0x2') == balances['0x2']
+    finally:
+        utils.rpc.close()
+        node.close()
+    print("✅ Balances use one batched request")
+
+def test_send_transaction_batches_nonce_and_gas_price():
+    """Nonce and gas price arrive in one batched request, then the signed transaction is sent"""
+    node = StubNode()
+    utils = BlockchainUtils(node.url)
+    try:
+        private_key = '0x' + '11' * 32
+        sender = Account.from_key(private_key).address
+        posts = node.posts
+        tx_hash = utils.send_transaction(private_key, '0x' + '22' * 20, 0.01)
+        assert tx_hash is not None and node.posts - posts == 2
+
+        fields, send = node.requests[-2:]
+        assert [(call['method'], call['params']) for call in fields] == [
+            ('eth_getTransactionCount', [sender, 'pending']), ('eth_gasPrice', [])]
+        assert send['method'] == 'eth_sendRawTransaction'
+        assert tx_hash == node.answer(send)['result']
+
+        # The cached gas price leaves a single nonce lookup for the next transaction
+        utils.send_transaction(private_key, '0x' + '22' * 20, 0.01)
+        assert node.posts - posts == 4 and node.requests[-2]['method'] == 'eth_getTransactionCount'
+    finally:
+        utils.rpc.close()
+        node.close()
+    print("✅ Transactions batch the nonce and gas price")
+
+if __name__ == '__main__':
+    if Web3 is None:
+        print(f"⚠️ {WEB3_MISSING}")
+    else:
+        test_balances_use_one_batched_request()
+        test_send_transaction_batches_nonce_and_gas_price()
@@ -0,0 +1,100 @@
+"""
+Test script for indexed customer search and keyset pagination
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from database import db, Customer
+from customer_search import CustomerSearch, keyset_page, capped_count
+
+def create_search_app():
+    """Minimal app bound to a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}"
+    db.init_app(app)
+    return app
+
+def test_indexed_search_matches_like():
+    """The FTS5 trigram index finds the same customers as a substring LIKE, and follows writes"""
+    app = create_search_app()
+    search = CustomerSearch()
+    
+    with app.app_context():
+        db.create_all()
+        names = ['Acme Widgets', 'Globex Corp', 'Initech', 'Acme Rockets', 'Umbrella 100%']
+        for i, name in enumerate(names):
+            db.session.add(Customer(customer_code=f'CUST-{i:03d}', name=name, email=f'billing{i}@{name.split()[0].lower()}.com'))
+        db.session.commit()
+        
+        # Rows that existed before the index are picked up when it is created
+        assert search.ensure_index() == 'fts5'
+        like = CustomerSearch()
+        for term in ['acme', 'ROCK', 'globex.com', 'CUST-00', '100%', 'zzz', 'In']:
+            indexed = {c.id for c in search.filter(Customer.query, term).all()}
+            expected = {c.id for c in like.filter(Customer.query, term).all()}
+            assert indexed == expected, term
+        assert search.filter(Customer.query, 'acme').count() == 2
+        
+        # Triggers keep the index in step with inserts, renames and deletes
+        initech = Customer.query.filter_by(name='Initech').one()
+        initech.name = 'Acme Initech'
+        db.session.add(Customer(customer_code='CUST-900', name='Acme Labs', email='labs@acme.com'))
+        db.session.delete(Customer.query.filter_by(name='Acme Widgets').one())
+        db.session.commit()
+        assert sorted(c.name for c in search.filter(Customer.query, 'acme').all()) == ['Acme Initech', 'Acme Labs', 'Acme Rockets']
+    print("✅ Indexed search matches LIKE")
+
+def test_keyset_pagination_walks_every_row_once():
+    """Cursor pages cover the filtered set newest first, without duplicates, across equal and missing timestamps"""
+    app = create_search_app()
+    
+    with app.app_context():
+        db.create_all()
+        base = datetime(2026, 1, 1)
+        for i in range(25):
+            db.session.add(Customer(customer_code=f'CUST-{i}', name=f'Customer {i}', email=f'c{i}@example.com',
+                                    customer_segment='Gold' if i % 2 else 'Silver',
+                                    created_at=base + timedelta(minutes=i // 3)))
+        # Raw SQL inserts can leave created_at NULL; those rows are listed last
+        for i in range(25, 33):
+            db.session.execute(db.text(
+                "INSERT INTO customers (tenant_id, customer_code, name, email, customer_segment) "
+                "VALUES ('default', :code, :name, :email, :segment)"
+            ), {'code': f'CUST-{i}', 'name': f'Customer {i}', 'email': f'c{i}@example.com',
+                'segment': 'Gold' if i % 2 else 'Silver'})
+        db.session.commit()
+        
+        query = Customer.query.filter(Customer.customer_segment == 'Gold')
+        dated = [c.id for c in query.filter(Customer.created_at.isnot(None))
+                 .order_by(Customer.created_at.desc(), Customer.id.desc()).all()]
+        undated = [c.id for c in query.filter(Customer.created_at.is_(None)).order_by(Customer.id.desc()).all()]
+        for per_page in [5, 3, 12, 16, 20]:
+            seen, cursor = [], None
+            while True:
+                page = keyset_page(query, per_page, cursor)
+                seen.extend(c.id for c in page['items'])
+                if not page['has_more']:
+                    break
+                cursor = page['next_cursor']
+            assert seen == dated + undated, per_page
+        assert len(dated) == 12 and len(undated) == 4
+        
+        assert capped_count(query, 100) == {'total': 16, 'total_is_estimate': False}
+        assert capped_count(query, 10) == {'total': 10, 'total_is_estimate': True}
+        
+        try:
+            keyset_page(query, 5, 'not-a-cursor')
+            assert False, 'malformed cursor accepted'
+        except ValueError:
+            pass
+    print("✅ Keyset pagination walks every row once")
+
+if __name__ == '__main__':
+    test_indexed_search_matches_like()
+    test_keyset_pagination_walks_every_row_once()
@@ -0,0 +1,288 @@
+"""
+Test script for the cached dashboard metrics
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from database import db, Customer, Invoice, Transaction
+from dashboard_metrics import DashboardMetrics
+
+def create_dashboard_app():
+    """Minimal app bound to a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'dashboard.db')}"
+    db.init_app(app)
+    return app
+
+def test_dashboard_metrics_follow_writes():
+    """Incremental updates match a full recount after inserts, updates, deletes and rollbacks"""
+    app = create_dashboard_app()
+    metrics = DashboardMetrics(reconcile_interval=3600)
+
+    with app.app_context():
+        db.create_all()
+        metrics.install()
+        try:
+            customers = [Customer(customer_code=f'CUST-{i}', name=f'Customer {i}', email=f'c{i}@example.com')
+                         for i in range(5)]
+            db.session.add_all(customers)
+            db.session.commit()
+            assert metrics.snapshot()['total_customers'] == 5
+            reconciled_at = metrics.snapshot()['reconciled_at']
+
+            # ORM writes are applied incrementally, without another recount
+            customers[0].churn_risk_level = 'High'
+            customers[1].status = 'Inactive'
+            paid = Invoice(customer_id=customers[0].id, invoice_number='INV-1', subtotal=120, total_amount=120,
+                           status='Paid', invoice_date=datetime.utcnow() - timedelta(days=3))
+            old = Invoice(customer_id=customers[0].id, invoice_number='INV-2', subtotal=80, total_amount=80,
+                          status='Paid', invoice_date=datetime.utcnow() - timedelta(days=90))
+            pending = Invoice(customer_id=customers[2].id, invoice_number='INV-3', subtotal=50, total_amount=50,
+                              status='Pending')
+            crypto = Transaction(customer_id=customers[0].id, transaction_type='payment', amount=30,
+                                 blockchain_tx_hash='0xabc')
+            db.session.add_all([paid, old, pending, crypto])
+            db.session.commit()
+
+            pending.status = 'Paid'
+            db.session.delete(customers[4])
+            db.session.commit()
+
+            # Rolled back writes never reach the cache
+            customers[3].churn_risk_level = 'High'
+            db.session.flush()
+            db.session.rollback()
+
+            incremental = metrics.snapshot()
+            assert incremental['reconciled_at'] == reconciled_at
+            assert incremental['total_customers'] == 4
+            assert incremental['active_customers'] == 3
+            assert incremental['high_churn_risk'] == 1
+            assert incremental['pending_invoices'] == 0
+            assert incremental['total_revenue'] == 250.0
+            assert incremental['monthly_revenue'] == 170.0
+            assert incremental['crypto_transactions'] == 1 and incremental['crypto_volume'] == 30.0
+
+            metrics.reconcile()
+            recounted = metrics.snapshot()
+            for key in ['total_customers', 'active_customers', 'high_churn_risk', 'pending_invoices',
+                        'total_revenue', 'monthly_revenue', 'crypto_transactions', 'crypto_volume']:
+                assert recounted[key] == incremental[key], key
+
+            # Bulk statements bypass the unit of work and force a recount
+            db.session.execute(db.update(Customer).values(churn_risk_level='High'))
+            db.session.commit()
+            assert metrics.snapshot()['high_churn_risk'] == 4
+        finally:
+            metrics.remove()
+    print("✅ Dashboard metrics follow writes incrementally")
+
+def test_metrics_publisher_pushes_subset_deltas():
+    """One snapshot per tick feeds every client, each receiving only its subscribed metrics"""
+    from flask import request
+    from flask_socketio import SocketIO
+    from metrics_publisher import MetricsPublisher
+
+    app = create_dashboard_app()
+    socketio = SocketIO(app)
+    values = {'active_customers': 1, 'pending_invoices': 0, 'monthly_revenue': 10.0}
+    snapshots = []
+
+    def snapshot():
+        snapshots.append(1)
+        return dict(values)
+
+    publisher = MetricsPublisher(socketio, app, snapshot, interval=3600)
+
+    @socketio.on('subscribe_metrics')
+    def subscribe(data=None):
+        socketio.emit('metrics_update', publisher.subscribe(request.sid, (data or {}).get('metrics')), to=request.sid)
+
+    try:
+        everything = [socketio.test_client(app) for _ in range(20)]
+        revenue_only = [socketio.test_client(app) for _ in range(20)]
+        for client in everything:
+            client.emit('subscribe_metrics', {})
+        for client in revenue_only:
+            client.emit('subscribe_metrics', {'metrics': ['monthly_revenue']})
+        assert revenue_only[0].get_received()[-1]['args'][0] == {'monthly_revenue': 10.0}
+        for client in everything + revenue_only:
+            client.get_received()
+
+        values['active_customers'] = 2
+        snapshots.clear()
+        publisher.publish_once()
+        assert len(snapshots) == 1
+        assert everything[5].get_received() == [{'name': 'metrics_delta', 'args': [{'active_customers': 2}], 'namespace': '/'}]
+        assert revenue_only[5].get_received() == []
+
+        values['monthly_revenue'] = 25.0
+        publisher.publish_once()
+        assert revenue_only[5].get_received()[0]['args'][0] == {'monthly_revenue': 25.0}
+    finally:
+        publisher.stop()
+    print("✅ Metrics publisher pushes subset deltas")
+
+def test_polled_metrics_refresh_without_subscribers():
+    """Once the last subscriber leaves, polling clients still get values no older than the push interval"""
+    import time
+    from flask import request
+    from flask_socketio import SocketIO, emit
+    from metrics_publisher import MetricsPublisher
+
+    app = create_dashboard_app()
+    socketio = SocketIO(app)
+    values = {'active_customers': 1}
+    snapshots = []
+
+    def snapshot():
+        snapshots.append(1)
+        return dict(values)
+
+    publisher = MetricsPublisher(socketio, app, snapshot, interval=0.2)
+
+    @socketio.on('subscribe_metrics')
+    def subscribe(data=None):
+        emit('metrics_update', publisher.subscribe(request.sid))
+
+    @socketio.on('disconnect')
+    def disconnect():
+        publisher.unsubscribe(request.sid)
+
+    @socketio.on('get_real_time_metrics')
+    def poll():
+        emit('metrics_update', publisher.current())
+
+    try:
+        subscriber = socketio.test_client(app)
+        subscriber.emit('subscribe_metrics', {})
+        subscriber.disconnect()
+        assert not publisher._room_members
+
+        poller = socketio.test_client(app)
+        values['active_customers'] = 2
+        time.sleep(0.5)  # the idle loop does not refresh the snapshot
+        poller.emit('get_real_time_metrics')
+        assert poller.get_received()[-1]['args'][0] == {'active_customers': 2}
+
+        # Within the interval the cached snapshot is served without a recompute
+        calls = len(snapshots)
+        poller.emit('get_real_time_metrics')
+        assert len(snapshots) == calls
+        assert poller.get_received()[-1]['args'][0] == {'active_customers': 2}
+    finally:
+        publisher.stop()
+    print("✅ Polled metrics refresh without subscribers")
+
+def test_rollup_rows_are_upserted():
+    """Rollup deltas are one upsert, so a row another session just created is added to, not re-inserted"""
+    from sqlalchemy import event
+    from database import RevenueRollupDaily
+    from dashboard_metrics import DashboardMetrics, keep_old_value
+    from revenue_rollups import RevenueRollups, _add_or_insert
+
+    app = create_dashboard_app()
+    with app.app_context():
+        db.create_all()
+        day = datetime.utcnow().date()
+        key = {'tenant_id': 'acme', 'day': day}
+        with db.engine.begin() as other:
+            _add_or_insert(other, RevenueRollupDaily, key, {'revenue': 10, 'paid_invoices': 1})
+
+        statements = []
+        capture = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            with db.engine.begin() as connection:
+                _add_or_insert(connection, RevenueRollupDaily, key, {'revenue': 5, 'paid_invoices': 1})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        assert len(statements) == 1 and 'ON CONFLICT' in statements[0]
+        row = db.session.get(RevenueRollupDaily, ('acme', day))
+        assert float(row.revenue) == 15 and row.paid_invoices == 2
+
+        # The old-value listener is shared: removing the rollups keeps it for the dashboard
+        installed_before = event.contains(Invoice.status, 'set', keep_old_value)  # app-wide instances may be live
+        metrics, rollups = DashboardMetrics(), RevenueRollups()
+        metrics.install()
+        rollups.install()
+        rollups.remove()
+        assert event.contains(Invoice.status, 'set', keep_old_value)
+        metrics.remove()
+        assert event.contains(Invoice.status, 'set', keep_old_value) == installed_before
+    print("✅ Rollup rows are upserted")
+
+def test_revenue_rollups_match_rebuild():
+    """Incrementally maintained rollups equal a rebuild from the base tables"""
+    from database import RevenueRollupDaily, RevenueRollupMonthly, CustomerRevenue
+    from revenue_rollups import RevenueRollups
+
+    app = create_dashboard_app()
+    rollups = RevenueRollups()
+    today = datetime.utcnow().date()
+    this_month = datetime(today.year, today.month, 1, 12)
+    last_month = (this_month - timedelta(days=1)).replace(day=1, hour=12)
+    two_months_ago = (last_month - timedelta(days=1)).replace(day=1, hour=12)
+
+    def snapshot():
+        return {
+            'daily': sorted((row.tenant_id, row.day, float(row.revenue), row.paid_invoices, row.pending_invoices,
+                             row.new_customers, row.churned_customers) for row in RevenueRollupDaily.query.all()
+                            if any([row.revenue, row.paid_invoices, row.pending_invoices, row.new_customers, row.churned_customers])),
+            'monthly': sorted((row.tenant_id, row.month, float(row.revenue), row.paid_invoices, row.new_customers,
+                               row.churned_customers) for row in RevenueRollupMonthly.query.all()
+                              if any([row.revenue, row.paid_invoices, row.pending_invoices, row.new_customers, row.churned_customers])),
+            'customers': sorted((row.customer_id, float(row.paid_revenue)) for row in CustomerRevenue.query.all() if row.paid_revenue)
+        }
+
+    with app.app_context():
+        db.create_all()
+        rollups.install()
+        try:
+            customers = [Customer(customer_code=f'CUST-{i}', name=f'Customer {i}', email=f'c{i}@example.com',
+                                  tenant_id='acme' if i < 8 else 'globex') for i in range(10)]
+            db.session.add_all(customers)
+            db.session.commit()
+
+            invoices = []
+            for i, customer in enumerate(customers):
+                invoices.append(Invoice(customer_id=customer.id, invoice_number=f'INV-A{i}', subtotal=100,
+                                        total_amount=100, status='Paid', invoice_date=two_months_ago))
+                invoices.append(Invoice(customer_id=customer.id, invoice_number=f'INV-B{i}', subtotal=100 + i * 50,
+                                        total_amount=100 + i * 50, status='Pending', invoice_date=last_month))
+            db.session.add_all(invoices)
+            db.session.commit()
+
+            # Status changes, amount corrections, deletes and churn all flow into the rollups
+            for invoice in invoices[1::2]:
+                invoice.status = 'Paid'
+            invoices[3].total_amount = 400
+            db.session.delete(invoices[0])
+            customers[2].status = 'Inactive'
+            db.session.commit()
+            assert customers[2].churned_at is not None
+
+            incremental = snapshot()
+            assert rollups.growth_rate('acme', today) == (100 + 400 + sum(100 + i * 50 for i in range(2, 8)) - 700) / 700
+            assert rollups.customer_concentration('globex') == 650 / 1250
+            assert rollups.monthly(3, 'acme', today)[0]['paid_invoices'] == 7
+            assert sum(row['churned_customers'] for row in rollups.monthly(1, today=today)) == 1
+
+            assert rollups.rebuild()['status'] == 'success'
+            assert snapshot() == incremental
+        finally:
+            rollups.remove()
+    print("✅ Revenue rollups match a full rebuild")
+
+if __name__ == '__main__':
+    test_dashboard_metrics_follow_writes()
+    test_metrics_publisher_pushes_subset_deltas()
+    test_polled_metrics_refresh_without_subscribers()
+    test_rollup_rows_are_upserted()
+    test_revenue_rollups_match_rebuild()
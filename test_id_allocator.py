@@ -0,0 +1,77 @@
+"""
+Stress test for the identifier allocator
+"""
+
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from database import db, Customer
+from id_allocator import IdentifierAllocator
+
+def create_allocator_app():
+    """Minimal app bound to a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'ids.db')}"
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    db.init_app(app)
+    return app
+
+def allocate_concurrently(app, allocator, writers=8, per_writer=50, **kwargs):
+    """Numbers handed to each of several threads allocating one at a time"""
+    results = [[] for _ in range(writers)]
+    errors = []
+    
+    def writer(index):
+        try:
+            with app.app_context():
+                for _ in range(per_writer):
+                    results[index].append(allocator.allocate_one('customer_code', **kwargs))
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    return results
+
+def test_concurrent_writers_never_share_an_identifier():
+    """Table and hi/lo allocation stay unique under concurrent writers, per tenant where the format asks"""
+    app = create_allocator_app()
+    now = datetime(2026, 1, 2)
+    
+    with app.app_context():
+        db.create_all()
+        # The shared sequence continues after customers numbered by the old COUNT(*) + 1 scheme
+        for i in range(3):
+            db.session.add(Customer(customer_code=f'OLD-{i}', name='Old', email=f'old{i}@example.com'))
+        db.session.commit()
+        assert IdentifierAllocator().allocate('customer_code', 2, now=now) == ['CUST-20260102-000004', 'CUST-20260102-000005']
+    
+    for strategy in ['table', 'hilo']:
+        allocator = IdentifierAllocator(strategy=strategy, block_size=7)
+        results = allocate_concurrently(app, allocator)
+        flat = [code for codes in results for code in codes]
+        assert len(flat) == len(set(flat)) == 400, strategy
+        for codes in results:
+            numbers = [int(code.rsplit('-', 1)[1]) for code in codes]
+            assert numbers == sorted(numbers), strategy
+    
+    # Each tenant gets its own monotonic sequence when the format names the tenant
+    allocator = IdentifierAllocator(formats={'customer_code': '{tenant}-{number:05d}'})
+    acme = allocate_concurrently(app, allocator, writers=4, per_writer=25, tenant_id='acme')
+    globex = allocate_concurrently(app, allocator, writers=4, per_writer=25, tenant_id='globex')
+    assert sorted(code for codes in acme for code in codes) == [f'acme-{n:05d}' for n in range(1, 101)]
+    assert sorted(code for codes in globex for code in codes) == [f'globex-{n:05d}' for n in range(1, 101)]
+    print("✅ Concurrent writers never share an identifier")
+
+if __name__ == '__main__':
+    test_concurrent_writers_never_share_an_identifier()
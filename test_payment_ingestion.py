@@ -0,0 +1,177 @@
+"""
+Test script for idempotent crypto payment ingestion
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from database import db, Customer, Transaction
+from blockchain_services import BlockchainService
+from payment_ingestion import PaymentIngestion, BloomFilter
+
+def create_payment_app():
+    """Minimal app bound to a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'payments.db')}"
+    db.init_app(app)
+    return app
+
+class CountingProcessor:
+    """BlockchainService.process_crypto_payment that counts calls and can be slowed down"""
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self.service = BlockchainService()
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.service.process_crypto_payment(*args, **kwargs)
+
+CLEAN = {'status': 'success', 'fraud_score': 0.1, 'is_fraud': False, 'risk_level': 'low'}
+BLOCKED = {'status': 'success', 'fraud_score': 0.9, 'is_fraud': True, 'risk_level': 'high'}
+
+def payment(key, amount=50.0, **extra):
+    return {'customer_id': 1, 'invoice_id': 7, 'amount_usd': amount, 'network': 'ethereum',
+            'sender_address': '0xsender', 'receiver_address': '0xreceiver', 'idempotency_key': key, **extra}
+
+def test_bloom_filter_has_no_false_negatives():
+    """Every added item is found; unseen items are rarely reported"""
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"key:{i}")
+    assert all(f"key:{i}" in bloom for i in range(10000))
+    false_positives = sum(f"other:{i}" in bloom for i in range(10000))
+    assert false_positives < 300, false_positives
+    print(f"✅ Bloom filter: {false_positives / 100:.2f}% false positives")
+
+def test_payment_retries_are_deduplicated():
+    """Retries, concurrent storms and other workers never process or record a payment twice"""
+    app = create_payment_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(Customer(customer_code='CUST-1', name='Customer 1', email='c1@example.com'))
+        db.session.commit()
+
+        ingestion = PaymentIngestion()
+        assert ingestion.warm()['status'] == 'success'
+        processor = CountingProcessor()
+
+        # First request is recorded with its fraud fields; the retry is answered from memory
+        assert ingestion.replay(payment('key-1')) is None
+        first, status_code = ingestion.ingest(payment('key-1'), CLEAN, processor)
+        assert status_code == 200 and first['status'] == 'success'
+        stored = db.session.get(Transaction, first['transaction_id'])
+        assert stored.status == 'Completed' and stored.fraud_status == 'clean' and stored.fraud_score == 0.1
+        assert stored.blockchain_tx_hash == first['tx_hash'] and stored.idempotency_key == 'key-1'
+        replayed, status_code = ingestion.replay(payment('key-1'))
+        assert status_code == 200 and replayed['idempotent_replay']
+        assert replayed['tx_hash'] == first['tx_hash'] and ingestion.stats['cache_hits'] == 1
+        assert ingestion.stats['lookups_skipped'] == 1  # the first request never queried for duplicates
+
+        # The same key for a different payment is rejected; the client's own hash dedupes too
+        assert ingestion.replay(payment('key-1', amount=51.0))[1] == 422
+        assert ingestion.replay(payment('key-2', tx_hash=first['tx_hash']))[0]['transaction_id'] == first['transaction_id']
+
+        # Another worker that has never seen the key finds it through the index or the claim
+        other = PaymentIngestion()
+        other.warm()
+        assert other.replay(payment('key-1'))[0]['transaction_id'] == first['transaction_id']
+        cold = PaymentIngestion()
+        response, status_code = cold.ingest(payment('key-1'), CLEAN, processor)
+        assert status_code == 200 and response['transaction_id'] == first['transaction_id']
+        assert cold.stats['claim_conflicts'] == 1 and processor.calls == 1
+
+        # Blocked attempts are recorded and replayed as blocked
+        response, status_code = ingestion.ingest(payment('key-3', amount=20000.0), BLOCKED, processor)
+        assert status_code == 403 and processor.calls == 1
+        assert db.session.get(Transaction, response['transaction_id']).fraud_status == 'blocked'
+        assert ingestion.replay(payment('key-3', amount=20000.0))[1] == 403
+
+        # A failed payment releases its key for the retry
+        failing = lambda *args, **kwargs: {'status': 'error', 'message': 'node unavailable'}
+        assert ingestion.ingest(payment('key-4'), CLEAN, failing)[1] == 400
+        assert ingestion.replay(payment('key-4')) is None
+        assert ingestion.ingest(payment('key-4'), CLEAN, processor)[1] == 200
+
+        # A retry storm on one key: a single payment, every caller gets its outcome
+        slow = CountingProcessor(delay=0.2)
+        results = []
+
+        def retry():
+            with app.app_context():
+                data = payment('key-5')
+                results.append(ingestion.replay(data) or ingestion.ingest(data, CLEAN, slow))
+
+        threads = [threading.Thread(target=retry) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert slow.calls == 1
+        assert {status_code for _, status_code in results} == {200}
+        assert len({response['tx_hash'] for response, _ in results}) == 1
+        assert Transaction.query.filter_by(idempotency_key='key-5').count() == 1
+    print("✅ Payment retries are deduplicated")
+
+def test_abandoned_claims_are_released():
+    """A processor that raises releases its key; a dead worker's claim is taken over after its lease"""
+    app = create_payment_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(Customer(customer_code='CUST-1', name='Customer 1', email='c1@example.com'))
+        db.session.commit()
+        ingestion = PaymentIngestion(claim_lease_seconds=60)
+        ingestion.warm()
+        processor = CountingProcessor()
+
+        def timing_out(*args, **kwargs):
+            raise TimeoutError('node did not answer')
+
+        try:
+            ingestion.ingest(payment('key-1'), CLEAN, timing_out)
+            assert False, 'expected the TimeoutError'
+        except TimeoutError:
+            pass
+        assert Transaction.query.filter_by(idempotency_key='key-1').count() == 0
+        assert ingestion.replay(payment('key-1')) is None
+        assert ingestion.ingest(payment('key-1'), CLEAN, processor)[1] == 200
+
+        # A claim inside its lease belongs to a live worker; retries wait for it
+        def claim(key, age):
+            db.session.add(Transaction(customer_id=1, invoice_id=7, transaction_type='payment', amount=50.0,
+                                       status='Pending', idempotency_key=key,
+                                       claimed_at=datetime.utcnow() - timedelta(seconds=age)))
+            db.session.commit()
+
+        claim('key-2', age=5)
+        assert PaymentIngestion().replay(payment('key-2'))[1] == 409
+        assert ingestion.ingest(payment('key-2'), CLEAN, processor)[1] == 409
+        assert processor.calls == 1
+
+        # Once the lease runs out, the next retry processes the payment on the same row
+        claim('key-3', age=120)
+        assert ingestion.replay(payment('key-3')) is None
+        response, status_code = ingestion.ingest(payment('key-3'), CLEAN, processor)
+        assert status_code == 200 and processor.calls == 2 and ingestion.stats['claims_taken_over'] == 1
+        stored = Transaction.query.filter_by(idempotency_key='key-3').one()
+        assert stored.id == response['transaction_id'] and stored.status == 'Completed'
+        assert ingestion.replay(payment('key-3'))[0]['tx_hash'] == response['tx_hash']
+
+        # An expired claim is not taken over for a different payment
+        claim('key-4', age=120)
+        assert ingestion.ingest(payment('key-4', amount=99.0), CLEAN, processor)[1] == 422
+    print("✅ Abandoned payment claims are released")
+
+if __name__ == '__main__':
+    test_bloom_filter_has_no_false_negatives()
+    test_payment_retries_are_deduplicated()
+    test_abandoned_claims_are_released()
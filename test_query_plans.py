@@ -0,0 +1,90 @@
+"""
+Query-plan regression test for the hot read paths
+"""
+
+import sys
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy import event
+
+from database import db, Customer, Transaction
+from dashboard_metrics import DashboardMetrics
+from billing_run import BillingRun
+from customer_search import keyset_page
+
+BASE_TABLES = {'customers', 'subscriptions', 'invoices', 'transactions', 'support_tickets'}
+
+def create_plan_app():
+    """Minimal app bound to a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plans.db')}"
+    db.init_app(app)
+    return app
+
+@contextmanager
+def captured_selects():
+    """Collect every SELECT sent to the database, with its parameters"""
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+    
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+def query_plan(statement, parameters):
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, tuple(parameters)).all()
+    return [row[-1] for row in rows]
+
+def full_scans(plan):
+    """Base tables the plan reads without an index"""
+    return [match.group(1) for match in (re.match(r'^SCAN (\w+)$', detail) for detail in plan)
+            if match and match.group(1) in BASE_TABLES]
+
+def test_hot_queries_use_indexes():
+    """Dashboard, billing run, customer list and velocity queries never scan a base table"""
+    app = create_plan_app()
+    
+    with app.app_context():
+        db.create_all()
+        with captured_selects() as statements:
+            DashboardMetrics().reconcile()
+            BillingRun()._due_subscriptions(datetime.utcnow())
+            keyset_page(Customer.query.filter(Customer.churn_risk_level == 'High'), 50)
+            keyset_page(Customer.query.filter(Customer.tenant_id == 'acme'), 50)
+            Transaction.query.filter(
+                Transaction.customer_id == 1,
+                Transaction.created_at >= datetime.utcnow() - timedelta(hours=24)
+            ).count()
+        
+        assert len(statements) >= 10
+        plans = {}
+        for statement, parameters in statements:
+            plan = query_plan(statement, parameters)
+            plans[statement] = plan
+            assert not full_scans(plan), f"{statement}\n{plan}"
+        
+        # The keyset order comes straight from the index, without a sort step
+        for statement, plan in plans.items():
+            if 'ORDER BY customers.created_at DESC' in statement:
+                assert not any('TEMP B-TREE' in detail for detail in plan), plan
+        
+        used = ' '.join(detail for plan in plans.values() for detail in plan)
+        for index in ['ix_subscriptions_due', 'ix_invoices_status_invoice_date', 'ix_transactions_on_chain',
+                      'ix_transactions_customer_created_at', 'ix_customers_churn_risk_created_at_id',
+                      'ix_customers_tenant_created_at_id']:
+            assert index in used, index
+    print("✅ Hot queries use indexes")
+
+if __name__ == '__main__':
+    test_hot_queries_use_indexes()
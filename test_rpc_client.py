@@ -0,0 +1,129 @@
+"""
+Test script for the pooled, batched JSON-RPC client
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rpc_client import JsonRpcClient, JsonRpcError
+
+class StubNode:
+    """Ethereum JSON-RPC node on localhost that counts the POSTs it receives"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.posts = 0
+        self.requests = []  # decoded request bodies, one per POST
+        self.connections = set()
+        self.gas_price = 20 * 10 ** 9
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like a real node
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                node.posts += 1
+                node.connections.add(self.client_address)
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                node.requests.append(body)
+                time.sleep(node.latency)
+                reply = [node.answer(call) for call in body] if isinstance(body, list) else node.answer(body)
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, call):
+        method, params = call['method'], call['params']
+        if method == 'eth_getBalance':
+            if not params[0].startswith('0x'):
+                return {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32602, 'message': 'invalid address'}}
+            result = hex(int(params[0][2:], 16) * 10 ** 15)
+        elif method == 'eth_getTransactionCount':
+            result = hex(int(params[0][2:], 16) % 100)
+        elif method == 'eth_gasPrice':
+            result = hex(self.gas_price)
+        elif method == 'web3_clientVersion':
+            result = 'StubNode/v1'
+        elif method == 'eth_sendRawTransaction':
+            result = '0x' + params[0][2:].rjust(64, '0')[-64:]
+        else:
+            return {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32601, 'message': 'method not found'}}
+        return {'jsonrpc': '2.0', 'id': call['id'], 'result': result}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def test_batched_calls_match_single_calls():
+    """Batches return the per-call results in request order, errors in their own slots"""
+    node = StubNode()
+    client = JsonRpcClient(node.url, max_batch_size=50)
+    try:
+        addresses = [hex(i) for i in range(1, 231)] + ['not-an-address']
+        balances = client.get_balances(addresses)
+        assert list(balances) == addresses
+        assert node.posts == 5  # 231 calls in chunks of 50
+
+        expected = {address: int(client.call('eth_getBalance', address, 'latest'), 16) for address in addresses[:20]}
+        assert all(balances[address] == wei for address, wei in expected.items())
+        assert balances['not-an-address'] is None
+
+        results = client.batch([('eth_gasPrice', ()), ('eth_unknown', ()), ('eth_getTransactionCount', ('0x65', 'pending'))])
+        assert results[0] == hex(node.gas_price) and results[2] == hex(1)
+        assert isinstance(results[1], JsonRpcError) and results[1].code == -32601
+        try:
+            client.call('eth_unknown')
+            assert False, 'expected a JsonRpcError'
+        except JsonRpcError as e:
+            assert e.code == -32601
+
+        # Keep-alive connections are reused instead of opening one per request
+        assert len(node.connections) <= client.pool_size
+        assert client.requests_sent == node.posts
+    finally:
+        client.close()
+        node.close()
+    print("✅ Batched JSON-RPC calls match single calls")
+
+def test_transaction_fields_use_one_round_trip():
+    """Nonce and gas price arrive in one batch; the gas price is cached until its TTL expires"""
+    node = StubNode()
+    client = JsonRpcClient(node.url, gas_price_ttl=0.2)
+    try:
+        assert client.transaction_fields('0x105') == (61, node.gas_price)
+        assert node.posts == 1
+
+        # Within the TTL only the nonce is fetched
+        node.gas_price = 30 * 10 ** 9
+        nonce, gas_price = client.transaction_fields('0x106')
+        assert nonce == 62 and gas_price == 20 * 10 ** 9
+        assert client.gas_price() == 20 * 10 ** 9 and node.posts == 2
+
+        time.sleep(0.25)
+        assert client.gas_price() == 30 * 10 ** 9 and node.posts == 3
+        assert client.send_raw_transaction('0xabc').endswith('abc')
+    finally:
+        client.close()
+        node.close()
+    print("✅ Transaction fields use one round trip")
+
+if __name__ == '__main__':
+    test_batched_calls_match_single_calls()
+    test_transaction_fields_use_one_round_trip()
@@ -0,0 +1,102 @@
+"""
+Test script for upgrading a database created with an older schema
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy.exc import IntegrityError
+
+from database import db, DatabaseManager, Customer, Invoice, Transaction
+
+# Tables as the first release created them, before the models gained columns
+BASELINE_TABLES = [
+    """CREATE TABLE customers (
+        id INTEGER NOT NULL, tenant_id VARCHAR(100) NOT NULL, customer_code VARCHAR(50) NOT NULL,
+        name VARCHAR(200) NOT NULL, email VARCHAR(200) NOT NULL, phone VARCHAR(50), address TEXT,
+        country VARCHAR(100), company_name VARCHAR(200), industry VARCHAR(100), account_type VARCHAR(50),
+        status VARCHAR(50), preferred_currency VARCHAR(10), communication_preferences TEXT,
+        churn_risk_score FLOAT, churn_risk_level VARCHAR(20), lifetime_value FLOAT, customer_segment VARCHAR(50),
+        crypto_wallets TEXT, created_at DATETIME, updated_at DATETIME,
+        PRIMARY KEY (id), UNIQUE (customer_code)
+    )""",
+    """CREATE TABLE invoices (
+        id INTEGER NOT NULL, customer_id INTEGER NOT NULL, invoice_number VARCHAR(50) NOT NULL,
+        status VARCHAR(50), subtotal NUMERIC(10, 2) NOT NULL, tax_amount NUMERIC(10, 2),
+        discount_amount NUMERIC(10, 2), total_amount NUMERIC(10, 2) NOT NULL, currency VARCHAR(10),
+        invoice_date DATETIME, due_date DATETIME, paid_date DATETIME, ai_generated BOOLEAN, auto_sent BOOLEAN,
+        notes TEXT, created_at DATETIME, updated_at DATETIME,
+        PRIMARY KEY (id), FOREIGN KEY(customer_id) REFERENCES customers (id), UNIQUE (invoice_number)
+    )""",
+    """CREATE TABLE transactions (
+        id INTEGER NOT NULL, customer_id INTEGER NOT NULL, invoice_id INTEGER,
+        transaction_type VARCHAR(50) NOT NULL, amount NUMERIC(10, 2) NOT NULL, currency VARCHAR(10),
+        status VARCHAR(50), payment_method VARCHAR(50), payment_gateway VARCHAR(50),
+        gateway_transaction_id VARCHAR(200), blockchain_network VARCHAR(50), blockchain_tx_hash VARCHAR(200),
+        sender_address VARCHAR(200), receiver_address VARCHAR(200), fraud_score FLOAT, fraud_status VARCHAR(20),
+        transaction_metadata TEXT, created_at DATETIME, updated_at DATETIME,
+        PRIMARY KEY (id), FOREIGN KEY(customer_id) REFERENCES customers (id),
+        FOREIGN KEY(invoice_id) REFERENCES invoices (id)
+    )"""
+]
+
+def create_upgrade_app():
+    """Minimal app bound to a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'upgrade.db')}"
+    db.init_app(app)
+    return app
+
+def test_startup_upgrades_baseline_schema():
+    """The startup schema steps add new columns before indexing them, and can run again"""
+    app = create_upgrade_app()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            for statement in BASELINE_TABLES:
+                connection.execute(db.text(statement))
+            connection.execute(db.text(
+                "INSERT INTO customers (id, tenant_id, customer_code, name, email, status) "
+                "VALUES (1, 'default', 'CUST-1', 'Old Customer', 'old@example.com', 'Active')"
+            ))
+
+        # What app.py runs at import time
+        manager = DatabaseManager()
+        db.create_all()
+        manager.create_indexes()
+        assert manager.add_missing_columns() == []
+        manager.create_indexes()
+
+        inspector = db.inspect(db.engine)
+        for table in ['customers', 'invoices', 'transactions']:
+            columns = {column['name'] for column in inspector.get_columns(table)}
+            assert set(db.metadata.tables[table].columns.keys()) <= columns, table
+        indexes = {index['name'] for index in inspector.get_indexes('transactions')}
+        assert {'ix_transactions_idempotency_key', 'ix_transactions_blockchain_tx_hash'} <= indexes
+
+        # Old rows read back through the models, and the new columns work
+        assert db.session.get(Customer, 1).ai_scored_at is None
+        db.session.add(Transaction(customer_id=1, transaction_type='payment', amount=5, idempotency_key='key-1'))
+        db.session.commit()
+        db.session.add(Transaction(customer_id=1, transaction_type='payment', amount=5, idempotency_key='key-1'))
+        try:
+            db.session.commit()
+            assert False, 'expected the idempotency key to be unique'
+        except IntegrityError:
+            db.session.rollback()
+
+        # A column declared unique=True keeps its uniqueness through the upgrade
+        for number in ['INV-1', 'INV-2']:
+            db.session.add(Invoice(customer_id=1, invoice_number=number, subtotal=10, total_amount=10,
+                                   idempotency_key='cycle-1'))
+        try:
+            db.session.commit()
+            assert False, 'expected the invoice idempotency key to be unique'
+        except IntegrityError:
+            db.session.rollback()
+    print("✅ Baseline schema upgraded")
+
+if __name__ == '__main__':
+    test_startup_upgrades_baseline_schema()
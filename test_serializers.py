@@ -0,0 +1,102 @@
+"""
+Test script for the precompiled row serializers
+"""
+
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy import event
+
+from database import db, Customer, Product, Subscription, Invoice, Transaction
+from database import customers_schema, transactions_schema, invoices_schema, subscriptions_schema
+from serializers import customer_serializer, transaction_serializer, invoice_serializer, subscription_serializer
+
+def create_serializer_app():
+    """Minimal app bound to a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'serializers.db')}"
+    db.init_app(app)
+    return app
+
+def seed_rows(count):
+    now = datetime(2026, 3, 1, 12, 30, 15, 123456)
+    product = Product(name='Plan', base_price=19.99)
+    db.session.add(product)
+    for i in range(count):
+        customer = Customer(customer_code=f'CUST-{i}', name=f'Clïent {i} — ünïcode', email=f'c{i}@example.com',
+                            churn_risk_score=i / 7, lifetime_value=1e-5 * i, phone=None if i % 2 else '555',
+                            created_at=now - timedelta(days=i))
+        invoice = Invoice(customer=customer, invoice_number=f'INV-{i}', subtotal=10 + i / 3, total_amount=12.345 + i,
+                          ai_generated=bool(i % 2), invoice_date=now)
+        db.session.add_all([
+            customer, invoice,
+            Transaction(customer=customer, invoice=invoice if i % 3 else None, transaction_type='payment',
+                        amount=99.995 + i, fraud_score=0.1 * i),
+            Subscription(customer=customer, product=product, amount=19.99, next_billing_date=now, auto_renew=i % 2 == 0)
+        ])
+    db.session.commit()
+    db.session.expunge_all()
+
+def test_row_serializers_match_marshmallow():
+    """Compiled plans produce the same dicts and bytes as the auto-schemas, without per-row lazy loads"""
+    app = create_serializer_app()
+    
+    with app.app_context():
+        db.create_all()
+        seed_rows(30)
+        
+        pairs = [(Customer, customers_schema, customer_serializer),
+                 (Transaction, transactions_schema, transaction_serializer),
+                 (Invoice, invoices_schema, invoice_serializer),
+                 (Subscription, subscriptions_schema, subscription_serializer)]
+        for model, schema, serializer in pairs:
+            rows = model.query.order_by(model.id).all()
+            expected = schema.dump(rows)
+            db.session.expunge_all()
+            actual = serializer.dump_many(model.query.order_by(model.id).all())
+            assert actual == expected, model.__name__
+            assert app.json.dumps(actual) == app.json.dumps(expected)
+        
+        # Nesting costs one query per relationship, not one per row
+        queries = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.append(args[2]))
+        db.session.expunge_all()
+        transactions = Transaction.query.all()
+        transaction_serializer.dump_many(transactions)
+        assert len(queries) == 4, queries  # transactions, customers, invoices, invoice customers
+        
+        queries.clear()
+        db.session.expunge_all()
+        transactions = Transaction.query.options(*transaction_serializer.eager_options()).all()
+        transaction_serializer.dump_many(transactions)
+        assert len(queries) == 1, queries
+    print("✅ Row serializers match marshmallow")
+
+def test_orjson_response_matches_jsonify():
+    """The optional orjson path encodes the same document as jsonify"""
+    from serializers import json_response, orjson
+    if orjson is None:
+        print("⚠️ orjson not installed, skipping")
+        return
+    
+    app = create_serializer_app()
+    payload = {'b': [1, 2.5, None, True], 'a': {'amount': __import__('decimal').Decimal('12.30'), 'at': datetime(2026, 1, 2)}}
+    with app.test_request_context():
+        standard = json_response(payload)[0].get_data()
+        os.environ['JSON_ENCODER'] = 'orjson'
+        try:
+            fast = json_response(payload)[0].get_data()
+        finally:
+            del os.environ['JSON_ENCODER']
+    assert fast == standard, (fast, standard)
+    assert json.loads(fast) == json.loads(standard)
+    print("✅ orjson response matches jsonify")
+
+if __name__ == '__main__':
+    test_row_serializers_match_marshmallow()
+    test_orjson_response_matches_jsonify()
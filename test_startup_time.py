@@ -0,0 +1,100 @@
+"""
+Startup time test for the Flask application
+
+Imports app in a fresh interpreter, checks that the ML, blockchain and
+communication stacks are not loaded at import, and times the import plus
+the first request against a database seeded with recent transactions,
+whose in-memory stores load in the background. The budget can be tuned
+for slow CI runners with STARTUP_BUDGET_SECONDS.
+"""
+
+import sys
+import os
+import json
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from database import db, Customer, Transaction
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SEEDED_TRANSACTIONS = 50000
+
+HEAVY_MODULES = ['pandas', 'sklearn', 'web3', 'ai_services', 'blockchain_services', 'communication_services']
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/health')
+first_request = time.perf_counter()
+loaded = [name for name in %r if name in sys.modules]
+app.warmup_thread.join(timeout=60)
+with app.app.app_context():
+    velocity = app.velocity_store.features(1)
+    replayed = app.payment_ingestion.replay({'customer_id': 1, 'amount_usd': 10, 'idempotency_key': 'key-7'})
+print(json.dumps({
+    'import_seconds': imported - start,
+    'first_request_seconds': first_request - imported,
+    'status_code': response.status_code,
+    'loaded': loaded,
+    'warmed_up': not app.warmup_thread.is_alive(),
+    'transactions_24h': velocity['transactions_24h'],
+    'dedup_warm': app.payment_ingestion._warm,
+    'replayed_status': replayed[1] if replayed else None
+}))
+""" % (HEAVY_MODULES,)
+
+def seed_database(database_url):
+    """Fill a throwaway database with a day of paid transactions for the startup work to load"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+    now = datetime.utcnow()
+    with app.app_context():
+        db.create_all()
+        db.session.add(Customer(customer_code='CUST-1', name='Customer 1', email='c1@example.com'))
+        db.session.commit()
+        db.session.execute(db.insert(Transaction), [
+            {'customer_id': 1, 'transaction_type': 'payment', 'amount': 10, 'status': 'Completed',
+             'created_at': now - timedelta(seconds=i), 'idempotency_key': f"key-{i}",
+             'blockchain_tx_hash': f"0x{i:064x}"}
+            for i in range(SEEDED_TRANSACTIONS)
+        ])
+        db.session.commit()
+
+def measure_startup():
+    """Run the startup script in a clean interpreter and return its timings"""
+    env = dict(os.environ)
+    env['MODEL_WARMUP'] = 'false'
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    seed_database(env['DATABASE_URL'])
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def test_startup_time():
+    """App import defers heavy modules and serves its first request within budget"""
+    budget = float(os.getenv('STARTUP_BUDGET_SECONDS', 2.0))
+    result = measure_startup()
+
+    assert result['status_code'] == 200
+    assert result['loaded'] == [], f"Heavy modules imported at startup: {result['loaded']}"
+    total = result['import_seconds'] + result['first_request_seconds']
+    assert total < budget, f"Startup took {total:.2f}s (budget {budget:.2f}s)"
+
+    # The stores finish loading the seeded rows in the background
+    assert result['warmed_up']
+    assert result['transactions_24h'] == SEEDED_TRANSACTIONS
+    assert result['dedup_warm'] and result['replayed_status'] == 200
+    print(f"✅ Import {result['import_seconds']:.3f}s, first request {result['first_request_seconds']:.3f}s")
+
+if __name__ == '__main__':
+    test_startup_time()
@@ -0,0 +1,90 @@
+"""
+Test script for the sliding-window velocity store
+"""
+
+import sys
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from database import db, Customer, Transaction
+from velocity import VelocityStore
+
+def create_velocity_app():
+    """Minimal app bound to a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'velocity.db')}"
+    db.init_app(app)
+    return app
+
+def window_counts(customer_id, now, bucket_seconds):
+    """Counts and sums straight from transactions, over the same bucket-aligned windows"""
+    store = VelocityStore(bucket_seconds=bucket_seconds)
+    features = {}
+    for name, start in zip(store.windows, store._cutoffs(now)):
+        since = datetime(1970, 1, 1) + timedelta(seconds=start * bucket_seconds)
+        query = Transaction.query.filter(Transaction.customer_id == customer_id, Transaction.created_at >= since)
+        features[f"transactions_{name}"] = query.count()
+        features[f"amount_{name}"] = round(float(query.with_entities(db.func.sum(Transaction.amount)).scalar() or 0), 2)
+    return features
+
+def test_velocity_windows_match_range_counts():
+    """Incremental, late, rolled back and deleted writes match SQL range counts as time slides"""
+    app = create_velocity_app()
+    store = VelocityStore(bucket_seconds=60)
+    rng = random.Random(7)
+
+    with app.app_context():
+        db.create_all()
+        customers = [Customer(customer_code=f'CUST-{i}', name=f'Customer {i}', email=f'c{i}@example.com')
+                     for i in range(3)]
+        db.session.add_all(customers)
+        db.session.commit()
+        ids = [customer.id for customer in customers]
+        now = datetime.utcnow()
+
+        # History from before the store started, loaded by the rebuild
+        for _ in range(300):
+            db.session.add(Transaction(customer_id=rng.choice(ids), transaction_type='payment',
+                                       amount=round(rng.uniform(1, 500), 2),
+                                       created_at=now - timedelta(seconds=rng.uniform(0, 8 * 86400))))
+        db.session.commit()
+        assert store.rebuild(now)['status'] == 'success'
+
+        store.install()
+        try:
+            for customer_id in ids:
+                assert store.features(customer_id, now) == window_counts(customer_id, now, 60)
+
+            # New writes, some arriving late, are applied on commit
+            for _ in range(50):
+                db.session.add(Transaction(customer_id=rng.choice(ids), transaction_type='payment',
+                                           amount=round(rng.uniform(1, 500), 2),
+                                           created_at=now - timedelta(seconds=rng.choice([0, 30, 1800, 7200]))))
+            db.session.commit()
+            db.session.add(Transaction(customer_id=ids[0], transaction_type='payment', amount=999, created_at=now))
+            db.session.rollback()
+            deleted = Transaction.query.filter_by(customer_id=ids[1]).order_by(Transaction.id.desc()).first()
+            db.session.delete(deleted)
+            db.session.commit()
+
+            # Windows slide forward as time passes
+            for minutes in [0, 1, 59, 61, 60 * 23, 60 * 25, 60 * 24 * 6]:
+                moment = now + timedelta(minutes=minutes)
+                for customer_id in ids:
+                    assert store.features(str(customer_id), moment) == window_counts(customer_id, moment, 60), minutes
+
+            # Bulk statements bypass the events and trigger a reload
+            db.session.execute(db.delete(Transaction).where(Transaction.customer_id == ids[2]))
+            db.session.commit()
+            assert store.count(ids[2], '7d') == 0
+        finally:
+            store.remove()
+    print("✅ Velocity windows match range counts")
+
+if __name__ == '__main__':
+    test_velocity_windows_match_range_counts()
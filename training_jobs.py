@@ -0,0 +1,166 @@
+"""
+Background model training jobs for BillChain AI
+
+Training runs in a process pool so the Flask worker and the SocketIO loop
+stay responsive during a RandomForest fit. Progress and completion are
+pushed to clients over SocketIO, and the finished model is swapped into
+the live analytics service in one step.
+"""
+
+import os
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODEL_TYPES = ['churn', 'cltv']
+
+def run_training_job(job_id: str, model_type: str, customer_data: List[Dict[str, Any]],
+                     n_jobs: Optional[int], progress_queue) -> Dict[str, Any]:
+    """Fit a model inside a pool worker and return it with its scaler and metrics"""
+    # Imported here so pool workers only pay for the ML stack when they train
+    from ai_services import AdvancedAnalyticsService
+
+    def report(stage, percent):
+        if progress_queue is not None:
+            progress_queue.put((job_id, stage, percent))
+
+    trainer = AdvancedAnalyticsService(models_dir=os.getenv('MODELS_DIR', 'models'), load_models=False)
+    if model_type == 'churn':
+        model, scaler, metrics = trainer.fit_churn_model(customer_data, n_jobs=n_jobs, progress=report)
+    else:
+        model, scaler, metrics = trainer.fit_cltv_model(customer_data, n_jobs=n_jobs, progress=report)
+
+    return {'model': model, 'scaler': scaler, 'metrics': metrics}
+
+class TrainingJobManager:
+    """Submits training jobs to a process pool and tracks their state"""
+
+    def __init__(self, service_getter: Callable, socketio=None,
+                 max_workers: Optional[int] = None, n_jobs: Optional[int] = None):
+        self.service_getter = service_getter
+        self.socketio = socketio
+        self.max_workers = max_workers or int(os.getenv('TRAINING_WORKERS', 1))
+        self.n_jobs = n_jobs if n_jobs is not None else _env_int('TRAINING_N_JOBS')
+
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._progress_queue = None
+        self._mp_manager = None
+
+    def _ensure_started(self):
+        """Create the pool and progress listener on first use"""
+        if self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._mp_manager = multiprocessing.Manager()
+        self._progress_queue = self._mp_manager.Queue()
+        threading.Thread(target=self._listen_for_progress, daemon=True).start()
+
+    def submit(self, model_type: str, customer_data: List[Dict[str, Any]],
+               n_jobs: Optional[int] = None) -> Dict[str, Any]:
+        """Queue a training job and return its initial state"""
+        if model_type not in MODEL_TYPES:
+            raise ValueError(f"Unknown model type: {model_type}")
+
+        with self._lock:
+            self._ensure_started()
+            job_id = uuid.uuid4().hex
+            job = {
+                'job_id': job_id,
+                'model_type': model_type,
+                'status': 'queued',
+                'stage': 'queued',
+                'progress': 0,
+                'training_samples': len(customer_data),
+                'submitted_at': datetime.utcnow().isoformat(),
+                'completed_at': None,
+                'result': None,
+                'error': None
+            }
+            self.jobs[job_id] = job
+
+        future = self._executor.submit(
+            run_training_job, job_id, model_type, customer_data,
+            n_jobs if n_jobs is not None else self.n_jobs, self._progress_queue
+        )
+        future.add_done_callback(lambda f: self._on_job_done(job_id, f))
+
+        self._emit('training_job_progress', dict(job))  # stage 'queued', progress 0
+        return dict(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of a job"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """All known jobs, newest first"""
+        with self._lock:
+            jobs = [dict(job) for job in self.jobs.values()]
+        return sorted(jobs, key=lambda job: job['submitted_at'], reverse=True)
+
+    def _listen_for_progress(self):
+        while True:
+            try:
+                job_id, stage, percent = self._progress_queue.get()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if not job or job['status'] in ('completed', 'failed'):
+                    continue
+                job.update({'status': 'running', 'stage': stage, 'progress': percent})
+                update = dict(job)
+            self._emit('training_job_progress', update)
+
+    def _on_job_done(self, job_id: str, future):
+        try:
+            outcome = future.result()
+            model_type = self.jobs[job_id]['model_type']
+            service = self.service_getter()
+            service.install_model(model_type, outcome['model'], outcome['scaler'])
+            service._save_models([model_type], {model_type: outcome['metrics']})
+            updates = {
+                'status': 'completed',
+                'stage': 'completed',
+                'progress': 100,
+                'result': {'status': 'success', **outcome['metrics']}
+            }
+            event = 'training_job_completed'
+        except Exception as e:
+            logger.error(f"Training job {job_id} failed: {e}")
+            updates = {'status': 'failed', 'stage': 'failed', 'error': str(e)}
+            event = 'training_job_failed'
+
+        with self._lock:
+            job = self.jobs[job_id]
+            job.update(updates)
+            job['completed_at'] = datetime.utcnow().isoformat()
+            final_state = dict(job)
+        self._emit(event, final_state)
+
+    def _emit(self, event: str, payload: Dict[str, Any]):
+        if self.socketio is not None:
+            try:
+                self.socketio.emit(event, payload)
+            except Exception as e:
+                logger.error(f"Error emitting {event}: {e}")
+
+    def shutdown(self):
+        """Stop the pool; running fits are allowed to finish"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self._mp_manager is not None:
+            self._mp_manager.shutdown()
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
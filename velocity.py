@@ -0,0 +1,276 @@
+"""
+Sliding-window transaction velocity for BillChain AI fraud scoring
+
+Keeps per-customer transaction counts and amount sums in memory, in time
+buckets of ``bucket_seconds``, with a running total per window (1h, 24h
+and 7d by default). Reading a customer's velocity expires the buckets that
+slid out of each window and returns the totals, so the payment path no
+longer range-scans transactions. Windows are exact to bucket precision:
+a 24h window covers the current bucket plus the previous full buckets.
+
+The store is fed from SQLAlchemy flush events on transactions and applied
+when the transaction commits, like the dashboard metrics. Bulk statements
+mark it stale, and rebuild() reloads the longest window from the database:
+on startup, on the next read after a bulk write, and periodically so other
+worker processes' payments are picked up.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+import logging
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from database import db, Transaction
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {'1h': 3600, '24h': 86400, '7d': 7 * 86400}
+EPOCH = datetime(1970, 1, 1)
+
+class _Series:
+    """One customer's buckets, oldest first, with a running total per window"""
+
+    __slots__ = ('buckets', 'starts', 'cutoffs', 'counts', 'amounts')
+
+    def __init__(self, windows: int):
+        self.buckets: List[list] = []  # [bucket, count, amount]
+        self.starts = [0] * windows  # index of each window's oldest bucket
+        self.cutoffs = [None] * windows  # oldest bucket each window covered when last advanced
+        self.counts = [0] * windows
+        self.amounts = [0.0] * windows
+
+    def add(self, bucket: int, count: int, amount: float):
+        buckets = self.buckets
+        index = len(buckets)
+        while index and buckets[index - 1][0] > bucket:
+            # Late event: walk back to its bucket (rare, and never far)
+            index -= 1
+        if index and buckets[index - 1][0] == bucket:
+            index -= 1
+            buckets[index][1] += count
+            buckets[index][2] += amount
+        else:
+            buckets.insert(index, [bucket, count, amount])
+            for window, start in enumerate(self.starts):
+                if start >= index:
+                    # The window starts at the new bucket unless it is older than the cutoff
+                    cutoff = self.cutoffs[window]
+                    self.starts[window] = index if cutoff is None or bucket >= cutoff else start + 1
+        for window, start in enumerate(self.starts):
+            if start <= index:
+                self.counts[window] += count
+                self.amounts[window] += amount
+
+    def advance(self, cutoffs: List[int]):
+        """Expire the buckets older than each window's cutoff"""
+        buckets = self.buckets
+        for window, cutoff in enumerate(cutoffs):
+            start = self.starts[window]
+            while start < len(buckets) and buckets[start][0] < cutoff:
+                self.counts[window] -= buckets[start][1]
+                self.amounts[window] -= buckets[start][2]
+                start += 1
+            self.starts[window] = start
+            if self.cutoffs[window] is None or cutoff > self.cutoffs[window]:
+                self.cutoffs[window] = cutoff
+        expired = min(self.starts)
+        if expired and expired * 2 >= len(buckets):
+            del buckets[:expired]
+            self.starts = [start - expired for start in self.starts]
+
+class VelocityStore:
+    """Per-customer transaction counts and amounts over sliding windows"""
+
+    def __init__(self, windows: Optional[Dict[str, int]] = None, bucket_seconds: int = 60,
+                 reconcile_interval: float = 300):
+        self.windows = dict(windows or WINDOWS)
+        self.bucket_seconds = bucket_seconds
+        self.reconcile_interval = reconcile_interval
+        self._names = list(self.windows)
+        self._spans = [max(1, -(-seconds // bucket_seconds)) for seconds in self.windows.values()]
+        self._horizon = timedelta(seconds=max(self.windows.values()))
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._series: Dict[Any, _Series] = {}
+        self._stale = True
+        self._rebuilding = None  # events committed while a rebuild is loading
+        self._rebuilt_at = None
+        self._installed = False
+
+    def install(self):
+        """Start following transaction writes"""
+        if not self._installed:
+            event.listen(Session, 'before_flush', self._before_flush)
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+            event.listen(Session, 'do_orm_execute', self._on_execute)
+            self._installed = True
+
+    def remove(self):
+        if self._installed:
+            event.remove(Session, 'before_flush', self._before_flush)
+            event.remove(Session, 'after_flush', self._after_flush)
+            event.remove(Session, 'after_commit', self._after_commit)
+            event.remove(Session, 'after_soft_rollback', self._after_rollback)
+            event.remove(Session, 'do_orm_execute', self._on_execute)
+            self._installed = False
+
+    def invalidate(self):
+        """Reload from the database on the next read"""
+        self._stale = True
+
+    # --- Reads ---
+
+    def features(self, customer_id, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Transaction count and amount per window, e.g. transactions_24h and amount_24h"""
+        if self._stale:
+            self.rebuild()
+        elif self._rebuilt_at is None:
+            with self._rebuild_lock:
+                pass  # the first load is still running in the background
+        customer_id = _customer_key(customer_id)
+        cutoffs = self._cutoffs(now or datetime.utcnow())
+        with self._lock:
+            series = self._series.get(customer_id)
+            if series is None:
+                counts, amounts = [0] * len(cutoffs), [0.0] * len(cutoffs)
+            else:
+                series.advance(cutoffs)
+                counts, amounts = series.counts, series.amounts
+                if not series.buckets:
+                    del self._series[customer_id]
+            features = {f"transactions_{name}": count for name, count in zip(self._names, counts)}
+            features.update({f"amount_{name}": round(amount, 2) for name, amount in zip(self._names, amounts)})
+        return features
+
+    def count(self, customer_id, window: str = '24h', now: Optional[datetime] = None) -> int:
+        return self.features(customer_id, now)[f"transactions_{window}"]
+
+    # --- Writes ---
+
+    def record(self, customer_id, created_at: datetime, amount: float = 0.0, sign: int = 1):
+        """Count one transaction (``sign=-1`` takes it back out)"""
+        if created_at is None or created_at < datetime.utcnow() - self._horizon:
+            return
+        bucket = self._bucket(created_at)
+        with self._lock:
+            series = self._series.get(customer_id)
+            if series is None:
+                series = self._series[customer_id] = _Series(len(self._spans))
+            series.add(bucket, sign, sign * amount)
+
+    def rebuild(self, now: Optional[datetime] = None):
+        """Reload every window from transactions inside the longest one"""
+        with self._rebuild_lock:
+            return self._rebuild(now)
+
+    def _rebuild(self, now):
+        try:
+            now = now or datetime.utcnow()
+            with self._lock:
+                self._rebuilding = []
+                self._stale = False
+            high_id = db.session.query(db.func.max(Transaction.id)).scalar() or 0
+            rows = (db.session.query(Transaction.customer_id, Transaction.created_at, Transaction.amount)
+                    .filter(Transaction.created_at >= now - self._horizon, Transaction.id <= high_id)
+                    .order_by(Transaction.created_at)  # buckets then only ever append
+                    .yield_per(5000))
+
+            series: Dict[Any, _Series] = {}
+            loaded = 0
+            for customer_id, created_at, amount in rows:
+                if customer_id not in series:
+                    series[customer_id] = _Series(len(self._spans))
+                series[customer_id].add(self._bucket(created_at), 1, float(amount or 0))
+                loaded += 1
+
+            with self._lock:
+                # Commits that landed while loading and are not in the snapshot
+                for transaction_id, customer_id, bucket, amount, sign in self._rebuilding:
+                    if transaction_id > high_id:
+                        if customer_id not in series:
+                            series[customer_id] = _Series(len(self._spans))
+                        series[customer_id].add(bucket, sign, sign * amount)
+                self._series = series
+                self._rebuilding = None
+                self._rebuilt_at = datetime.utcnow()
+            logger.info(f"Velocity store rebuilt from {loaded} transactions")
+            return {'status': 'success', 'transactions': loaded, 'customers': len(series)}
+
+        except Exception as e:
+            with self._lock:
+                self._rebuilding = None
+                self._stale = True
+            logger.error(f"Error rebuilding velocity store: {e}")
+            return {'status': 'error', 'message': str(e)}
+
+    def _bucket(self, moment: datetime) -> int:
+        return int((moment - EPOCH).total_seconds() // self.bucket_seconds)
+
+    def _cutoffs(self, now: datetime) -> List[int]:
+        current = self._bucket(now)
+        return [current - span + 1 for span in self._spans]
+
+    # --- Session events ---
+
+    def _before_flush(self, session, flush_context, instances):
+        # Deleted rows cannot be refreshed after the flush
+        for obj in session.deleted:
+            if type(obj) is Transaction:
+                obj.created_at, obj.amount
+
+    def _after_flush(self, session, flush_context):
+        events = []
+        for obj in session.new:
+            if type(obj) is Transaction:
+                events.append((obj.id, obj.customer_id, obj.created_at, float(obj.amount or 0), 1))
+        for obj in session.deleted:
+            if type(obj) is Transaction:
+                values = inspect(obj).dict
+                events.append((obj.id, values.get('customer_id'), values.get('created_at'),
+                               float(values.get('amount') or 0), -1))
+        if events:
+            session.info.setdefault('velocity_events', []).extend(events)
+
+    def _after_commit(self, session):
+        events = session.info.pop('velocity_events', None)
+        if not events:
+            return
+        for transaction_id, customer_id, created_at, amount, sign in events:
+            self.record(customer_id, created_at, amount, sign)
+            if self._rebuilding is not None and created_at is not None:
+                with self._lock:
+                    if self._rebuilding is not None:
+                        self._rebuilding.append((transaction_id, customer_id, self._bucket(created_at), amount, sign))
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop('velocity_events', None)
+        if previous_transaction.nested:
+            # Events from before the savepoint were dropped too
+            self.invalidate()
+
+    def _on_execute(self, orm_execute_state):
+        # Bulk statements bypass flush events; reload on the next read
+        if orm_execute_state.is_select:
+            return
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) == Transaction.__tablename__:
+            self.invalidate()
+
+def _customer_key(customer_id):
+    # Request payloads may carry the id as a string
+    try:
+        return int(customer_id)
+    except (TypeError, ValueError):
+        return customer_id
+
+# Global velocity store, configured from the environment
+velocity_store = VelocityStore(
+    bucket_seconds=int(os.getenv('VELOCITY_BUCKET_SECONDS', 60)),
+    reconcile_interval=float(os.getenv('VELOCITY_RECONCILE_SECONDS', 300))
+)